@@ -10,7 +10,7 @@ try:
     load_dotenv(_env_path)
 except ImportError:
     pass
-from flask import Flask, render_template, Response, jsonify, request, session, abort, redirect, make_response
+from flask import Flask, render_template, Response, jsonify, request, session, abort, redirect, make_response, g, has_request_context
 from functools import wraps
 try:
     from flask_sock import Sock
@@ -53,7 +53,7 @@ MEDIAPIPE_AVAILABLE = False
 try:
     import mediapipe as mp
     if getattr(mp, 'solutions', None) is not None:
-        mp_pose = mp.solutions.pose.Pose()
+        mp_pose = mp.solutions.pose.Pose(static_image_mode=True)  # crops of different persons/cameras: no cross-call tracking
         MEDIAPIPE_AVAILABLE = True
 except (ImportError, AttributeError):
     pass
@@ -126,10 +126,16 @@ import io
 import platform
 import queue
 import json
+import multiprocessing
 from collections import deque, Counter
 
 import PIL.Image
 
+# True inside an ANALYZE_MODE=process worker (spawned child importing this module): skip cameras, ONVIF and Redis there.
+_AI_WORKER_PROCESS = multiprocessing.parent_process() is not None
+# Same skip for maintenance scripts that import this module only for its database helpers (APP_NO_DEVICES=1).
+_NO_DEVICES = _AI_WORKER_PROCESS or os.environ.get('APP_NO_DEVICES', '').strip().lower() in ('1', 'true', 'yes')
+
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'dev-secret-change-in-production')
 # Ensure session cookie is sent on same-origin requests (avoid sign-in loop after POST /login)
@@ -222,7 +228,7 @@ else:
 _ws_clients = []
 
 _redis_url = os.environ.get('REDIS_URL', '').strip()
-if _redis_url:
+if _redis_url and not _NO_DEVICES:
     try:
         import redis  # type: ignore[reportMissingImports]
         _redis_pub = redis.from_url(_redis_url)
@@ -287,22 +293,26 @@ def _redis_subscriber():
 
 
 def _audit(user_id: str, action: str, resource: str = None, details: str = None):
-    try:
-        get_cursor().execute(
+    """Queue an audit_log row; the insert and its integrity_hash are written by _db_writer in one transaction."""
+    u, a, r, d = (user_id or 'anonymous', action, resource or '', details or '')
+
+    def write(cur):
+        cur.execute(
             'INSERT INTO audit_log (user_id, action, resource, details) VALUES (?, ?, ?, ?)',
-            (user_id or 'anonymous', action, resource, details)
+            (u, action, resource, details)
         )
-        get_conn().commit()
-        row_id = get_cursor().lastrowid
-        get_cursor().execute('SELECT timestamp FROM audit_log WHERE id = ?', (row_id,))
-        row = get_cursor().fetchone()
+        row_id = cur.lastrowid
+        cur.execute('SELECT timestamp FROM audit_log WHERE id = ?', (row_id,))
+        row = cur.fetchone()
         if row_id and row:
             ts = row[0] or ''
-            u, a, r, d = (user_id or 'anonymous', action, resource or '', details or '')
             payload = f'{row_id}|{u}|{a}|{r}|{ts}|{d}'
             h = hashlib.sha256(payload.encode('utf-8')).hexdigest()
-            get_cursor().execute('UPDATE audit_log SET integrity_hash = ? WHERE id = ?', (h, row_id))
-            get_conn().commit()
+            cur.execute('UPDATE audit_log SET integrity_hash = ? WHERE id = ?', (h, row_id))
+        return row_id
+
+    try:
+        _db_writer.call(write)
     except Exception:
         pass
 
@@ -583,7 +593,7 @@ IS_ARM = 'aarch64' in platform.machine() or 'arm' in platform.machine()
 GPIO_AVAILABLE = False
 motor_pwm = None
 
-if USE_GPIO or IS_ARM:
+if (USE_GPIO or IS_ARM) and not _NO_DEVICES:
     try:
         import RPi.GPIO as GPIO  # type: ignore[reportMissingModuleSource]
         GPIO.setmode(GPIO.BCM)
@@ -605,7 +615,7 @@ try:
     _port = int(os.environ.get('ONVIF_PORT', '80'))
     _user = os.environ.get('ONVIF_USER', '')
     _pass = os.environ.get('ONVIF_PASS', '')
-    if _host and _user and _pass:
+    if _host and _user and _pass and not _NO_DEVICES:
         _cam = ONVIFCamera(_host, _port, _user, _pass)
         _media = _cam.create_media_service()
         _profiles = _media.GetProfiles()
@@ -668,7 +678,9 @@ def _auto_detect_camera_indices(max_probe=10):
 
 _raw_camera_sources = os.environ.get('CAMERA_SOURCES', '0').strip()
 _config_dir_for_cameras = os.environ.get('CONFIG_DIR', '').strip()
-if _raw_camera_sources.lower() in ('', 'auto'):
+if _NO_DEVICES:
+    _camera_sources = []  # analysis workers and scripts never open devices; the web process owns capture
+elif _raw_camera_sources.lower() in ('', 'auto'):
     _camera_sources = _auto_detect_camera_indices()
 elif _raw_camera_sources.lower() == 'yaml':
     # Load camera list from config/cameras.yaml or CONFIG_DIR/cameras.yaml (optional; requires PyYAML)
@@ -712,24 +724,130 @@ for i, src in enumerate(_camera_sources):
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
         _cameras[str(i)] = cap
-if not _cameras:
+if not _cameras and not _NO_DEVICES:
     camera = _open_video_capture(0)
     if camera.isOpened():
         camera.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
         camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
     _cameras['0'] = camera  # always show at least one stream; gen_frames yields placeholder if not opened
-camera = _cameras['0']
+camera = _cameras.get('0')
+
+# Capture layer: one reader thread per camera owns its VideoCapture (not thread-safe) and publishes
+# timestamped frames into a small ring. Streaming, analysis and recording subscribe to the ring, so
+# capture cost is O(cameras) not O(viewers) and no consumer steals frames from another.
+try:
+    CAPTURE_RING_SIZE = max(2, min(120, int(os.environ.get('CAPTURE_RING_SIZE', '8'))))
+except (TypeError, ValueError):
+    CAPTURE_RING_SIZE = 8
+
+
+class _FrameRing:
+    """Bounded ring of (seq, timestamp, frame) for one camera. Frames are shared by all subscribers and must be treated as read-only."""
+
+    def __init__(self, maxlen):
+        self._frames = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._fps_window = deque(maxlen=60)
+
+    def publish(self, frame, ts=None):
+        """Append a frame and wake waiting subscribers. Returns its sequence number."""
+        ts = ts if ts is not None else time.time()
+        with self._cond:
+            self._seq += 1
+            self._frames.append((self._seq, ts, frame))
+            self._fps_window.append(ts)
+            self._cond.notify_all()
+            return self._seq
+
+    def latest(self):
+        """Most recent (seq, ts, frame) or None when nothing has been captured yet."""
+        with self._cond:
+            return self._frames[-1] if self._frames else None
+
+    def wait_next(self, after_seq, timeout=1.0):
+        """Block until a frame newer than after_seq exists; return the newest one (slow readers skip ahead) or None on timeout."""
+        with self._cond:
+            if not (self._frames and self._frames[-1][0] > after_seq):
+                self._cond.wait(timeout)
+            if self._frames and self._frames[-1][0] > after_seq:
+                return self._frames[-1]
+            return None
+
+    def since(self, after_seq):
+        """All buffered frames newer than after_seq, oldest first (for consumers that need every frame, e.g. recording)."""
+        with self._cond:
+            return [f for f in self._frames if f[0] > after_seq]
+
+    def fps(self):
+        """Measured publish rate over the recent window."""
+        with self._cond:
+            if len(self._fps_window) < 2:
+                return 0.0
+            span = self._fps_window[-1] - self._fps_window[0]
+            return round((len(self._fps_window) - 1) / span, 1) if span > 0 else 0.0
+
+
+_frame_rings = {}  # camera_id -> _FrameRing
+_capture_threads = {}  # camera_id -> Thread
+_capture_threads_lock = threading.Lock()
+
+
+def _capture_loop(camera_id):
+    """Sole reader of _cameras[camera_id]: read frames and publish them to the camera's ring."""
+    ring = _frame_rings[camera_id]
+    while True:
+        cap = _cameras.get(camera_id)
+        if cap is None or not cap.isOpened():
+            time.sleep(0.5)
+            continue
+        try:
+            success, frame = cap.read()
+        except Exception:
+            success, frame = False, None
+        if not success or frame is None:
+            time.sleep(0.05)
+            continue
+        ts = time.time()
+        _camera_last_frame_time[camera_id] = ts
+        ring.publish(frame, ts)
+        writer = _recording_writers.get(camera_id)
+        if writer is not None:
+            writer.offer(frame, ts)
+
+
+def _get_frame_ring(camera_id):
+    """Return the frame ring for camera_id, starting its capture thread on first use. None for unknown cameras."""
+    if camera_id not in _cameras:
+        return None
+    with _capture_threads_lock:
+        if camera_id not in _frame_rings:
+            _frame_rings[camera_id] = _FrameRing(CAPTURE_RING_SIZE)
+        t = _capture_threads.get(camera_id)
+        if t is None or not t.is_alive():
+            t = threading.Thread(target=_capture_loop, args=(camera_id,), daemon=True, name='capture-%s' % camera_id)
+            _capture_threads[camera_id] = t
+            t.start()
+        return _frame_rings[camera_id]
 
 # AI models — YOLO: configurable via YOLO_MODEL, YOLO_DEVICE, YOLO_IMGSZ, YOLO_CONF (accuracy: filter low-confidence detections)
 # JETSON_MODE=1: tuned defaults (imgsz 640, conf 0.3). YOLO_EXPORT_FORMAT=onnx|engine: prefer .onnx/.engine when file exists.
+# YOLO_BACKEND=onnxruntime (or YOLO_EXPORT_FORMAT=onnx with a .pt): export + cache ONNX on first start and run it on ONNX Runtime CPU.
+try:
+    from vigil_upgrade.models import load_onnx_backend as _load_onnx_backend
+except ImportError:
+    _load_onnx_backend = None
 yolo_model = None
 _yolo_imgsz = 640
 _yolo_conf = 0.25
+_yolo_backend_info = {'backend': 'ultralytics'}
 if YOLO_AVAILABLE and YOLO:
     _yolo_path = os.environ.get('YOLO_MODEL', os.environ.get('YOLO_WEIGHTS', 'yolov8n.pt'))
     _yolo_device = os.environ.get('YOLO_DEVICE', '')
     _jetson = os.environ.get('JETSON_MODE', '').strip().lower() in ('1', 'true', 'yes')
     _export_fmt = (os.environ.get('YOLO_EXPORT_FORMAT') or '').strip().lower()
+    _yolo_backend = (os.environ.get('YOLO_BACKEND') or '').strip().lower() or ('onnxruntime' if _export_fmt == 'onnx' else 'ultralytics')
+    _yolo_pt_path = _yolo_path
     if _export_fmt in ('onnx', 'engine') and _yolo_path.endswith('.pt'):
         _base = _yolo_path[:-3]
         _ext = '.onnx' if _export_fmt == 'onnx' else '.engine'
@@ -769,48 +887,143 @@ if YOLO_AVAILABLE and YOLO:
                         _yolo_class_conf[k.strip().lower()] = max(0.01, min(0.95, float(v.strip())))
                     except (TypeError, ValueError):
                         pass
-    try:
-        yolo_model = YOLO(_yolo_path)
-        if _yolo_device:
-            yolo_model.to(_yolo_device)
-    except Exception:
-        yolo_model = None
+    if _yolo_backend == 'onnxruntime' and _yolo_pt_path.endswith('.pt') and _load_onnx_backend is not None:
+        try:
+            _onnx_threads = max(0, min(64, int(os.environ.get('YOLO_ONNX_THREADS', '0'))))
+        except (TypeError, ValueError):
+            _onnx_threads = 0
+        try:
+            _onnx_min_agreement = max(0.0, min(1.0, float(os.environ.get('YOLO_ONNX_MIN_AGREEMENT', '0.9'))))
+        except (TypeError, ValueError):
+            _onnx_min_agreement = 0.9
+        try:
+            yolo_model, _yolo_backend_info = _load_onnx_backend(
+                _yolo_pt_path,
+                imgsz=_yolo_imgsz,
+                int8=os.environ.get('YOLO_ONNX_INT8', '').strip().lower() in ('1', 'true', 'yes'),
+                intra_op_threads=_onnx_threads,
+                cache_dir=(os.environ.get('YOLO_ONNX_CACHE_DIR') or '').strip() or None,
+                calibration_clip=(os.environ.get('YOLO_ONNX_CALIBRATION_CLIP') or '').strip() or None,
+                min_agreement=_onnx_min_agreement,
+                conf=_yolo_conf,
+            )
+        except Exception as e:
+            yolo_model, _yolo_backend_info = None, {'backend': 'onnxruntime', 'error': str(e)}
+        if yolo_model is None:
+            # Keep serving with Ultralytics; the reason is reported in /api/v1/system_status ai.yolo.backend
+            _yolo_backend_info = dict(_yolo_backend_info or {}, fallback='ultralytics')
+    elif _yolo_backend == 'onnxruntime':
+        _yolo_backend_info = {'backend': 'ultralytics', 'error': 'onnxruntime backend needs a .pt YOLO_MODEL and vigil_upgrade', 'fallback': 'ultralytics'}
+    if yolo_model is None:
+        try:
+            yolo_model = YOLO(_yolo_path)
+            if _yolo_device and not _yolo_path.endswith('.onnx'):
+                yolo_model.to(_yolo_device)
+        except Exception:
+            yolo_model = None
 else:
     _yolo_ignore_classes = set()
     _yolo_class_conf = {}
 
 
-def _filter_yolo_results(results):
-    """Apply YOLO_IGNORE_CLASSES and YOLO_CLASS_CONF: drop ignored classes and low per-class confidence detections."""
-    if not results or not results[0].boxes or not hasattr(results[0].boxes, 'cls'):
-        return
-    global _yolo_ignore_classes, _yolo_class_conf, _yolo_conf
-    boxes = results[0].boxes
-    names = getattr(results[0], 'names', None) or {}
-    n = len(boxes.cls)
-    if n == 0:
-        return
-    keep = []
-    for i in range(n):
-        cls_idx = int(boxes.cls[i].item())
-        class_name = (names.get(cls_idx) or '').strip().lower()
-        conf = float(boxes.conf[i].item()) if hasattr(boxes, 'conf') and boxes.conf is not None and i < len(boxes.conf) else _yolo_conf
-        if class_name in _yolo_ignore_classes:
-            continue
-        thresh = _yolo_class_conf.get(class_name, _yolo_conf)
-        if conf < thresh:
-            continue
-        keep.append(i)
-    if len(keep) == n:
-        return
-    try:
-        import torch
-        mask = torch.zeros(n, dtype=torch.bool, device=boxes.cls.device)
-        for i in keep:
-            mask[i] = True
-        results[0].boxes = results[0].boxes[mask]
-    except Exception:
-        pass
+def _to_numpy(t, dtype):
+    """Tensor or array-like -> NumPy array of dtype (one device->host copy per field)."""
+    if t is None:
+        return np.zeros((0,), dtype=dtype)
+    if hasattr(t, 'cpu'):
+        t = t.cpu()
+    if hasattr(t, 'numpy'):
+        t = t.numpy()
+    return np.asarray(t, dtype=dtype)
+
+
+class _Detections:
+    """One frame's YOLO output as NumPy arrays, converted once and shared by every analysis helper.
+    xyxy (N,4) float32, conf (N,) float32, cls (N,) int class codes, names (code -> class name), labels (N class names),
+    person (N,) bool mask, areas (N,) float32, primary: index of the largest person (area > 0) or None,
+    ids (N,) int64 track IDs (-1 = untracked; set by _TrackAttributeCache.assign or from tracked results)."""
+
+    def __init__(self, xyxy, conf, cls, names, ids=None):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.cls = np.asarray(cls, dtype=np.int64).reshape(-1)
+        n = len(self.cls)
+        conf = np.asarray(conf, dtype=np.float32).reshape(-1) if conf is not None else np.zeros((0,), dtype=np.float32)
+        self.conf = conf if len(conf) == n else np.full(n, _yolo_conf, dtype=np.float32)
+        self.names = names or {}
+        self.labels = [str(self.names.get(int(c), '')) for c in self.cls]
+        self.person = np.array([lbl.strip().lower() == 'person' for lbl in self.labels], dtype=bool)
+        self.areas = (self.xyxy[:, 2] - self.xyxy[:, 0]) * (self.xyxy[:, 3] - self.xyxy[:, 1]) if n else np.zeros((0,), dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1) if ids is not None else None
+        self.ids = ids if ids is not None and len(ids) == n else np.full(n, -1, dtype=np.int64)
+        self.primary = None
+        if self.person.any():
+            masked = np.where(self.person, self.areas, -np.inf)
+            i = int(np.argmax(masked))
+            if masked[i] > 0:
+                self.primary = i
+
+    @classmethod
+    def from_results(cls, results):
+        """Build from ultralytics results (first image). Empty detections when results/boxes are missing."""
+        if not results or results[0] is None or getattr(results[0], 'boxes', None) is None:
+            return cls(np.zeros((0, 4)), None, np.zeros((0,)), getattr(results[0], 'names', None) if results else None)
+        boxes = results[0].boxes
+        return cls(
+            _to_numpy(getattr(boxes, 'xyxy', None), np.float32),
+            _to_numpy(getattr(boxes, 'conf', None), np.float32),
+            _to_numpy(getattr(boxes, 'cls', None), np.int64),
+            getattr(results[0], 'names', None) or {},
+            _to_numpy(getattr(boxes, 'id', None), np.int64) if getattr(boxes, 'id', None) is not None else None,
+        )
+
+    def __len__(self):
+        return len(self.cls)
+
+    def subset(self, mask):
+        """New _Detections keeping rows where mask (bool array or index array) selects."""
+        return _Detections(self.xyxy[mask], self.conf[mask], self.cls[mask], self.names, self.ids[mask])
+
+    def person_indices(self):
+        return np.flatnonzero(self.person)
+
+    def indices_of(self, class_names):
+        """Row indices (detection order) whose lower-cased class name is in class_names."""
+        return [i for i, lbl in enumerate(self.labels) if lbl.strip().lower() in class_names]
+
+    def first_person(self):
+        """Index of the first person in detection order, or None."""
+        idx = self.person_indices()
+        return int(idx[0]) if len(idx) else None
+
+    def track_id(self, i):
+        """Track ID of row i, or None when untracked (or i is None)."""
+        if i is None or self.ids[i] < 0:
+            return None
+        return int(self.ids[i])
+
+    def box(self, i):
+        """(x1, y1, x2, y2) floats for row i."""
+        x1, y1, x2, y2 = self.xyxy[i]
+        return float(x1), float(y1), float(x2), float(y2)
+
+    def centroids(self, mask=None):
+        """(N,2) box centres for rows selected by mask (default all)."""
+        xyxy = self.xyxy if mask is None else self.xyxy[mask]
+        return np.stack(((xyxy[:, 0] + xyxy[:, 2]) / 2, (xyxy[:, 1] + xyxy[:, 3]) / 2), axis=1) if len(xyxy) else np.zeros((0, 2), dtype=np.float32)
+
+
+def _filter_yolo_results(dets):
+    """Apply YOLO_IGNORE_CLASSES and YOLO_CLASS_CONF to a _Detections: drop ignored classes and low per-class confidence detections.
+    Thresholds are resolved once per distinct class code and applied as one vectorised mask."""
+    if dets is None or not len(dets):
+        return dets
+    codes, inverse = np.unique(dets.cls, return_inverse=True)
+    thresh = np.empty(len(codes), dtype=np.float32)
+    for j, code in enumerate(codes):
+        class_name = str(dets.names.get(int(code), '')).strip().lower()
+        thresh[j] = np.inf if class_name in _yolo_ignore_classes else _yolo_class_conf.get(class_name, _yolo_conf)
+    keep = dets.conf >= thresh[inverse]
+    return dets if keep.all() else dets.subset(keep)
 
 
 # MJPEG stream tuning (env read once at startup)
@@ -852,8 +1065,9 @@ if _enable_low_light:
 
 # SQLite: one connection per thread to avoid SIGSEGV from concurrent access (Flask request threads + analyze_frame).
 _db_local = threading.local()
-# Batch commit for ai_data: buffer up to AI_DATA_BATCH_SIZE rows then commit once (analyze_frame thread only).
+# Batch commit for ai_data: buffer up to AI_DATA_BATCH_SIZE rows then commit once (shared by analysis workers).
 _ai_data_batch = []
+_ai_data_batch_lock = threading.Lock()
 try:
     _batch_size = int(os.environ.get('AI_DATA_BATCH_SIZE', '10'))
     AI_DATA_BATCH_SIZE = max(1, min(50, _batch_size))
@@ -865,9 +1079,27 @@ try:
     ANALYZE_INTERVAL_SECONDS = max(5, min(60, _interval))
 except (TypeError, ValueError):
     ANALYZE_INTERVAL_SECONDS = 10
+# Analysis worker pool: every camera is analysed once per ANALYZE_INTERVAL_SECONDS across this many threads.
+# Default: one worker per camera (2-8) so cameras due together can share a batched YOLO forward pass.
+try:
+    ANALYZE_WORKERS = max(1, min(16, int(os.environ.get('ANALYZE_WORKERS', str(max(2, min(8, len(_cameras))))))))
+except (TypeError, ValueError):
+    ANALYZE_WORKERS = 2
+_analysis_queue = queue.Queue()
+# Batched YOLO: frames from cameras due within YOLO_BATCH_WAIT_MS share one predict() of up to YOLO_BATCH_MAX images.
+try:
+    YOLO_BATCH_MAX = max(1, min(32, int(os.environ.get('YOLO_BATCH_MAX', '8'))))
+except (TypeError, ValueError):
+    YOLO_BATCH_MAX = 8
+try:
+    YOLO_BATCH_WAIT_MS = max(0, min(500, int(os.environ.get('YOLO_BATCH_WAIT_MS', '50'))))
+except (TypeError, ValueError):
+    YOLO_BATCH_WAIT_MS = 50
+_mp_pose_lock = threading.Lock()
 
-def _init_schema(c):
-    """Create tables and run migrations. Idempotent per connection."""
+def _schema_v1(c):
+    """Baseline schema: every table, column and index that predates versioned migrations. Idempotent, so it also brings
+    an unversioned (user_version 0) database from any older release up to date."""
     c.execute('''CREATE TABLE IF NOT EXISTS ai_data (
     date TEXT, time TEXT, individual TEXT, facial_features TEXT, object TEXT,
     pose TEXT, emotion TEXT, scene TEXT, license_plate TEXT, event TEXT, crowd_count INTEGER,
@@ -915,7 +1147,6 @@ def _init_schema(c):
 )''')
     try:
         c.execute('ALTER TABLE audit_log ADD COLUMN integrity_hash TEXT')
-        c.commit()
     except sqlite3.OperationalError:
         pass
     c.execute('''CREATE TABLE IF NOT EXISTS login_attempts (
@@ -963,6 +1194,17 @@ def _init_schema(c):
     path TEXT PRIMARY KEY,
     sha256 TEXT NOT NULL,
     checked_at TEXT NOT NULL
+)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    camera_id TEXT,
+    start_utc TEXT NOT NULL,
+    end_utc TEXT,
+    frame_count INTEGER,
+    size_bytes INTEGER,
+    codec TEXT,
+    fps REAL
 )''')
     c.execute('''CREATE TABLE IF NOT EXISTS user_site_roles (
     user_id INTEGER NOT NULL,
@@ -998,6 +1240,9 @@ def _init_schema(c):
         "ALTER TABLE ai_data ADD COLUMN integrity_hash TEXT",
         "ALTER TABLE events ADD COLUMN timestamp_utc TEXT",
         "ALTER TABLE events ADD COLUMN integrity_hash TEXT",
+        "ALTER TABLE events ADD COLUMN clip_path TEXT",
+        "ALTER TABLE recording_fixity ADD COLUMN size_bytes INTEGER",
+        "ALTER TABLE recording_fixity ADD COLUMN mtime_ns INTEGER",
         "ALTER TABLE ai_data ADD COLUMN perceived_gender TEXT",
         "ALTER TABLE ai_data ADD COLUMN perceived_age_range TEXT",
         "ALTER TABLE ai_data ADD COLUMN hair_color TEXT",
@@ -1044,7 +1289,6 @@ def _init_schema(c):
     ):
         try:
             c.execute(sql)
-            c.commit()
         except sqlite3.OperationalError:
             pass
     # Indexes for list/export/retention (OPTIMIZATION_AUDIT)
@@ -1056,13 +1300,270 @@ def _init_schema(c):
         "CREATE INDEX IF NOT EXISTS idx_audit_log_timestamp ON audit_log(timestamp)",
         "CREATE INDEX IF NOT EXISTS idx_ai_data_timestamp_utc ON ai_data(timestamp_utc)",
         "CREATE INDEX IF NOT EXISTS idx_events_timestamp_utc ON events(timestamp_utc)",
+        "CREATE INDEX IF NOT EXISTS idx_recordings_start ON recordings(start_utc)",
+        "CREATE INDEX IF NOT EXISTS idx_recordings_end ON recordings(end_utc)",
+        "CREATE INDEX IF NOT EXISTS idx_recordings_camera_start ON recordings(camera_id, start_utc)",
     ):
         try:
             c.execute(sql)
-            c.commit()
         except sqlite3.OperationalError:
             pass
 
+
+# Full-text search (FTS5, external content): the searchable ai_data text attributes and event type/metadata, kept in sync
+# by triggers so every write path (writer thread, imports, retention deletes) maintains the index. prefix='2 3' makes
+# short prefix queries (e.g. "pers*") index lookups.
+_AI_DATA_FTS_COLUMNS = (
+    'object', 'event', 'scene', 'license_plate', 'suspicious_behavior', 'predicted_intent', 'stress_level',
+    'hair_color', 'build', 'perceived_gender', 'perceived_age_range', 'perceived_age', 'perceived_ethnicity',
+    'clothing_description', 'gait_notes', 'intoxication_indicator', 'micro_expression', 'attention_region', 'illumination_band',
+    'period_of_day_utc', 'audio_event', 'audio_transcription', 'audio_sentiment', 'audio_emotion', 'audio_stress_level',
+    'audio_keywords', 'device_mac', 'device_oui_vendor', 'device_probe_ssids',
+)
+_EVENTS_FTS_COLUMNS = ('event_type', 'metadata')
+# Databases with more ai_data rows than this are not backfilled inside the startup migration (it holds the write lock and
+# blocks get_conn): the search index via scripts/rebuild_search_index.py, the rollups in chunks by rollup_reconcile_job.
+_INLINE_BACKFILL_ROWS = 100000
+
+
+_FTS_TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+
+def _fts_triggers(table, fts, key, cols):
+    """Triggers keeping an external-content FTS5 table in step with its source table."""
+    names = ', '.join(cols)
+    new = ', '.join('new.%s' % col for col in cols)
+    old = ', '.join('old.%s' % col for col in cols)
+    return (
+        'CREATE TRIGGER IF NOT EXISTS %s_ai AFTER INSERT ON %s BEGIN '
+        'INSERT INTO %s(rowid, %s) VALUES (new.%s, %s); END' % (fts, table, fts, names, key, new),
+        'CREATE TRIGGER IF NOT EXISTS %s_ad AFTER DELETE ON %s BEGIN '
+        "INSERT INTO %s(%s, rowid, %s) VALUES ('delete', old.%s, %s); END" % (fts, table, fts, fts, names, key, old),
+        'CREATE TRIGGER IF NOT EXISTS %s_au AFTER UPDATE OF %s ON %s BEGIN '
+        "INSERT INTO %s(%s, rowid, %s) VALUES ('delete', old.%s, %s); "
+        'INSERT INTO %s(rowid, %s) VALUES (new.%s, %s); END' % (fts, names, table, fts, fts, names, key, old, fts, names, key, new),
+    )
+
+
+def _rebuild_search_index(c):
+    """Backfill (or repair) both FTS indexes from their source tables. Returns False when FTS5 is not set up."""
+    if not _search_fts_available(c):
+        return False
+    c.execute("INSERT INTO ai_data_fts(ai_data_fts) VALUES ('rebuild')")
+    c.execute("INSERT INTO events_fts(events_fts) VALUES ('rebuild')")
+    c.execute("INSERT INTO ai_data_fts(ai_data_fts) VALUES ('optimize')")
+    c.execute("INSERT INTO events_fts(events_fts) VALUES ('optimize')")
+    c.commit()
+    return True
+
+
+def _search_fts_available(c):
+    return c.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('ai_data_fts', 'events_fts')"
+    ).fetchone()[0] == 2
+
+
+def _schema_v2(c):
+    """FTS5 search indexes and their sync triggers; backfilled inline for small databases. Skipped (search keeps using
+    LIKE scans) when this SQLite build has no FTS5."""
+    try:
+        c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS ai_data_fts USING fts5(%s, content = 'ai_data', content_rowid = 'rowid', %s)"
+                  % (', '.join(_AI_DATA_FTS_COLUMNS), _FTS_TOKENIZE))
+        c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(%s, content = 'events', content_rowid = 'id', %s)"
+                  % (', '.join(_EVENTS_FTS_COLUMNS), _FTS_TOKENIZE))
+    except sqlite3.OperationalError as e:
+        print('[schema] FTS5 unavailable, search stays on LIKE scans:', e, flush=True)
+        return
+    for sql in _fts_triggers('ai_data', 'ai_data_fts', 'rowid', _AI_DATA_FTS_COLUMNS) + _fts_triggers('events', 'events_fts', 'id', _EVENTS_FTS_COLUMNS):
+        c.execute(sql)
+    for table, fts in (('ai_data', 'ai_data_fts'), ('events', 'events_fts')):
+        rows = c.execute('SELECT COUNT(*) FROM (SELECT 1 FROM %s LIMIT ?)' % table, (_INLINE_BACKFILL_ROWS + 1,)).fetchone()[0]
+        if rows > _INLINE_BACKFILL_ROWS:
+            print('[schema] %s created empty; backfill existing rows with scripts/rebuild_search_index.py' % fts, flush=True)
+            continue
+        c.execute("INSERT INTO %s(%s) VALUES ('rebuild')" % (fts, fts))
+
+
+# Hourly rollups for the analytics endpoints: ai_data counts/crowd and zone frames per (date, hour, camera, event|zone),
+# events per (date, hour, camera, site, event type). Triggers apply +1/-1 deltas on every write path (writer thread,
+# retention deletes); rollup_reconcile_job periodically recomputes recent days from the raw rows. Key columns are
+# COALESCEd to '' (reported as null). Zone indexes come from rollup_zone_index (0-63).
+_ROLLUP_ZONE_MAX = 64
+_ROLLUPS = {
+    'ai_data_hourly': {
+        'source': 'ai_data',
+        'keys': ('date', 'hour', 'camera_id', 'event'),
+        'key_sql': ("COALESCE({r}.date, '')", "COALESCE(strftime('%H', {r}.time), '')", "COALESCE({r}.camera_id, '')",
+                    "COALESCE({r}.event, '')"),
+        'values': (('cnt', '1'), ('total_crowd', 'COALESCE({r}.crowd_count, 0)')),
+        'watch': ('date', 'time', 'camera_id', 'event', 'crowd_count'),
+        'date_sql': '{r}.date',
+    },
+    'zone_hourly': {
+        'source': 'ai_data',
+        'keys': ('date', 'hour', 'camera_id', 'zone_index'),
+        'key_sql': ("COALESCE({r}.date, '')", "COALESCE(strftime('%H', {r}.time), '')", "COALESCE({r}.camera_id, '')", 'z.idx'),
+        'values': (('frame_count', '1'),),
+        'watch': ('date', 'time', 'camera_id', 'zone_presence'),
+        'join': ('rollup_zone_index z', "(',' || {r}.zone_presence || ',') LIKE ('%,' || z.idx || ',%')"),
+        'date_sql': '{r}.date',
+    },
+    'events_hourly': {
+        'source': 'events',
+        'keys': ('date', 'hour', 'camera_id', 'site_id', 'event_type'),
+        'key_sql': ("COALESCE(date({r}.timestamp), '')", "COALESCE(strftime('%H', {r}.timestamp), '')",
+                    "COALESCE({r}.camera_id, '')", "COALESCE({r}.site_id, '')", "COALESCE({r}.event_type, '')"),
+        'values': (('cnt', '1'),),
+        'watch': ('timestamp', 'camera_id', 'site_id', 'event_type'),
+        'date_sql': '{r}.timestamp',
+    },
+}
+
+
+def _rollup_delta_sql(name, r, sign):
+    """Upsert applying one source row (r = new/old) to a rollup with sign '' (add) or '-' (remove), then drop emptied keys."""
+    spec = _ROLLUPS[name]
+    keys = [k.format(r=r) for k in spec['key_sql']]
+    values = ['%s(%s)' % (sign, v.format(r=r)) for _, v in spec['values']]
+    join = spec.get('join')
+    source = ' FROM %s WHERE %s' % (join[0], join[1].format(r=r)) if join else ' WHERE true'
+    upsert = 'INSERT INTO %s (%s, %s) SELECT %s, %s%s ON CONFLICT (%s) DO UPDATE SET %s' % (
+        name, ', '.join(spec['keys']), ', '.join(col for col, _ in spec['values']), ', '.join(keys), ', '.join(values), source,
+        ', '.join(spec['keys']), ', '.join('%s = %s + excluded.%s' % (col, col, col) for col, _ in spec['values']))
+    if not sign:
+        return [upsert]
+    first = spec['values'][0][0]
+    if spec.get('join'):
+        # Zone keys fan out per matched index; the date/hour/camera prefix still bounds the cleanup to a PK range.
+        cleanup = 'DELETE FROM %s WHERE %s AND %s <= 0' % (
+            name, ' AND '.join('%s = %s' % (col, k) for col, k in zip(spec['keys'][:3], keys[:3])), first)
+    else:
+        cleanup = 'DELETE FROM %s WHERE %s AND %s <= 0' % (
+            name, ' AND '.join('%s = %s' % (col, k) for col, k in zip(spec['keys'], keys)), first)
+    return [upsert, cleanup]
+
+
+def _rollup_triggers(name):
+    spec = _ROLLUPS[name]
+    add, remove = _rollup_delta_sql(name, 'new', ''), _rollup_delta_sql(name, 'old', '-')
+    return (
+        'CREATE TRIGGER IF NOT EXISTS %s_ai AFTER INSERT ON %s BEGIN %s; END' % (name, spec['source'], '; '.join(add)),
+        'CREATE TRIGGER IF NOT EXISTS %s_ad AFTER DELETE ON %s BEGIN %s; END' % (name, spec['source'], '; '.join(remove)),
+        'CREATE TRIGGER IF NOT EXISTS %s_au AFTER UPDATE OF %s ON %s BEGIN %s; END' % (
+            name, ', '.join(spec['watch']), spec['source'], '; '.join(remove + add)),
+    )
+
+
+def _rebuild_rollups(c, date_from='', date_until='9999-12-31'):
+    """Recompute every rollup from the raw tables for date_from <= date < date_until ('' = from the start). Returns rollup
+    rows written. Runs inside the caller's transaction (the writer thread's for rollup_reconcile_job)."""
+    written = 0
+    for name, spec in _ROLLUPS.items():
+        keys = [k.format(r='s') for k in spec['key_sql']]
+        join = spec.get('join')
+        source = '%s s' % spec['source'] + (' JOIN %s ON %s' % (join[0], join[1].format(r='s')) if join else '')
+        date_col = spec['date_sql'].format(r='s')
+        c.execute('DELETE FROM %s WHERE date >= ? AND date < ?' % name, (date_from, date_until))
+        cur = c.execute('INSERT INTO %s (%s, %s) SELECT %s, %s FROM %s WHERE %s >= ? AND %s < ? GROUP BY %s' % (
+            name, ', '.join(spec['keys']), ', '.join(col for col, _ in spec['values']), ', '.join(keys),
+            ', '.join('SUM(%s)' % v.format(r='s') for _, v in spec['values']), source, date_col, date_col,
+            ', '.join(str(i + 1) for i in range(len(keys)))), (date_from, date_until))
+        written += max(0, cur.rowcount)
+    return written
+
+
+def _rollup_backfill_step(c):
+    """Build the rollups for the newest not-yet-backfilled day with raw rows (one short transaction per day, newest first,
+    so recent dashboards fill in first). Returns the day built, or None once the backfill is complete."""
+    row = c.execute("SELECT value FROM rollup_state WHERE name = 'backfill_before'").fetchone()
+    if not row:
+        return None
+    before = row[0]
+    days = [c.execute('SELECT MAX(date) FROM ai_data WHERE date < ?', (before,)).fetchone()[0],
+            c.execute('SELECT MAX(date(timestamp)) FROM events WHERE timestamp < ?', (before,)).fetchone()[0]]
+    days = [d for d in days if d]
+    if not days:
+        c.execute("DELETE FROM rollup_state WHERE name = 'backfill_before'")
+        return None
+    day = max(days)
+    _rebuild_rollups(c, day, before)
+    c.execute("UPDATE rollup_state SET value = ? WHERE name = 'backfill_before'", (day,))
+    return day
+
+
+def _schema_v3(c):
+    """Hourly rollup tables and their delta triggers. Small databases are built inline; larger ones are left to
+    rollup_reconcile_job's day-by-day backfill (rollup_state.backfill_before marks the days still to build)."""
+    c.execute('CREATE TABLE IF NOT EXISTS rollup_zone_index (idx INTEGER PRIMARY KEY)')
+    c.executemany('INSERT OR IGNORE INTO rollup_zone_index (idx) VALUES (?)', [(i,) for i in range(_ROLLUP_ZONE_MAX)])
+    c.execute('CREATE TABLE IF NOT EXISTS rollup_state (name TEXT PRIMARY KEY, value TEXT)')
+    for name, spec in _ROLLUPS.items():
+        key_cols = ', '.join('%s %s NOT NULL' % (k, 'INTEGER' if k == 'zone_index' else 'TEXT') for k in spec['keys'])
+        value_cols = ', '.join('%s INTEGER NOT NULL DEFAULT 0' % col for col, _ in spec['values'])
+        c.execute('CREATE TABLE IF NOT EXISTS %s (%s, %s, PRIMARY KEY (%s)) WITHOUT ROWID' % (
+            name, key_cols, value_cols, ', '.join(spec['keys'])))
+        for sql in _rollup_triggers(name):
+            c.execute(sql)
+    rows = c.execute('SELECT COUNT(*) FROM (SELECT 1 FROM ai_data LIMIT ?)', (_INLINE_BACKFILL_ROWS + 1,)).fetchone()[0]
+    if rows > _INLINE_BACKFILL_ROWS:
+        c.execute("INSERT OR REPLACE INTO rollup_state (name, value) VALUES ('backfill_before', '9999-12-31')")
+        print('[schema] analytics rollups will be backfilled day by day in the background', flush=True)
+        return
+    _rebuild_rollups(c)
+
+
+# Versioned migrations, applied in order by _migrate_schema and recorded in PRAGMA user_version. Append new steps with the
+# next version number; never edit a step that has shipped.
+_SCHEMA_MIGRATIONS = (
+    (1, _schema_v1),
+    (2, _schema_v2),
+    (3, _schema_v3),
+)
+SCHEMA_VERSION = _SCHEMA_MIGRATIONS[-1][0]
+_migrated_db_paths = set()
+_migrate_lock = threading.Lock()
+
+
+def _migrate_schema(c):
+    """Apply pending migrations in one write transaction and bump user_version. Returns the versions applied.
+    BEGIN IMMEDIATE serializes concurrent processes; the version is re-read once the write lock is held."""
+    if c.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+        return []
+    c.execute('BEGIN IMMEDIATE')
+    try:
+        current = c.execute('PRAGMA user_version').fetchone()[0]
+        applied = []
+        for version, step in _SCHEMA_MIGRATIONS:
+            if version > current:
+                step(c)
+                applied.append(version)
+        if applied:
+            c.execute('PRAGMA user_version = %d' % applied[-1])
+        c.commit()
+    except Exception:
+        c.rollback()
+        raise
+    return applied
+
+
+def _ensure_schema(path):
+    """Run the migration runner once per database path per process, on a short-lived connection of its own."""
+    if path in _migrated_db_paths:
+        return
+    with _migrate_lock:
+        if path in _migrated_db_paths:
+            return
+        c = sqlite3.connect(path)
+        try:
+            c.execute('PRAGMA busy_timeout=5000')
+            c.execute('PRAGMA journal_mode=WAL')
+            applied = _migrate_schema(c)
+            if applied:
+                print('[schema] migrated %s to version %d' % (path, applied[-1]), flush=True)
+        finally:
+            c.close()
+        _migrated_db_paths.add(path)
+
 def _system_id():
     """Equipment/system identifier for chain of custody (NISTIR 8161, SWGDE)."""
     try:
@@ -1071,8 +1572,13 @@ def _system_id():
         return 'vigil'
 
 def _yolo_model_version():
-    """AI model identifier for provenance (NIST AI 100-4)."""
-    return os.environ.get('YOLO_MODEL', os.environ.get('YOLO_WEIGHTS', 'yolov8n.pt'))
+    """AI model identifier for provenance (NIST AI 100-4): the YOLO_MODEL weights, plus the runtime and precision when the
+    ONNX Runtime backend is serving them (e.g. yolov8n.pt (onnxruntime int8)); a bare name means Ultralytics."""
+    name = os.environ.get('YOLO_MODEL', os.environ.get('YOLO_WEIGHTS', 'yolov8n.pt'))
+    info = _yolo_backend_info or {}
+    if info.get('backend') == 'onnxruntime' and not info.get('fallback'):
+        return '%s (onnxruntime %s)' % (name, 'int8' if info.get('int8') else 'fp32')
+    return name
 
 def _is_personal_use():
     """When set, disables ethical/compliance gates: always full collection, no DPIA reminder, no minimal preset."""
@@ -1132,13 +1638,14 @@ def _db_path():
 
 
 def get_conn():
+    """This thread's connection. The schema is migrated once per process (_ensure_schema), not per connection."""
     if not getattr(_db_local, 'conn', None):
-        _db_local.conn = sqlite3.connect(_db_path())
-        _db_local.conn.execute('PRAGMA journal_mode=WAL')
+        path = _db_path()
+        _ensure_schema(path)
+        _db_local.conn = sqlite3.connect(path)
         _db_local.conn.execute('PRAGMA synchronous=NORMAL')
         _db_local.conn.execute('PRAGMA cache_size=-64000')  # ~64 MB
         _db_local.conn.execute('PRAGMA busy_timeout=5000')
-        _init_schema(_db_local.conn)
     return _db_local.conn
 
 def get_cursor():
@@ -1146,6 +1653,408 @@ def get_cursor():
         _db_local.cursor = get_conn().cursor()
     return _db_local.cursor
 
+
+def _close_thread_db():
+    """Close this thread's connection (for short-lived/background threads that touched the DB)."""
+    conn = getattr(_db_local, 'conn', None)
+    _db_local.cursor = None
+    _db_local.conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# Single SQLite writer: the analysis pipeline, audit log and event inserts hand typed write intents to one thread that
+# owns the write connection, so they never wait on busy_timeout for the WAL write lock. Intents queued together are applied
+# in one transaction (group commit), bounded by DB_WRITER_MAX_BATCH rows and DB_WRITER_MAX_LATENCY_MS; consecutive inserts
+# with the same SQL collapse into one executemany.
+try:
+    DB_WRITER_MAX_BATCH = max(1, min(5000, int(os.environ.get('DB_WRITER_MAX_BATCH', '500'))))
+except (TypeError, ValueError):
+    DB_WRITER_MAX_BATCH = 500
+try:
+    DB_WRITER_MAX_LATENCY_MS = max(0, min(1000, int(os.environ.get('DB_WRITER_MAX_LATENCY_MS', '50'))))
+except (TypeError, ValueError):
+    DB_WRITER_MAX_LATENCY_MS = 50
+try:
+    DB_WRITER_QUEUE_SIZE = max(100, min(100000, int(os.environ.get('DB_WRITER_QUEUE_SIZE', '10000'))))
+except (TypeError, ValueError):
+    DB_WRITER_QUEUE_SIZE = 10000
+try:
+    DB_WRITER_LOCK_RETRY_SECONDS = max(1.0, min(3600.0, float(os.environ.get('DB_WRITER_LOCK_RETRY_SECONDS', '60'))))
+except (TypeError, ValueError):
+    DB_WRITER_LOCK_RETRY_SECONDS = 60.0
+
+
+class _DbWriter:
+    """Owns the write connection. Intents are dicts: kind 'many' (sql, rows -> executemany), 'one' (sql, params -> lastrowid)
+    or 'call' (fn(cursor) -> return value, for multi-statement writes that must share a transaction). Callers either fire
+    and forget, pass on_commit (run on the writer thread with the result once committed), or wait for the result."""
+
+    def __init__(self, max_batch, max_latency, queue_size, lock_retry_seconds=60.0):
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.lock_retry_seconds = lock_retry_seconds
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._commits = 0
+        self._intents = 0
+        self._rows = 0
+        self._failed = 0
+        self._lock_retries = 0
+        self._last_batch_rows = 0
+        self._max_queue_depth = 0
+        self._commit_ms = deque(maxlen=200)
+
+    def executemany(self, sql, rows, on_commit=None):
+        """Queue a bulk write; rows are applied with executemany. Returns immediately."""
+        rows = [tuple(r) for r in rows]
+        if rows:
+            self._submit({'kind': 'many', 'sql': sql, 'rows': rows, 'on_commit': on_commit})
+
+    def execute(self, sql, params=(), on_commit=None, wait=False, timeout=30.0):
+        """Queue one statement. on_commit(lastrowid) runs after commit; wait=True blocks for the lastrowid instead."""
+        return self._submit({'kind': 'one', 'sql': sql, 'params': tuple(params), 'on_commit': on_commit}, wait, timeout)
+
+    def call(self, fn, on_commit=None, wait=False, timeout=30.0):
+        """Queue fn(cursor), run inside the writer's transaction. wait=True returns fn's result (or raises its error)."""
+        return self._submit({'kind': 'call', 'fn': fn, 'on_commit': on_commit}, wait, timeout)
+
+    def flush(self, timeout=30.0):
+        """Block until every intent queued before this call is committed. Returns False on timeout."""
+        if self._thread is None and self._queue.empty():
+            return True
+        try:
+            self.call(lambda cur: None, wait=True, timeout=timeout)
+            return True
+        except TimeoutError:
+            return False
+
+    def stats(self):
+        """Queue depth, group commits and commit latency (recent average / max)."""
+        recent = list(self._commit_ms)
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'max_batch': self.max_batch,
+            'max_latency_ms': int(self.max_latency * 1000),
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self._max_queue_depth,
+            'commits': self._commits,
+            'intents': self._intents,
+            'rows': self._rows,
+            'failed': self._failed,
+            'lock_retries': self._lock_retries,
+            'last_batch_rows': self._last_batch_rows,
+            'avg_commit_ms': round(sum(recent) / len(recent), 2) if recent else None,
+            'max_commit_ms': round(max(recent), 2) if recent else None,
+        }
+
+    def _submit(self, intent, wait=False, timeout=30.0):
+        self._ensure_thread()
+        if wait:
+            intent['done'] = threading.Event()
+        self._queue.put(intent)
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        if not wait:
+            return None
+        if not intent['done'].wait(timeout):
+            raise TimeoutError('db writer did not commit within %.1fs' % timeout)
+        if intent.get('error') is not None:
+            raise intent['error']
+        return intent.get('result')
+
+    def _ensure_thread(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name='db-writer')
+                self._thread.start()
+
+    @staticmethod
+    def _size(intent):
+        return len(intent['rows']) if intent['kind'] == 'many' else 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            rows = self._size(batch[0])
+            deadline = time.time() + self.max_latency
+            while rows < self.max_batch:
+                remaining = deadline - time.time()
+                try:
+                    intent = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(intent)
+                rows += self._size(intent)
+            try:
+                self._commit(batch, rows)
+            except Exception as e:
+                # No connection (or the writer itself failed): nothing was committed, so every waiter gets the error
+                print('[db_writer]', e, flush=True)
+                _close_thread_db()
+                for intent in batch:
+                    if intent.get('error') is None:
+                        intent['error'] = e
+                        self._failed += 1
+            for intent in batch:
+                done = intent.get('done')
+                if done is not None:
+                    done.set()
+
+    def _apply(self, cur, batch):
+        """Run a group in order; consecutive 'many' intents with the same SQL share one executemany."""
+        i = 0
+        while i < len(batch):
+            intent = batch[i]
+            if intent['kind'] == 'many':
+                j = i + 1
+                while j < len(batch) and batch[j]['kind'] == 'many' and batch[j]['sql'] == intent['sql']:
+                    j += 1
+                cur.executemany(intent['sql'], [r for b in batch[i:j] for r in b['rows']])
+                i = j
+                continue
+            if intent['kind'] == 'one':
+                cur.execute(intent['sql'], intent['params'])
+                intent['result'] = cur.lastrowid
+            else:
+                intent['result'] = intent['fn'](cur)
+            i += 1
+
+    def _attempt(self, conn, cur, intents):
+        """Apply and commit intents as one transaction. While another connection holds the write lock past busy_timeout
+        the transaction is rolled back and retried with backoff for up to lock_retry_seconds; after that the lock error
+        is raised so the intents fail instead of stalling the queue behind a lock that never clears."""
+        delay = 0.05
+        deadline = time.monotonic() + self.lock_retry_seconds
+        while True:
+            try:
+                self._apply(cur, intents)
+                conn.commit()
+                return
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                msg = str(e).lower()
+                if ('locked' not in msg and 'busy' not in msg) or time.monotonic() + delay > deadline:
+                    raise
+                self._lock_retries += 1
+                time.sleep(delay)
+                delay = min(2.0, delay * 2)
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _commit_each(self, conn, cur, batch):
+        """One bad intent must not drop the group: apply each on its own; only the ones that still fail get the error."""
+        committed = []
+        locked = None
+        for intent in batch:
+            try:
+                if locked is not None:  # the lock outlasted the retries once: do not wait it out again per intent
+                    raise locked
+                self._attempt(conn, cur, [intent])
+                committed.append(intent)
+            except Exception as e:
+                intent['error'] = e
+                self._failed += 1
+                if isinstance(e, sqlite3.OperationalError) and ('locked' in str(e).lower() or 'busy' in str(e).lower()):
+                    locked = e
+        return committed
+
+    def _commit(self, batch, rows):
+        conn = get_conn()
+        cur = get_cursor()
+        t0 = time.perf_counter()
+        try:
+            self._attempt(conn, cur, batch)
+            committed = batch
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e).lower() and 'busy' not in str(e).lower():
+                committed = self._commit_each(conn, cur, batch)
+            else:  # lock retries exhausted: fail the group rather than retrying each intent for as long again
+                committed = []
+                for intent in batch:
+                    intent['error'] = e
+                    self._failed += 1
+        except Exception:
+            committed = self._commit_each(conn, cur, batch)
+        self._commit_ms.append(1000.0 * (time.perf_counter() - t0))
+        self._commits += 1
+        self._intents += len(batch)
+        self._rows += rows
+        self._last_batch_rows = rows
+        for intent in committed:
+            if intent.get('on_commit') is not None:
+                try:
+                    intent['on_commit'](intent.get('result'))
+                except Exception:
+                    pass
+
+
+_db_writer = _DbWriter(DB_WRITER_MAX_BATCH, DB_WRITER_MAX_LATENCY_MS / 1000.0, DB_WRITER_QUEUE_SIZE, DB_WRITER_LOCK_RETRY_SECONDS)
+import atexit
+atexit.register(_db_writer.flush, 5.0)
+
+# Read-only pool for dashboard/API reads (/get_data, /events, analytics, search, exports): a bounded set of mode=ro,
+# query_only connections leased per request, so request threads do not each open (and tune) a read-write connection.
+try:
+    DB_READ_POOL_SIZE = max(1, min(64, int(os.environ.get('DB_READ_POOL_SIZE', '8'))))
+except (TypeError, ValueError):
+    DB_READ_POOL_SIZE = 8
+try:
+    DB_READ_POOL_TIMEOUT_SECONDS = max(0.1, min(60.0, float(os.environ.get('DB_READ_POOL_TIMEOUT_SECONDS', '10'))))
+except (TypeError, ValueError):
+    DB_READ_POOL_TIMEOUT_SECONDS = 10.0
+try:
+    DB_READ_MMAP_MB = max(0, min(4096, int(os.environ.get('DB_READ_MMAP_MB', '256'))))
+except (TypeError, ValueError):
+    DB_READ_MMAP_MB = 256
+try:
+    DB_READ_CACHE_MB = max(1, min(1024, int(os.environ.get('DB_READ_CACHE_MB', '16'))))
+except (TypeError, ValueError):
+    DB_READ_CACHE_MB = 16
+
+
+class _ReadPool:
+    """Bounded LIFO pool of read-only connections (most recently used first, so hot page caches get reused).
+    acquire() waits up to timeout when every connection is leased; wait time and reuse are tracked for sizing."""
+
+    def __init__(self, size, timeout, mmap_mb, cache_mb):
+        self.size = size
+        self.timeout = timeout
+        self.mmap_bytes = mmap_mb * 1024 * 1024
+        self.cache_kb = cache_mb * 1024
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._path = None
+        self._created = 0
+        self._in_use = 0
+        self._acquired = 0
+        self._reused = 0
+        self._waited = 0
+        self._timeouts = 0
+        self._max_in_use = 0
+        self._wait_ms = deque(maxlen=500)
+
+    def _connect(self, path):
+        _ensure_schema(path)
+        uri = 'file:%s?mode=ro' % os.path.abspath(path).replace('?', '%3f').replace('#', '%23')
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute('PRAGMA query_only=1')
+        conn.execute('PRAGMA busy_timeout=5000')
+        conn.execute('PRAGMA mmap_size=%d' % self.mmap_bytes)
+        conn.execute('PRAGMA cache_size=-%d' % self.cache_kb)
+        return conn
+
+    def acquire(self):
+        """Lease a connection: an idle one, a new one while under size, else wait. Raises TimeoutError when exhausted."""
+        path = _db_path()
+        t0 = time.perf_counter()
+        conn = None
+        with self._lock:
+            if path != self._path:
+                self._drain()
+                self._path = path
+            self._acquired += 1
+            try:
+                conn = self._idle.get_nowait()
+                self._reused += 1
+            except queue.Empty:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if conn is not None or create:
+                self._in_use += 1
+                self._max_in_use = max(self._max_in_use, self._in_use)
+        if conn is None and create:
+            try:
+                conn = self._connect(path)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                    self._in_use -= 1
+                raise
+        elif conn is None:
+            self._waited += 1
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                self._timeouts += 1
+                raise TimeoutError('read pool exhausted (%d connections busy)' % self.size)
+            with self._lock:
+                self._reused += 1
+                self._in_use += 1
+                self._max_in_use = max(self._max_in_use, self._in_use)
+        self._wait_ms.append(1000.0 * (time.perf_counter() - t0))
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            self._in_use -= 1
+            stale = self._path != _db_path()
+            if stale:
+                self._created -= 1
+        if stale:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    def _drain(self):
+        """Close idle connections to a previous database path. Caller holds _lock."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+                self._created -= 1
+            except queue.Empty:
+                return
+
+    def stats(self):
+        """Pool size, leases, connection reuse and acquire wait (recent average / p95 / max)."""
+        recent = sorted(self._wait_ms)
+        return {
+            'size': self.size,
+            'open': self._created,
+            'in_use': self._in_use,
+            'max_in_use': self._max_in_use,
+            'acquired': self._acquired,
+            'reused': self._reused,
+            'reuse_ratio': round(self._reused / self._acquired, 3) if self._acquired else None,
+            'waited': self._waited,
+            'timeouts': self._timeouts,
+            'avg_wait_ms': round(sum(recent) / len(recent), 3) if recent else None,
+            'p95_wait_ms': round(recent[int(0.95 * (len(recent) - 1))], 3) if recent else None,
+            'max_wait_ms': round(recent[-1], 3) if recent else None,
+        }
+
+
+_read_pool = _ReadPool(DB_READ_POOL_SIZE, DB_READ_POOL_TIMEOUT_SECONDS, DB_READ_MMAP_MB, DB_READ_CACHE_MB)
+
+
+def _read_cursor():
+    """Cursor on a read-only pooled connection leased to the current request and returned at teardown. Reads only:
+    writes go through get_cursor() or _db_writer. Outside a request context this is get_cursor()."""
+    if not has_request_context():
+        return get_cursor()
+    cur = g.get('_read_cur')
+    if cur is None:
+        g._read_conn = _read_pool.acquire()
+        cur = g._read_cur = g._read_conn.cursor()
+    return cur
+
+
+@app.teardown_request
+def _release_read_connection(exc=None):
+    conn = g.pop('_read_conn', None)
+    cur = g.pop('_read_cur', None)
+    if conn is not None:
+        try:
+            cur.close()
+        except Exception:
+            pass
+        _read_pool.release(conn)
+
 # Bootstrap main thread DB and default data
 get_conn()
 try:
@@ -1158,9 +2067,8 @@ try:
 except Exception:
     pass
 
-# Video recording state (shared across request threads; VideoWriter is not thread-safe)
+# Video recording state (shared across request threads); per-camera writers live in _recording_writers
 is_recording = False
-out = None
 _recording_lock = threading.Lock()
 
 # Recording gather config (what to record): event_types, capture_audio, capture_thermal, capture_wifi, ai_detail
@@ -1182,16 +2090,9 @@ _ai_pipeline_state = {
     'confidence_estimate': None,
 }
 
-# Temporal consistency (research: reduce false positives — require 2 of last 3 frames to agree)
-_event_history = deque(maxlen=3)
-_pose_history = deque(maxlen=5)   # pose temporal smoothing (majority vote) to reduce Standing <-> Person down jitter
-_scene_history = deque(maxlen=5)  # scene temporal smoothing so Indoor/Outdoor does not flip every frame
 # Event deduplication: same (event_type, camera_id) within 5s not re-inserted
 _LAST_EVENT_DEDUPE_SEC = 5
 _last_event_insert = {}  # (ev_type, camera_id) -> unix timestamp
-_last_motion_time = 0.0  # for idle-skip: last time motion was detected
-# Fall detection: only emit "Fall Detected" if person was upright recently (reduces "in bed" false positives)
-_last_upright_pose_time = {}  # camera_id -> time.time() when last seen Standing/Walking
 
 # Optional audio (PyAudio + SpeechRecognition) — extended: transcription + energy, duration for analysis
 def _env_audio_enabled():
@@ -1561,13 +2462,22 @@ try:
 except Exception:
     pass
 
-# Motion detection: previous frame and threshold; optional MOG2 backend (DATA_POINT_ACCURACY_RATING; IEEE)
-_prev_frame = None
-_motion_bg_subtractor = None
+# Motion detection threshold; optional MOG2 backend (DATA_POINT_ACCURACY_RATING; IEEE). Per-camera state in _CameraAnalyticsState.
 try:
     MOTION_THRESHOLD = max(100, min(10000, int(os.environ.get('MOTION_THRESHOLD', '500'))))
 except (TypeError, ValueError):
     MOTION_THRESHOLD = 500
+# Motion gating: run motion on a downscaled frame first and skip detection/pose/emotion/LPR when the scene is still,
+# except every MOTION_GATE_KEEPALIVE_SECONDS so stationary people are still re-checked.
+MOTION_GATE_ENABLED = os.environ.get('MOTION_GATE', '').strip().lower() in ('1', 'true', 'yes')
+try:
+    MOTION_GATE_WIDTH = max(0, min(1280, int(os.environ.get('MOTION_GATE_WIDTH', '320'))))
+except (TypeError, ValueError):
+    MOTION_GATE_WIDTH = 320
+try:
+    MOTION_GATE_KEEPALIVE_SECONDS = max(0, min(3600, int(os.environ.get('MOTION_GATE_KEEPALIVE_SECONDS', '60'))))
+except (TypeError, ValueError):
+    MOTION_GATE_KEEPALIVE_SECONDS = 60
 VEHICLE_CLASSES = {'car', 'truck', 'bus', 'motorcycle'}
 
 # Loitering / line-crossing config (from config.json or defaults)
@@ -1629,11 +2539,196 @@ def _apply_homography(camera_id, nx, ny):
         return round(wx, 4), round(wy, 4)
     except (TypeError, IndexError, ZeroDivisionError):
         return None, None
-_zone_ticks = {}  # zone_index -> consecutive cycles with person in zone
-_prev_centroids = []  # for line-cross detection
-_line_cross_pending = []  # list of (side, count): confirm centroid stayed on opposite side for N cycles (BEST_PATH_FORWARD Phase 2.3)
-_primary_centroid_history = deque(maxlen=5)  # PLAN_90_PLUS: moving avg for line-cross (IEEE/Springer)
-_prev_smoothed_primary = None  # (cx, cy) pixel for previous frame
+
+
+# Per-track attribute cache: each camera keeps its own Ultralytics BYTETracker (model.track() would share one tracker
+# across every camera using the model) and caches the primary person's expensive attributes by track ID. Refresh policy
+# per group: appearance and emotion every N seconds, demographics once per track (0 = once), identity until a watchlist
+# match reaches WATCHLIST_SIMILARITY_THRESHOLD. Perception skips a group while its cached value is fresh.
+ATTRIBUTE_CACHE_ENABLED = os.environ.get('ATTRIBUTE_CACHE', '1').strip().lower() in ('1', 'true', 'yes')
+ATTRIBUTE_CACHE_TRACKER = (os.environ.get('ATTRIBUTE_CACHE_TRACKER') or 'bytetrack.yaml').strip()
+try:
+    ATTRIBUTE_CACHE_TTL_SECONDS = max(5.0, min(600.0, float(os.environ.get('ATTRIBUTE_CACHE_TTL_SECONDS', '30'))))
+except (TypeError, ValueError):
+    ATTRIBUTE_CACHE_TTL_SECONDS = 30.0
+_ATTRIBUTE_GROUPS = {
+    'appearance': ('estimated_height_cm', 'build', 'hair_color', 'clothing_description'),
+    'demographics': ('perceived_gender', 'perceived_age', 'perceived_age_range', 'perceived_ethnicity'),
+    'emotion': ('emotion',),
+    'identity': ('individual', 'face_match_confidence'),
+}
+_ATTRIBUTE_REFRESH_SECONDS = {}  # group -> seconds between recomputes; 0 = once per track; identity is threshold-driven
+for _group, _env, _default in (('appearance', 'ATTR_REFRESH_APPEARANCE_SECONDS', '15'), ('demographics', 'ATTR_REFRESH_DEMOGRAPHICS_SECONDS', '0'),
+                               ('emotion', 'ATTR_REFRESH_EMOTION_SECONDS', '3')):
+    try:
+        _ATTRIBUTE_REFRESH_SECONDS[_group] = max(0.0, min(3600.0, float(os.environ.get(_env, _default))))
+    except (TypeError, ValueError):
+        _ATTRIBUTE_REFRESH_SECONDS[_group] = float(_default)
+
+
+def _new_object_tracker():
+    """Ultralytics BYTETracker/BOTSORT for one camera from ATTRIBUTE_CACHE_TRACKER, or None (logged) when it cannot be built:
+    ultralytics or vigil_upgrade missing, or a bad tracker yaml. Without a tracker no attributes are cached per track."""
+    try:
+        from vigil_upgrade.models import new_tracker
+        return new_tracker(ATTRIBUTE_CACHE_TRACKER, frame_rate=30)
+    except Exception as e:
+        logging.getLogger(__name__).warning('No object tracker (%s): per-track attribute cache and LPR votes fall back to '
+                                            'untracked frames: %s', ATTRIBUTE_CACHE_TRACKER, e)
+        return None
+
+
+class _TrackAttributeCache:
+    """One camera's tracker plus its track_id -> {group: (values, computed_at)} cache with hit/miss counters.
+    Used only from that camera's analysis run (one at a time), so no locking."""
+
+    def __init__(self, camera_id):
+        self.camera_id = camera_id
+        self._tracker = None
+        self._tracker_failed = False
+        self._entries = {}  # track_id -> {'seen': ts, 'groups': {group: (values dict, computed_at)}, 'identity_generation': n}
+        self.last_primary_track = None
+        self.hits = Counter()
+        self.misses = Counter()
+        self.untracked = 0  # frames whose primary person had no track ID (no tracker or track not confirmed yet)
+
+    def assign(self, dets, frame):
+        """Update the tracker with dets (all classes) and write track IDs into dets.ids. Returns the primary person's track ID."""
+        if self._tracker is None and not self._tracker_failed:
+            self._tracker = _new_object_tracker()
+            self._tracker_failed = self._tracker is None
+        if self._tracker is not None:
+            try:
+                from vigil_upgrade.models import OnnxBoxes
+                tracks = self._tracker.update(OnnxBoxes(dets.xyxy, dets.conf, dets.cls), frame)
+                if len(tracks):  # rows: x1, y1, x2, y2, track_id, score, cls, det_idx
+                    dets.ids[tracks[:, -1].astype(np.int64)] = tracks[:, 4].astype(np.int64)
+            except Exception as e:
+                logging.getLogger(__name__).debug('Tracker update failed for camera %s: %s', self.camera_id, e)
+        self.last_primary_track = dets.track_id(dets.primary)
+        return self.last_primary_track
+
+    def fresh_groups(self, track_id, now=None):
+        """Groups whose cached values for track_id are still valid under their refresh policy (perception may skip them)."""
+        entry = self._entries.get(track_id) if track_id is not None else None
+        if entry is None:
+            return frozenset()
+        now = time.time() if now is None else now
+        fresh = set()
+        for group, (values, computed_at) in entry['groups'].items():
+            if group == 'identity':
+                threshold = float(os.environ.get('WATCHLIST_SIMILARITY_THRESHOLD', '0.6'))
+                ok = (entry.get('identity_generation') == _watchlist_gallery.generation
+                      and values.get('individual') not in (None, 'Stranger') and (values.get('face_match_confidence') or 0) >= threshold)
+            elif _ATTRIBUTE_REFRESH_SECONDS.get(group, 0) == 0:
+                ok = any(v is not None for v in values.values())
+            else:
+                ok = now - computed_at < _ATTRIBUTE_REFRESH_SECONDS[group]
+            if ok:
+                fresh.add(group)
+        return frozenset(fresh)
+
+    def resolve(self, perception, now=None):
+        """Store groups perception computed for the primary track and fill the ones it skipped from the cache.
+        Mutates perception['emotion'] / perception['attributes'] and sets perception['identity'] (cached watchlist fields or None)."""
+        now = time.time() if now is None else now
+        track_id = perception['dets'].track_id(perception['dets'].primary)
+        perception['identity'] = None
+        if track_id is None:
+            if perception['dets'].primary is not None:
+                self.untracked += 1
+            self._prune(now)
+            return
+        entry = self._entries.setdefault(track_id, {'seen': now, 'groups': {}})
+        entry['seen'] = now
+        attrs = perception['attributes']
+        for group in perception.get('skipped', ()):
+            cached = entry['groups'].get(group)
+            if group == 'identity' and entry.get('identity_generation') != _watchlist_gallery.generation:
+                cached = None  # watchlist changed since the match was cached
+            if cached is None:  # skip was predicted for another track (ANALYZE_MODE=process): nothing to reuse this frame
+                self.misses[group] += 1
+                continue
+            self.hits[group] += 1
+            if group == 'emotion':
+                perception['emotion'] = cached[0]['emotion']
+            elif group == 'identity':
+                perception['identity'] = dict(cached[0])
+            else:
+                attrs.update(cached[0])
+        for group in perception.get('computed', ()):
+            self.misses[group] += 1
+            if group == 'emotion':
+                entry['groups'][group] = ({'emotion': perception['emotion']}, now)
+            elif group != 'identity':  # identity is stored after watchlist matching (store_identity)
+                entry['groups'][group] = ({k: attrs.get(k) for k in _ATTRIBUTE_GROUPS[group]}, now)
+        self._prune(now)
+
+    def store_identity(self, track_id, data, now=None):
+        """Cache the watchlist fields written into data for track_id, tagged with the watchlist gallery generation."""
+        if track_id is None or track_id not in self._entries:
+            return
+        self._entries[track_id]['identity_generation'] = _watchlist_gallery.generation
+        self._entries[track_id]['groups']['identity'] = ({k: data.get(k) for k in _ATTRIBUTE_GROUPS['identity']}, time.time() if now is None else now)
+
+    def _prune(self, now):
+        for tid in [t for t, e in self._entries.items() if now - e['seen'] > ATTRIBUTE_CACHE_TTL_SECONDS]:
+            del self._entries[tid]
+
+    def stats(self):
+        return {
+            'tracker': type(self._tracker).__name__ if self._tracker is not None else None,
+            'tracks': len(self._entries),
+            'hits': dict(self.hits),
+            'misses': dict(self.misses),
+            'untracked_frames': self.untracked,
+        }
+
+
+class _CameraAnalyticsState:
+    """Per-camera temporal analytics state (smoothing, loiter, line-cross, motion) plus analysis scheduler bookkeeping."""
+
+    def __init__(self, camera_id):
+        self.camera_id = camera_id
+        # Temporal consistency (research: reduce false positives — require 2 of last 3 frames to agree)
+        self.event_history = deque(maxlen=3)
+        self.pose_history = deque(maxlen=5)  # pose majority vote to reduce Standing <-> Person down jitter
+        self.scene_history = deque(maxlen=5)  # so Indoor/Outdoor does not flip every frame
+        self.zone_ticks = {}  # zone_index -> consecutive cycles with person in zone
+        self.prev_centroids = []  # for line-cross detection
+        self.line_cross_pending = []  # (line, side, count): confirm centroid stayed on opposite side for N cycles (BEST_PATH_FORWARD Phase 2.3)
+        self.primary_centroid_history = deque(maxlen=5)  # PLAN_90_PLUS: moving avg for line-cross (IEEE/Springer)
+        self.prev_smoothed_primary = None  # (cx, cy) pixel for previous analysis
+        self.prev_motion_gray = None  # framediff motion: previous blurred gray frame
+        self.motion_bg_subtractor = None  # MOG2 motion backend
+        self.last_motion_time = 0.0  # for idle-skip
+        self.last_inference_time = 0.0  # motion gate keep-alive
+        self.inferences_executed = 0
+        self.inferences_skipped = 0  # motion gate: still scene, full pipeline not run
+        # Fall detection: only emit "Fall Detected" if person was upright recently (reduces "in bed" false positives)
+        self.last_upright_pose_time = 0.0
+        self.attribute_cache = _TrackAttributeCache(camera_id) if ATTRIBUTE_CACHE_ENABLED else None
+        # Scheduler bookkeeping
+        self.last_seq = 0
+        self.next_due = 0.0
+        self.busy = False
+        self.runs = 0
+        self.overruns = 0  # dispatches skipped because the previous analysis was still running
+        self.last_duration = None
+        self.last_run_at = None
+
+
+_analytics_states = {}  # camera_id -> _CameraAnalyticsState
+_analytics_states_lock = threading.Lock()
+
+
+def _get_analytics_state(camera_id):
+    """Return (creating on first use) the analytics state for camera_id."""
+    with _analytics_states_lock:
+        state = _analytics_states.get(camera_id)
+        if state is None:
+            state = _analytics_states[camera_id] = _CameraAnalyticsState(camera_id)
+        return state
 
 
 def _point_in_polygon(px, py, poly):
@@ -1674,66 +2769,29 @@ def _point_side_of_line(cx, cy, line):
     return 0
 
 
-def _get_person_centroids(frame, results):
+def _get_person_centroids(frame, dets):
     """Return list of (cx, cy) for 'person' detections in pixel coords."""
-    if not results or not results[0].boxes:
+    if dets is None or not dets.person.any():
         return []
-    h, w = frame.shape[:2]
-    centroids = []
-    names = results[0].names
-    boxes = results[0].boxes
-    for i, cls in enumerate(boxes.cls):
-        if names.get(int(cls), '').lower() != 'person':
-            continue
-        xyxy = boxes.xyxy[i].cpu().numpy()
-        cx = (xyxy[0] + xyxy[2]) / 2
-        cy = (xyxy[1] + xyxy[3]) / 2
-        centroids.append((float(cx), float(cy)))
-    return centroids
+    return [(float(cx), float(cy)) for cx, cy in dets.centroids(dets.person)]
 
 
-def _get_primary_centroid_pixel(frame, results):
+def _get_primary_centroid_pixel(frame, dets):
     """Return (cx, cy) in pixel coords for primary (largest) person, or None. Used for centroid smoothing (PLAN_90_PLUS)."""
-    if not results or not results[0].boxes or not frame.size:
+    if dets is None or dets.primary is None or not frame.size:
         return None
-    names = results[0].names
-    boxes = results[0].boxes
-    best = None
-    best_area = 0
-    for i, cls in enumerate(boxes.cls):
-        if names.get(int(cls), '').lower() != 'person':
-            continue
-        xyxy = boxes.xyxy[i].cpu().numpy()
-        area = (xyxy[2] - xyxy[0]) * (xyxy[3] - xyxy[1])
-        if area > best_area:
-            best_area = area
-            cx = (xyxy[0] + xyxy[2]) / 2
-            cy = (xyxy[1] + xyxy[3]) / 2
-            best = (float(cx), float(cy))
-    return best
+    x1, y1, x2, y2 = dets.box(dets.primary)
+    return ((x1 + x2) / 2, (y1 + y2) / 2)
 
 
-def _get_primary_centroid_normalized(frame, results):
+def _get_primary_centroid_normalized(frame, dets):
     """Return (nx, ny) in [0,1] for primary person (largest bbox), or (None, None). For spatial heatmaps (see docs/MAPPING_OPTIMIZATION_RESEARCH.md)."""
-    if not results or not results[0].boxes or not frame.size:
+    if dets is None or not frame.size:
         return None, None
     h, w = frame.shape[:2]
     if w <= 0 or h <= 0:
         return None, None
-    names = results[0].names
-    boxes = results[0].boxes
-    best = None
-    best_area = 0
-    for i, cls in enumerate(boxes.cls):
-        if names.get(int(cls), '').lower() != 'person':
-            continue
-        xyxy = boxes.xyxy[i].cpu().numpy()
-        area = (xyxy[2] - xyxy[0]) * (xyxy[3] - xyxy[1])
-        if area > best_area:
-            best_area = area
-            cx = (xyxy[0] + xyxy[2]) / 2
-            cy = (xyxy[1] + xyxy[3]) / 2
-            best = (float(cx), float(cy))
+    best = _get_primary_centroid_pixel(frame, dets)
     if best is None:
         return None, None
     nx = max(0.0, min(1.0, best[0] / w))
@@ -1741,21 +2799,21 @@ def _get_primary_centroid_normalized(frame, results):
     return nx, ny
 
 
-def _detect_person_down(frame, results, results_pose):
+def _detect_person_down(frame, dets, results_pose, index=None):
     """
-    Pose-based heuristic for person down (possible fall): single person, horizontal torso and/or
+    Pose-based heuristic for person down (possible fall): horizontal torso and/or
     wide bbox (width > height). Uses MediaPipe landmarks: shoulder (11,12) vs hip (23,24).
-    Returns True if person-down pattern detected.
+    index: detection row the landmarks belong to (per-person crop from _pose_context); None = full-frame landmarks,
+    only trusted when exactly one person is in view. Returns True if person-down pattern detected.
     """
-    if not results or not results[0].boxes or not MEDIAPIPE_AVAILABLE or not results_pose or not getattr(results_pose, 'pose_landmarks', None):
+    if dets is None or not len(dets) or not MEDIAPIPE_AVAILABLE or not results_pose or not getattr(results_pose, 'pose_landmarks', None):
         return False
-    names = getattr(results[0], 'names', None) or {}
-    boxes = results[0].boxes
-    person_idxs = [i for i in range(len(boxes.cls)) if names.get(int(boxes.cls[i]), '').lower() == 'person']
-    if len(person_idxs) != 1:
-        return False
-    idx = person_idxs[0]
-    xyxy = boxes.xyxy[idx].cpu().numpy()
+    if index is None:
+        person_idxs = dets.person_indices()
+        if len(person_idxs) != 1:
+            return False
+        index = person_idxs[0]
+    xyxy = dets.xyxy[index]
     w = xyxy[2] - xyxy[0]
     h = xyxy[3] - xyxy[1]
     if h <= 0:
@@ -1846,19 +2904,61 @@ def _pose_label_from_landmarks(results_pose):
     return 'Standing'
 
 
-def check_loiter_and_line_cross(frame, results):
+try:
+    POSE_MAX_PERSONS = max(1, min(16, int(os.environ.get('POSE_MAX_PERSONS', '4'))))
+except (TypeError, ValueError):
+    POSE_MAX_PERSONS = 4
+
+
+def _pose_context(frame, dets):
+    """Pose stage, run once per analysed frame: MediaPipe once per person crop (largest POSE_MAX_PERSONS persons, padded
+    15%), each crop converted BGR->RGB once; one full-frame pass only when no crop is usable. Returns
+    {'persons': [{'index', 'results', 'label', 'down'}], 'primary': entry of dets.primary (else the largest) or None}.
+    _pose_label_from_landmarks, _detect_person_down, _gait_notes_from_pose and the attribute extractors read these results."""
+    ctx = {'persons': [], 'primary': None}
+    if not (MEDIAPIPE_AVAILABLE and mp_pose):
+        return ctx
+    min_crop = max(32, min(64, int(os.environ.get('POSE_MIN_CROP_SIZE', '48'))))
+    h, w = frame.shape[:2]
+    idxs = dets.person_indices()
+    for i in idxs[np.argsort(-dets.areas[idxs], kind='stable')][:POSE_MAX_PERSONS]:
+        bx1, by1, bx2, by2 = dets.box(i)
+        pad_w, pad_h = 0.15 * (bx2 - bx1), 0.15 * (by2 - by1)
+        x1, y1 = max(0, int(bx1 - pad_w)), max(0, int(by1 - pad_h))
+        x2, y2 = min(w, int(bx2 + pad_w)), min(h, int(by2 + pad_h))
+        if (y2 - y1) < min_crop or (x2 - x1) < min_crop:
+            continue
+        results = _mp_pose_process(cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2RGB))
+        label = _pose_label_from_landmarks(results)
+        entry = {'index': int(i), 'results': results, 'label': label,
+                 'down': label in ('Standing', 'Walking') and _detect_person_down(frame, dets, results, index=int(i))}
+        ctx['persons'].append(entry)
+        if dets.primary is not None and int(i) == dets.primary:
+            ctx['primary'] = entry
+    if not ctx['persons']:
+        results = _mp_pose_process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        label = _pose_label_from_landmarks(results)
+        ctx['persons'].append({'index': None, 'results': results, 'label': label,
+                               'down': label in ('Standing', 'Walking') and _detect_person_down(frame, dets, results)})
+    if ctx['primary'] is None:
+        ctx['primary'] = ctx['persons'][0]
+    return ctx
+
+
+def check_loiter_and_line_cross(frame, dets, state=None):
     """Update zone ticks, check line cross. Returns (loiter_detected, line_cross_detected, zones_with_person).
     Line-cross debounce (BEST_PATH_FORWARD Phase 2.3): require centroid to stay on opposite side for 1-2 cycles.
-    PLAN_90_PLUS: optional centroid smoothing (moving avg over K frames) for primary person (IEEE/Springer)."""
-    global _zone_ticks, _prev_centroids, _line_cross_pending, _primary_centroid_history, _prev_smoothed_primary
+    PLAN_90_PLUS: optional centroid smoothing (moving avg over K frames) for primary person (IEEE/Springer).
+    state: the camera's _CameraAnalyticsState (default camera '0')."""
+    state = state if state is not None else _get_analytics_state('0')
     h, w = frame.shape[:2]
-    centroids = _get_person_centroids(frame, results)
+    centroids = _get_person_centroids(frame, dets)
     smooth_frames = max(0, min(10, int(os.environ.get('CENTROID_SMOOTHING_FRAMES', '5'))))
-    primary_px = _get_primary_centroid_pixel(frame, results)
+    primary_px = _get_primary_centroid_pixel(frame, dets)
     if primary_px and smooth_frames > 0:
-        _primary_centroid_history.append(primary_px)
-        n = len(_primary_centroid_history)
-        smoothed_primary = (sum(p[0] for p in _primary_centroid_history) / n, sum(p[1] for p in _primary_centroid_history) / n)
+        state.primary_centroid_history.append(primary_px)
+        n = len(state.primary_centroid_history)
+        smoothed_primary = (sum(p[0] for p in state.primary_centroid_history) / n, sum(p[1] for p in state.primary_centroid_history) / n)
     else:
         smoothed_primary = primary_px
     zones = _analytics_config.get('loiter_zones', [])
@@ -1873,36 +2973,36 @@ def check_loiter_and_line_cross(frame, results):
         any_in = any(_point_in_polygon(cx, cy, pixel_poly) for cx, cy in centroids)
         if any_in:
             zones_with_person.append(zi)
-            _zone_ticks[zi] = _zone_ticks.get(zi, 0) + 1
-            if _zone_ticks[zi] >= loiter_cycles:
+            state.zone_ticks[zi] = state.zone_ticks.get(zi, 0) + 1
+            if state.zone_ticks[zi] >= loiter_cycles:
                 loiter_detected = True
-                _zone_ticks[zi] = 0
+                state.zone_ticks[zi] = 0
         else:
-            _zone_ticks[zi] = 0
+            state.zone_ticks[zi] = 0
     # Line cross with debounce; optionally use smoothed primary segment (PLAN_90_PLUS)
     lines_pixel = []
     for line in _analytics_config.get('crossing_lines', []):
         x1, y1, x2, y2 = line[0] * w, line[1] * h, line[2] * w, line[3] * h
         lines_pixel.append((x1, y1, x2, y2))
     for line_pixel in lines_pixel:
-        if smooth_frames > 0 and _prev_smoothed_primary is not None and smoothed_primary is not None:
-            if _segment_crosses_line(_prev_smoothed_primary, smoothed_primary, line_pixel):
+        if smooth_frames > 0 and state.prev_smoothed_primary is not None and smoothed_primary is not None:
+            if _segment_crosses_line(state.prev_smoothed_primary, smoothed_primary, line_pixel):
                 side_curr = _point_side_of_line(smoothed_primary[0], smoothed_primary[1], line_pixel)
                 if side_curr != 0:
-                    _line_cross_pending.append((line_pixel, side_curr, 0))
+                    state.line_cross_pending.append((line_pixel, side_curr, 0))
         for curr in centroids:
-            for prev in _prev_centroids:
+            for prev in state.prev_centroids:
                 if _segment_crosses_line(prev, curr, line_pixel):
                     side_curr = _point_side_of_line(curr[0], curr[1], line_pixel)
                     if side_curr != 0:
-                        _line_cross_pending.append((line_pixel, side_curr, 0))
+                        state.line_cross_pending.append((line_pixel, side_curr, 0))
                     break
     # Confirm pending: any centroid on same side this frame?
     still_pending = []
     check_centroids = list(centroids)
     if smoothed_primary and smooth_frames > 0:
         check_centroids.append(smoothed_primary)
-    for line_pixel, side, count in _line_cross_pending:
+    for line_pixel, side, count in state.line_cross_pending:
         any_on_side = any(_point_side_of_line(cx, cy, line_pixel) == side for cx, cy in check_centroids)
         if any_on_side:
             count += 1
@@ -1910,17 +3010,19 @@ def check_loiter_and_line_cross(frame, results):
                 line_cross_detected = True
             else:
                 still_pending.append((line_pixel, side, count))
-    _line_cross_pending = still_pending[:6]  # cap pending entries
-    _prev_centroids = centroids
-    _prev_smoothed_primary = smoothed_primary
+    state.line_cross_pending = still_pending[:6]  # cap pending entries
+    state.prev_centroids = centroids
+    state.prev_smoothed_primary = smoothed_primary
     return loiter_detected, line_cross_detected, zones_with_person
 
 
-def detect_motion(frame):
-    global _prev_frame, _motion_bg_subtractor
+def detect_motion(frame, state=None, threshold=None):
+    """True when the changed-pixel count exceeds threshold (default MOTION_THRESHOLD; framediff or MOG2). state: the camera's _CameraAnalyticsState (default camera '0')."""
+    state = state if state is not None else _get_analytics_state('0')
+    threshold = MOTION_THRESHOLD if threshold is None else threshold
     backend = (os.environ.get('MOTION_BACKEND') or 'framediff').strip().lower()
     if backend == 'mog2':
-        if _motion_bg_subtractor is None:
+        if state.motion_bg_subtractor is None:
             var_t = 16
             try:
                 vt = int(os.environ.get('MOTION_MOG2_VAR_THRESHOLD', '16'))
@@ -1928,24 +3030,34 @@ def detect_motion(frame):
                     var_t = vt
             except (TypeError, ValueError):
                 pass
-            _motion_bg_subtractor = cv2.createBackgroundSubtractorMOG2(history=500, detectShadows=True, varThreshold=var_t)
+            state.motion_bg_subtractor = cv2.createBackgroundSubtractorMOG2(history=500, detectShadows=True, varThreshold=var_t)
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        fg = _motion_bg_subtractor.apply(gray)
+        fg = state.motion_bg_subtractor.apply(gray)
         fg[fg == 127] = 0
         kernel = np.ones((3, 3), np.uint8)
         fg = cv2.morphologyEx(fg, cv2.MORPH_OPEN, kernel)
         count = int(np.sum(fg > 0))
-        return count > MOTION_THRESHOLD
+        return count > threshold
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     gray = cv2.GaussianBlur(gray, (21, 21), 0)
-    if _prev_frame is None:
-        _prev_frame = gray.copy()
+    if state.prev_motion_gray is None:
+        state.prev_motion_gray = gray.copy()
         return False
-    diff = cv2.absdiff(_prev_frame, gray)
+    diff = cv2.absdiff(state.prev_motion_gray, gray)
     _, thresh = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)
     count = int(np.sum(thresh) / 255)
-    _prev_frame = gray.copy()
-    return count > MOTION_THRESHOLD
+    state.prev_motion_gray = gray.copy()
+    return count > threshold
+
+
+def _detect_motion_gate(frame, state):
+    """Cheap motion check on a MOTION_GATE_WIDTH downscale; MOTION_THRESHOLD is scaled by the area ratio so sensitivity matches full res."""
+    h, w = frame.shape[:2]
+    if MOTION_GATE_WIDTH > 0 and w > MOTION_GATE_WIDTH:
+        scale = MOTION_GATE_WIDTH / float(w)
+        small = cv2.resize(frame, (MOTION_GATE_WIDTH, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        return detect_motion(small, state, threshold=max(1, int(MOTION_THRESHOLD * scale * scale)))
+    return detect_motion(frame, state)
 
 
 _ENABLE_LPR_PREPROCESS = os.environ.get('ENABLE_LPR_PREPROCESS', '1').strip().lower() in ('1', 'true', 'yes')
@@ -1960,7 +3072,9 @@ def _lpr_preprocess(roi):
         roi = cv2.resize(roi, (max(160, w * 2), max(48, h * 2)), interpolation=cv2.INTER_CUBIC)
     gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if len(roi.shape) == 3 else roi
     try:
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        clahe = getattr(_lpr_local, 'clahe', None)
+        if clahe is None:  # cached per OCR worker thread (CLAHE objects are not thread-safe)
+            clahe = _lpr_local.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
         gray = clahe.apply(gray)
     except Exception:
         pass
@@ -1970,32 +3084,190 @@ def _lpr_preprocess(roi):
     return thresh
 
 
-def lpr_on_vehicle_roi(frame, results):
-    if not results or not results[0].boxes:
-        return 'N/A'
-    names = results[0].names
-    boxes = results[0].boxes
-    for i, cls in enumerate(boxes.cls):
-        name = names.get(int(cls), '')
-        if name.lower() in VEHICLE_CLASSES:
-            xyxy = boxes.xyxy[i].cpu().numpy()
-            x1, y1, x2, y2 = map(int, xyxy)
+def _lpr_read_plate(roi):
+    """Synchronous OCR of one vehicle ROI (BGR): preprocess, Tesseract, keep alphanumerics/spaces. '' when nothing was read."""
+    if _ENABLE_LPR_PREPROCESS:
+        roi = _lpr_preprocess(roi)
+    if roi is None:
+        return ''
+    try:
+        text = pytesseract.image_to_string(roi).strip()
+    except Exception:
+        return ''
+    return ' '.join(''.join(c for c in text if c.isalnum() or c.isspace()).split())[:20]
+
+
+# Asynchronous LPR: the analysis loop only crops vehicle ROIs and queues them; LPR_WORKERS threads run Tesseract (a
+# subprocess per call, hundreds of ms) off the loop. Each vehicle track (track ID from the per-camera tracker, else a
+# coarse position cell) is read up to LPR_OCR_VOTES times and its plate is only written once LPR_MIN_AGREEMENT reads
+# agree. The queue is bounded: when OCR falls behind, new ROIs are dropped rather than delaying analysis.
+try:
+    LPR_WORKERS = max(1, min(8, int(os.environ.get('LPR_WORKERS', '2'))))
+except (TypeError, ValueError):
+    LPR_WORKERS = 2
+try:
+    LPR_QUEUE_SIZE = max(1, min(256, int(os.environ.get('LPR_QUEUE_SIZE', '16'))))
+except (TypeError, ValueError):
+    LPR_QUEUE_SIZE = 16
+try:
+    LPR_OCR_VOTES = max(1, min(9, int(os.environ.get('LPR_OCR_VOTES', '3'))))
+except (TypeError, ValueError):
+    LPR_OCR_VOTES = 3
+try:
+    LPR_MIN_AGREEMENT = max(1, min(LPR_OCR_VOTES, int(os.environ.get('LPR_MIN_AGREEMENT', '2'))))
+except (TypeError, ValueError):
+    LPR_MIN_AGREEMENT = min(2, LPR_OCR_VOTES)
+try:
+    LPR_TRACK_TTL_SECONDS = max(5.0, min(3600.0, float(os.environ.get('LPR_TRACK_TTL_SECONDS', '60'))))
+except (TypeError, ValueError):
+    LPR_TRACK_TTL_SECONDS = 60.0
+try:
+    LPR_RETRY_MAX_SECONDS = max(1.0, min(600.0, float(os.environ.get('LPR_RETRY_MAX_SECONDS', '30'))))
+except (TypeError, ValueError):
+    LPR_RETRY_MAX_SECONDS = 30.0
+_lpr_local = threading.local()
+
+
+class _LprOcrPool:
+    """Bounded OCR queue plus per-(camera, vehicle track) vote state. submit() never blocks on Tesseract. Votes are taken
+    over a sliding window of the last `votes` reads, so blurry far-away reads age out instead of exhausting the vehicle.
+    Only tracked vehicles keep a decided plate; untracked grid-cell entries are re-voted from their window every frame and
+    dropped as soon as a frame has no vehicle in that cell, so the next car parking there does not inherit the plate.
+    A vehicle still being read after two windows (undecided, or an untracked cell) backs off exponentially, up to
+    LPR_RETRY_MAX_SECONDS between reads, so parked cars do not occupy the OCR queue on every pass."""
+
+    def __init__(self, workers=LPR_WORKERS, queue_size=LPR_QUEUE_SIZE, votes=LPR_OCR_VOTES, min_agreement=LPR_MIN_AGREEMENT,
+                 read=None):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._workers = workers
+        self._votes = votes
+        self._min_agreement = min(min_agreement, votes)
+        self._read = read or _lpr_read_plate
+        self._lock = threading.Lock()
+        self._tracks = {}  # (camera_id, key) -> {'reads': deque[str], 'pending': int, 'plate': str | None, 'seen': ts,
+        #                                          'attempts': int, 'next_at': ts}
+        self._threads = []
+        self.submitted = 0
+        self.dropped = 0
+        self.ocr_runs = 0
+        self.ocr_seconds = 0.0
+        self.decided = 0
+
+    @staticmethod
+    def _vehicle_key(dets, i, frame_shape):
+        """Track ID when tracked; otherwise a ('cell', x, y) 16x16 grid cell of the box centre (parked vehicles keep their cell)."""
+        tid = dets.track_id(i)
+        if tid is not None:
+            return tid
+        x1, y1, x2, y2 = dets.box(i)
+        h, w = frame_shape[:2]
+        return ('cell', int((x1 + x2) / 2 * 16 / max(1, w)), int((y1 + y2) / 2 * 16 / max(1, h)))
+
+    def submit(self, camera_id, frame, dets):
+        """Queue OCR for every vehicle in dets still short of votes and return the voted plate of the largest vehicle that
+        has one, else 'N/A'. Never blocks: ROIs are dropped when the queue is full."""
+        self._ensure_threads()
+        now = time.time()
+        plate, plate_area = None, -1.0
+        with self._lock:
+            for key in [k for k, e in self._tracks.items() if now - e['seen'] > LPR_TRACK_TTL_SECONDS]:
+                del self._tracks[key]
+        for i in dets.indices_of(VEHICLE_CLASSES):
+            x1, y1, x2, y2 = (int(v) for v in dets.xyxy[i])
             x1, y1 = max(0, x1), max(0, y1)
             x2, y2 = min(frame.shape[1], x2), min(frame.shape[0], y2)
             if x2 <= x1 or y2 <= y1:
                 continue
-            roi = frame[y1:y2, x1:x2]
-            if _ENABLE_LPR_PREPROCESS:
-                roi = _lpr_preprocess(roi)
-            if roi is None:
-                continue
+            key = (camera_id, self._vehicle_key(dets, i, frame.shape))
+            with self._lock:
+                entry = self._tracks.get(key)
+                if entry is None:
+                    entry = self._tracks[key] = {'reads': deque(maxlen=self._votes), 'pending': 0, 'plate': None, 'seen': now,
+                                                 'attempts': 0, 'next_at': 0.0}
+                entry['seen'] = now
+                voted = entry['plate'] if entry['plate'] is not None else self._voted(entry['reads'])
+                if voted is not None and dets.areas[i] > plate_area:
+                    plate, plate_area = voted, float(dets.areas[i])
+                if entry['plate'] is not None or entry['pending'] >= self._votes or now < entry['next_at']:
+                    continue
+                entry['pending'] += 1
+                entry['attempts'] += 1
+                retry_at = entry['next_at']
+                extra = entry['attempts'] - 2 * self._votes
+                if extra >= 0:
+                    entry['next_at'] = now + min(LPR_RETRY_MAX_SECONDS, 2.0 ** extra)
+            try:
+                self._queue.put_nowait((key, frame[y1:y2, x1:x2].copy()))
+                with self._lock:
+                    self.submitted += 1
+            except queue.Full:
+                with self._lock:
+                    self.dropped += 1
+                    entry['pending'] -= 1
+                    entry['attempts'] -= 1
+                    entry['next_at'] = retry_at
+        with self._lock:
+            for key in [k for k, e in self._tracks.items()
+                        if k[0] == camera_id and isinstance(k[1], tuple) and k[1][0] == 'cell' and e['seen'] != now]:
+                del self._tracks[key]
+        return plate or 'N/A'
+
+    def _voted(self, reads):
+        """Most common non-empty read in the window when at least min_agreement reads agree, else None."""
+        votes = Counter(r for r in reads if r)
+        if votes:
+            best, count = votes.most_common(1)[0]
+            if count >= self._min_agreement:
+                return best
+        return None
+
+    def _ensure_threads(self):
+        if self._threads:
+            return
+        for n in range(self._workers):
+            t = threading.Thread(target=self._run, daemon=True, name='lpr-ocr-%d' % n)
+            t.start()
+            self._threads.append(t)
+
+    def _run(self):
+        while True:
+            key, roi = self._queue.get()
+            t0 = time.perf_counter()
             try:
-                text = pytesseract.image_to_string(roi).strip()
-                text = ''.join(c for c in text if c.isalnum() or c.isspace())[:20]
-                return text if text else 'N/A'
+                text = self._read(roi)
             except Exception:
-                return 'N/A'
-    return 'N/A'
+                text = ''
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.ocr_runs += 1
+                self.ocr_seconds += elapsed
+                entry = self._tracks.get(key)
+                if entry is None:
+                    continue
+                entry['pending'] = max(0, entry['pending'] - 1)
+                had = self._voted(entry['reads'])
+                entry['reads'].append(text)
+                best = self._voted(entry['reads'])
+                if best is not None and best != had:
+                    self.decided += 1
+                    if not (isinstance(key[1], tuple) and key[1][0] == 'cell'):
+                        entry['plate'] = best
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self._workers,
+                'queued': self._queue.qsize(),
+                'tracks': len(self._tracks),
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'ocr_runs': self.ocr_runs,
+                'avg_ocr_ms': round(self.ocr_seconds * 1000 / self.ocr_runs, 1) if self.ocr_runs else None,
+                'plates_decided': self.decided,
+            }
+
+
+_lpr_pool = _LprOcrPool()
 
 
 # Lazy-loaded emotion recognizer (EmotiEffLib) for TensorFlow-free option
@@ -2023,27 +3295,182 @@ def _preprocess_low_light_emotion(img):
         return img
 
 
-def _get_dominant_emotion(frame, results=None):
-    """Unified emotion from DeepFace (TensorFlow) or EmotiEffLib (PyTorch/ONNX). Returns a single label e.g. Neutral, Happy.
-    Min crop size 48x48 for reliability (BEST_PATH_FORWARD Phase 2.1, ACCURACY_RESEARCH_AND_IMPROVEMENTS).
-    Low-light: CLAHE on L channel when mean intensity < EMOTION_CLAHE_THRESHOLD (Phase 2.1)."""
-    min_crop = max(30, min(64, int(os.environ.get('EMOTION_MIN_CROP_SIZE', '48'))))
+# Shared face-detection stage: one YuNet (cv2.FaceDetectorYN) pass per analysed frame on a downscaled copy. The primary
+# person's face is aligned (eyes levelled) once and reused by emotion, watchlist and demographics with DeepFace's own
+# detector skipped; when no face is found those models are not called at all. FACE_DETECTOR=off restores per-model detection.
+FACE_DETECTOR = (os.environ.get('FACE_DETECTOR') or 'yunet').strip().lower()
+try:
+    FACE_DETECT_SCORE = max(0.1, min(0.99, float(os.environ.get('FACE_DETECT_SCORE', '0.7'))))
+except (TypeError, ValueError):
+    FACE_DETECT_SCORE = 0.7
+try:
+    FACE_DETECT_MAX_WIDTH = max(160, min(1920, int(os.environ.get('FACE_DETECT_MAX_WIDTH', '640'))))
+except (TypeError, ValueError):
+    FACE_DETECT_MAX_WIDTH = 640
+_face_detector_local = threading.local()  # FaceDetectorYN keeps per-call input size: one instance per analysis thread
+_yunet_model_lock = threading.Lock()
+_yunet_model_resolved = None  # path, or '' once resolution failed
+_face_stage_stats = {'frames': 0, 'frames_with_face': 0}
+
+
+# Default YuNet download: opencv_zoo's 2023mar model, accepted only when it hashes to the published Git LFS object id.
+# YUNET_MODEL_URL / YUNET_MODEL_SHA256 override both (e.g. a mirror, or a URL pinned to a specific opencv_zoo commit).
+_YUNET_MODEL_URL = 'https://github.com/opencv/opencv_zoo/raw/main/models/face_detection_yunet/face_detection_yunet_2023mar.onnx'
+_YUNET_MODEL_SHA256 = '8f2383e4dd3cfbb4553ea8718107fc0423210dc964f9f4280604804ed2552fa4'
+
+
+def _yunet_model_path():
+    """Return path to face_detection_yunet_2023mar.onnx. When missing it is downloaded from YUNET_MODEL_URL and kept only if
+    its SHA-256 matches YUNET_MODEL_SHA256 (defaults: _YUNET_MODEL_URL / _YUNET_MODEL_SHA256). None when unavailable."""
+    global _yunet_model_resolved
+    with _yunet_model_lock:
+        if _yunet_model_resolved is not None:
+            return _yunet_model_resolved or None
+        env_path = os.environ.get('YUNET_MODEL_PATH', '').strip()
+        if env_path and os.path.isfile(env_path):
+            _yunet_model_resolved = env_path
+            return env_path
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+        path = os.path.join(cache_dir, 'face_detection_yunet_2023mar.onnx')
+        if not os.path.isfile(path):
+            url = os.environ.get('YUNET_MODEL_URL', '').strip() or _YUNET_MODEL_URL
+            expected = (os.environ.get('YUNET_MODEL_SHA256', '').strip() or _YUNET_MODEL_SHA256).lower()
+            if len(expected) != 64:
+                print('Face stage: YUNET_MODEL_SHA256 is not a SHA-256 hex digest; %s not downloaded' % path)
+                path = ''
+            else:
+                try:
+                    import urllib.request
+                    os.makedirs(cache_dir, exist_ok=True)
+                    h = hashlib.sha256()
+                    with urllib.request.urlopen(url, timeout=30) as resp, open(path + '.part', 'wb') as f:
+                        for chunk in iter(lambda: resp.read(65536), b''):
+                            h.update(chunk)
+                            f.write(chunk)
+                    if h.hexdigest() != expected:
+                        print('Face stage: %s SHA-256 %s does not match YUNET_MODEL_SHA256; discarded' % (url, h.hexdigest()))
+                        raise ValueError('yunet checksum mismatch')
+                    os.replace(path + '.part', path)
+                except Exception:
+                    try:
+                        os.remove(path + '.part')
+                    except OSError:
+                        pass
+                    path = ''
+        _yunet_model_resolved = path
+        return path or None
+
+
+def _get_face_detector():
+    """This thread's YuNet detector, or None when FACE_DETECTOR=off, OpenCV lacks FaceDetectorYN or the model is unavailable."""
+    if FACE_DETECTOR != 'yunet' or not hasattr(cv2, 'FaceDetectorYN'):
+        return None
+    det = getattr(_face_detector_local, 'detector', None)
+    if det is None and not getattr(_face_detector_local, 'failed', False):
+        path = _yunet_model_path()
+        try:
+            det = cv2.FaceDetectorYN.create(path, '', (320, 320), FACE_DETECT_SCORE, 0.3, 50) if path else None
+        except Exception:
+            det = None
+        _face_detector_local.detector = det
+        _face_detector_local.failed = det is None
+    return det
+
+
+def _detect_faces(frame):
+    """One YuNet pass over frame (downscaled to FACE_DETECT_MAX_WIDTH). Returns faces as dicts with bbox (x1, y1, x2, y2),
+    score and landmarks ((5, 2): right eye, left eye, nose, mouth corners) in frame pixels, largest first; None if no detector."""
+    det = _get_face_detector()
+    if det is None or frame is None or not frame.size:
+        return None
+    h, w = frame.shape[:2]
+    scale = min(1.0, FACE_DETECT_MAX_WIDTH / float(w))
+    img = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+    try:
+        det.setInputSize((img.shape[1], img.shape[0]))
+        _, raw = det.detect(img)
+    except Exception:
+        return []
+    faces = []
+    for row in (raw if raw is not None else []):
+        x, y, fw, fh = (float(v) / scale for v in row[:4])
+        if fw <= 0 or fh <= 0:
+            continue
+        faces.append({
+            'bbox': (max(0.0, x), max(0.0, y), min(float(w), x + fw), min(float(h), y + fh)),
+            'score': float(row[14]),
+            'landmarks': np.asarray(row[4:14], dtype=np.float32).reshape(5, 2) / scale,
+        })
+    faces.sort(key=lambda f: (f['bbox'][2] - f['bbox'][0]) * (f['bbox'][3] - f['bbox'][1]), reverse=True)
+    return faces
+
+
+def _aligned_face_crop(frame, face, margin=0.25):
+    """Square crop around face rotated so the eyes are level, with margin on each side. None when degenerate."""
+    x1, y1, x2, y2 = face['bbox']
+    side = int(max(x2 - x1, y2 - y1) * (1 + 2 * margin))
+    if side < 8:
+        return None
+    (rx, ry), (lx, ly) = face['landmarks'][0], face['landmarks'][1]
+    angle = math.degrees(math.atan2(ly - ry, lx - rx)) if lx != rx or ly != ry else 0.0
+    cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
+    m = cv2.getRotationMatrix2D((cx, cy), angle, 1.0)
+    m[0, 2] += side / 2.0 - cx
+    m[1, 2] += side / 2.0 - cy
+    try:
+        return cv2.warpAffine(frame, m, (side, side), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    except Exception:
+        return None
+
+
+def _face_context(frame, dets):
+    """Per-frame face stage: {'count', 'bbox', 'score', 'crop'} for the primary person's face (face centre inside the primary
+    person box, else the largest face); crop is None when no face was found. None when the face stage is unavailable."""
+    faces = _detect_faces(frame)
+    if faces is None:
+        return None
+    ctx = {'count': len(faces), 'bbox': None, 'score': None, 'crop': None}
+    if not faces:
+        return ctx
+    face = faces[0]
+    if dets is not None and dets.primary is not None:
+        px1, py1, px2, py2 = dets.box(dets.primary)
+        for f in faces:
+            fx, fy = (f['bbox'][0] + f['bbox'][2]) / 2, (f['bbox'][1] + f['bbox'][3]) / 2
+            if px1 <= fx <= px2 and py1 <= fy <= py2:
+                face = f
+                break
+    ctx.update(bbox=tuple(int(v) for v in face['bbox']), score=round(face['score'], 4), crop=_aligned_face_crop(frame, face))
+    return ctx
+
+
+def _get_dominant_emotion(frame, dets=None, face_ctx=None):
+    """Unified emotion from DeepFace (TensorFlow) or EmotiEffLib (PyTorch/ONNX). Returns a single label e.g. Neutral, Happy.
+    Min crop size 48x48 for reliability (BEST_PATH_FORWARD Phase 2.1, ACCURACY_RESEARCH_AND_IMPROVEMENTS).
+    Low-light: CLAHE on L channel when mean intensity < EMOTION_CLAHE_THRESHOLD (Phase 2.1).
+    face_ctx: shared face stage (_face_context); no face -> 'Neutral' without running a model, else the aligned face crop is used."""
+    min_crop = max(30, min(64, int(os.environ.get('EMOTION_MIN_CROP_SIZE', '48'))))
     backend = (os.environ.get('EMOTION_BACKEND') or 'auto').strip().lower()
+    face_crop = None
+    if face_ctx is not None:
+        face_crop = face_ctx.get('crop')
+        if face_crop is None or face_crop.shape[0] < min_crop:
+            return 'Neutral'
     # Prefer DeepFace if explicitly set and available
     if (backend == 'deepface' or backend == 'auto') and DEEPFACE_AVAILABLE and DeepFace:
         try:
-            # When we have person bbox, skip if crop would be too small (full frame is still used here)
-            if results and results[0].boxes and hasattr(results[0], 'names'):
-                names, boxes = results[0].names, results[0].boxes
-                for i, cls in enumerate(boxes.cls):
-                    if names.get(int(cls), '').lower() == 'person':
-                        xyxy = boxes.xyxy[i].cpu().numpy()
-                        bw, bh = int(xyxy[2] - xyxy[0]), int(xyxy[3] - xyxy[1])
-                        if bw < min_crop or bh < min_crop:
-                            return 'Neutral'
-                        break
-            inp = _preprocess_low_light_emotion(frame)
-            out = DeepFace.analyze(inp, actions=['emotion'])
+            if face_crop is not None:
+                out = DeepFace.analyze(_preprocess_low_light_emotion(face_crop), actions=['emotion'], detector_backend='skip', enforce_detection=False)
+            else:
+                # When we have person bbox, skip if crop would be too small (full frame is still used here)
+                first = dets.first_person() if dets is not None else None
+                if first is not None:
+                    xyxy = dets.xyxy[first]
+                    bw, bh = int(xyxy[2] - xyxy[0]), int(xyxy[3] - xyxy[1])
+                    if bw < min_crop or bh < min_crop:
+                        return 'Neutral'
+                inp = _preprocess_low_light_emotion(frame)
+                out = DeepFace.analyze(inp, actions=['emotion'])
             if out and isinstance(out, list):
                 out = out[0]
             if isinstance(out, dict) and 'dominant_emotion' in out:
@@ -2060,21 +3487,17 @@ def _get_dominant_emotion(frame, results=None):
                     _emotieff_recognizer = EmotiEffLibRecognizer(device='cpu', model_name=models[0])
             if _emotieff_recognizer is not None:
                 # Optionally crop to first person bbox for better accuracy; min 48x48 (Phase 2.1)
-                crop = frame
-                if results and results[0].boxes and hasattr(results[0], 'names'):
-                    names, boxes = results[0].names, results[0].boxes
-                    for i, cls in enumerate(boxes.cls):
-                        if names.get(int(cls), '').lower() == 'person':
-                            xyxy = boxes.xyxy[i].cpu().numpy()
-                            x1, y1, x2, y2 = map(int, xyxy)
-                            h, w = frame.shape[:2]
-                            pad = 20
-                            x1, y1 = max(0, x1 - pad), max(0, y1 - pad)
-                            x2, y2 = min(w, x2 + pad), min(h, y2 + pad)
-                            cw, ch = x2 - x1, y2 - y1
-                            if x2 > x1 and y2 > y1 and cw >= min_crop and ch >= min_crop:
-                                crop = frame[y1:y2, x1:x2]
-                            break
+                crop = frame if face_crop is None else face_crop
+                first = dets.first_person() if dets is not None and face_crop is None else None
+                if first is not None:
+                    x1, y1, x2, y2 = map(int, dets.xyxy[first])
+                    h, w = frame.shape[:2]
+                    pad = 20
+                    x1, y1 = max(0, x1 - pad), max(0, y1 - pad)
+                    x2, y2 = min(w, x2 + pad), min(h, y2 + pad)
+                    cw, ch = x2 - x1, y2 - y1
+                    if x2 > x1 and y2 > y1 and cw >= min_crop and ch >= min_crop:
+                        crop = frame[y1:y2, x1:x2]
                 crop = _preprocess_low_light_emotion(crop)
                 # EmotiEffLib often expects RGB; OpenCV frame is BGR
                 rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
@@ -2090,12 +3513,16 @@ def _get_dominant_emotion(frame, results=None):
     return 'Neutral'
 
 
-def _get_face_embedding(frame_or_crop):
-    """Return face embedding as numpy float32 array or None. Uses DeepFace.represent (one face). Edge-only; no cloud."""
+def _get_face_embedding(frame_or_crop, aligned=False):
+    """Return face embedding as numpy float32 array or None. Uses DeepFace.represent (one face). Edge-only; no cloud.
+    aligned: input is already an aligned face crop from the face stage, so DeepFace's detector is skipped."""
     if not DEEPFACE_AVAILABLE or not DeepFace:
         return None
     try:
-        out = DeepFace.represent(frame_or_crop, enforce_detection=False)
+        if aligned:
+            out = DeepFace.represent(frame_or_crop, detector_backend='skip', enforce_detection=False)
+        else:
+            out = DeepFace.represent(frame_or_crop, enforce_detection=False)
         if out and isinstance(out, list) and len(out) and isinstance(out[0], dict) and 'embedding' in out[0]:
             emb = out[0]['embedding']
             return np.array(emb, dtype=np.float32) if not isinstance(emb, np.ndarray) else emb.astype(np.float32)
@@ -2104,54 +3531,115 @@ def _get_face_embedding(frame_or_crop):
     return None
 
 
+class _WatchlistGallery:
+    """In-memory watchlist: per embedding dimension, an L2-normalised float32 (N, D) matrix plus names. Loaded from
+    watchlist_faces on first use and after invalidate() (watchlist add/delete), so matching never touches the DB.
+    generation counts invalidations so identities cached against an older gallery can be recognised as stale."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_dim = None  # dim -> (matrix (N, D) float32, names list)
+        self.loads = 0
+        self.generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._by_dim = None
+            self.generation += 1
+
+    def _load(self):
+        try:
+            get_cursor().execute('SELECT name, embedding FROM watchlist_faces')
+            rows = get_cursor().fetchall()
+        except sqlite3.OperationalError:
+            return None
+        groups = {}
+        for name, blob in rows:
+            if not blob:
+                continue
+            ref = np.frombuffer(blob, dtype=np.float32)
+            groups.setdefault(ref.shape[0], ([], []))
+            groups[ref.shape[0]][0].append(ref)
+            groups[ref.shape[0]][1].append(name)
+        by_dim = {}
+        for dim, (refs, names) in groups.items():
+            mat = np.vstack(refs).astype(np.float32)
+            norms = np.linalg.norm(mat, axis=1)
+            keep = norms > 0
+            by_dim[dim] = (mat[keep] / norms[keep, None], [n for n, k in zip(names, keep) if k])
+        self.loads += 1
+        return by_dim
+
+    def _gallery(self):
+        with self._lock:
+            if self._by_dim is None:
+                self._by_dim = self._load()
+            return self._by_dim
+
+    def match(self, probes, k=1):
+        """Top-k matches for each probe embedding (1-D array or (B, D) batch) as lists of (name, confidence 0-1), best
+        first. Confidence is cosine similarity mapped from [-1, 1] to [0, 1]; probes of an unknown dimension get []."""
+        probes = np.atleast_2d(np.asarray(probes, dtype=np.float32))
+        gallery = self._gallery() or {}
+        entry = gallery.get(probes.shape[1])
+        if entry is None or not len(entry[1]):
+            return [[] for _ in range(len(probes))]
+        mat, names = entry
+        norms = np.linalg.norm(probes, axis=1, keepdims=True)
+        sims = (probes / np.where(norms > 0, norms, 1.0)) @ mat.T  # (B, N): one matrix product for the whole batch
+        k = max(1, min(k, sims.shape[1]))
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        out = []
+        for b in range(len(sims)):
+            if norms[b, 0] <= 0:
+                out.append([])
+                continue
+            order = top[b][np.argsort(-sims[b, top[b]])]
+            out.append([(names[j], (float(sims[b, j]) + 1) / 2.0) for j in order])
+        return out
+
+    def stats(self):
+        with self._lock:
+            by_dim = self._by_dim
+        return {'loaded': by_dim is not None, 'entries': sum(len(v[1]) for v in by_dim.values()) if by_dim else 0, 'loads': self.loads}
+
+
+_watchlist_gallery = _WatchlistGallery()
+
+
 def _match_watchlist(embedding):
-    """Compare embedding to watchlist_faces. Returns (name, confidence 0-1) or (None, 0.0). Cosine similarity."""
+    """Compare embedding to the in-memory watchlist gallery. Returns (name, confidence 0-1) or (None, 0.0). Cosine similarity."""
     if embedding is None or not embedding.size:
         return None, 0.0
-    try:
-        get_cursor().execute('SELECT id, name, embedding FROM watchlist_faces')
-        rows = get_cursor().fetchall()
-    except sqlite3.OperationalError:
-        return None, 0.0
-    best_name, best_sim = None, 0.0
-    for row in rows:
-        _, name, blob = row
-        if not blob:
-            continue
-        ref = np.frombuffer(blob, dtype=np.float32)
-        if ref.shape != embedding.shape:
-            continue
-        norm = np.linalg.norm(embedding) * np.linalg.norm(ref)
-        if norm <= 0:
-            continue
-        sim = float(np.dot(embedding, ref) / norm)
-        sim = (sim + 1) / 2.0  # map [-1,1] to [0,1] for confidence
-        if sim > best_sim:
-            best_sim = sim
-            best_name = name
-    return best_name, best_sim
+    best = _watchlist_gallery.match(embedding, k=1)[0]
+    return best[0] if best else (None, 0.0)
 
 
-def _apply_watchlist(frame, data, results):
-    """If ENABLE_WATCHLIST and DeepFace available, get face embedding, match watchlist, set data['individual'] and face_match_confidence."""
-    if os.environ.get('ENABLE_WATCHLIST', '').strip().lower() not in ('1', 'true', 'yes') or not DEEPFACE_AVAILABLE or not DeepFace:
-        return
-    threshold = float(os.environ.get('WATCHLIST_SIMILARITY_THRESHOLD', '0.6'))
+def _watchlist_enabled():
+    return os.environ.get('ENABLE_WATCHLIST', '').strip().lower() in ('1', 'true', 'yes') and DEEPFACE_AVAILABLE and bool(DeepFace)
+
+
+def _watchlist_face_embedding(frame, dets, face_ctx=None):
+    """Face embedding for watchlist matching: the face stage's aligned crop (None when it found no face), else the first
+    person's padded crop (whole frame when too small)."""
+    if face_ctx is not None:
+        return _get_face_embedding(face_ctx['crop'], aligned=True) if face_ctx.get('crop') is not None else None
     crop = frame
-    if results and results[0].boxes and hasattr(results[0], 'names'):
-        names, boxes = results[0].names, results[0].boxes
-        for i, cls in enumerate(boxes.cls):
-            if names.get(int(cls), '').lower() == 'person':
-                xyxy = boxes.xyxy[i].cpu().numpy()
-                x1, y1, x2, y2 = map(int, xyxy)
-                h, w = frame.shape[:2]
-                pad = 20
-                x1, y1 = max(0, x1 - pad), max(0, y1 - pad)
-                x2, y2 = min(w, x2 + pad), min(h, y2 + pad)
-                if x2 > x1 and y2 > y1 and (y2 - y1) >= 40 and (x2 - x1) >= 40:
-                    crop = frame[y1:y2, x1:x2]
-                break
-    emb = _get_face_embedding(crop)
+    first = dets.first_person() if dets is not None else None
+    if first is not None:
+        x1, y1, x2, y2 = map(int, dets.xyxy[first])
+        h, w = frame.shape[:2]
+        pad = 20
+        x1, y1 = max(0, x1 - pad), max(0, y1 - pad)
+        x2, y2 = min(w, x2 + pad), min(h, y2 + pad)
+        if x2 > x1 and y2 > y1 and (y2 - y1) >= 40 and (x2 - x1) >= 40:
+            crop = frame[y1:y2, x1:x2]
+    return _get_face_embedding(crop)
+
+
+def _apply_watchlist_embedding(data, emb):
+    """Match a face embedding against the watchlist; set data['individual'] and face_match_confidence."""
+    threshold = float(os.environ.get('WATCHLIST_SIMILARITY_THRESHOLD', '0.6'))
     name, confidence = _match_watchlist(emb)
     if name and confidence >= threshold:
         data['individual'] = name
@@ -2228,42 +3716,27 @@ def _dominant_color_region(img_bgr, name=''):
         return None
 
 
-def _extract_extended_attributes(frame, results, pose, emotion, event, results_pose=None):
-    """
-    Extract extended person attributes for logs/behaviors: demographic proxies (optional),
-    physical (height, build, hair, clothing), behavioral (suspicious, intent, stress),
-    intoxication/gait stubs, and sci-fi style scores. Speed-optimized: single DeepFace
-    call when enabled, rest are heuristics from existing YOLO/pose/emotion.
-    results_pose: optional pose result (e.g. MediaPipe) to derive gait_notes from landmarks.
-    """
+def _extract_frame_attributes(frame, dets, results_pose=None, face_ctx=None, skip=()):
+    """Frame-derived extended attributes (bbox geometry, colours, gait, illumination, demographics); the rest come from
+    _extract_behavior_attributes once pose, emotion and event are known.
+    Needs only the frame and detections, so it runs inside the perception stage (worker process in ANALYZE_MODE=process).
+    face_ctx: shared face stage; demographics use its aligned crop and are skipped when no face was found.
+    skip: 'appearance' / 'demographics' groups served from the per-track cache (_TrackAttributeCache) are not computed."""
     out = {}
     enable_extended = os.environ.get('ENABLE_EXTENDED_ATTRIBUTES', '1').strip().lower() in ('1', 'true', 'yes')
     # Raw demographics: no bias engineering; age/gender/race stored as model output (civilian-only).
 
     # Person bbox: use same primary person as centroid (largest by area) for consistent height/hair/clothing
     person_bbox = None
-    best_idx = None
-    if results and results[0].boxes and hasattr(results[0], 'names'):
-        names, boxes = results[0].names, results[0].boxes
-        best_area = 0
-        for i, cls in enumerate(boxes.cls):
-            if names.get(int(cls), '').lower() != 'person':
-                continue
-            xyxy = boxes.xyxy[i].cpu().numpy()
-            area = (xyxy[2] - xyxy[0]) * (xyxy[3] - xyxy[1])
-            if area > best_area:
-                best_area = area
-                best_idx = i
-                person_bbox = (int(xyxy[0]), int(xyxy[1]), int(xyxy[2]), int(xyxy[3]))
-    # Detection confidence (NIST AI 100-4 provenance): YOLO confidence for primary person
-    if best_idx is not None and results and results[0].boxes and hasattr(results[0].boxes, 'conf'):
-        try:
-            conf = results[0].boxes.conf[best_idx].item()
-            out['detection_confidence'] = round(float(conf), 4)
-        except (IndexError, TypeError):
-            pass
+    best_idx = dets.primary if dets is not None else None
+    if best_idx is not None:
+        person_bbox = tuple(int(v) for v in dets.xyxy[best_idx])
+        # Detection confidence (NIST AI 100-4 provenance): YOLO confidence for primary person
+        out['detection_confidence'] = round(float(dets.conf[best_idx]), 4)
 
-    if person_bbox:
+    if person_bbox and 'appearance' in skip:
+        pass
+    elif person_bbox:
         x1, y1, x2, y2 = person_bbox
         bh, bw = y2 - y1, x2 - x1
         frame_h, frame_w = frame.shape[:2]
@@ -2308,6 +3781,92 @@ def _extract_extended_attributes(frame, results, pose, emotion, event, results_p
         out['hair_color'] = 'unknown'
         out['clothing_description'] = 'unknown'
 
+    out['gait_notes'] = _gait_notes_from_pose(results_pose) if (_is_gait_notes_enabled() and results_pose) else 'unknown'
+
+    # Illumination (no extra inference)
+    if frame is not None and frame.size > 0:
+        mean_val = float(np.mean(frame))
+        if mean_val < 80:
+            out['illumination_band'] = 'dark'
+        elif mean_val < 120:
+            out['illumination_band'] = 'dim'
+        elif mean_val < 180:
+            out['illumination_band'] = 'normal'
+        else:
+            out['illumination_band'] = 'bright'
+    else:
+        out['illumination_band'] = None
+    # Person position in frame (left/center/right, top/middle/bottom) from bbox center; "attention_region" until gaze model
+    if person_bbox and frame is not None and frame.size > 0:
+        x1, y1, x2, y2 = person_bbox
+        h, w = frame.shape[:2]
+        if w > 0 and h > 0:
+            cx = (x1 + x2) * 0.5 / w
+            cy = (y1 + y2) * 0.5 / h
+            hzone = 'left' if cx < 0.33 else ('right' if cx > 0.67 else 'center')
+            vzone = 'top' if cy < 0.33 else ('bottom' if cy > 0.67 else 'middle')
+            out['attention_region'] = '%s,%s' % (hzone, vzone)
+        else:
+            out['attention_region'] = 'unknown'
+    else:
+        out['attention_region'] = 'unknown'
+
+    # DeepFace: raw age, gender, race — no bucketing or gating; single call for speed
+    face_crop = face_ctx.get('crop') if face_ctx is not None else None
+    if enable_extended and 'demographics' not in skip and frame is not None and frame.size > 0 and (face_ctx is None or face_crop is not None):
+        try:
+            actions = ['age', 'gender', 'race']
+            df_out = None
+            if DEEPFACE_AVAILABLE and DeepFace and face_crop is not None:
+                df_out = DeepFace.analyze(face_crop, actions=actions, detector_backend='skip', enforce_detection=False)
+            elif DEEPFACE_AVAILABLE and DeepFace:
+                crop = frame
+                if person_bbox:
+                    x1, y1, x2, y2 = person_bbox
+                    h, w = frame.shape[:2]
+                    pad = 20
+                    x1, y1 = max(0, x1 - pad), max(0, y1 - pad)
+                    x2, y2 = min(w, x2 + pad), min(h, y2 + pad)
+                    if x2 > x1 and y2 > y1 and (y2 - y1) >= 40:
+                        crop = frame[y1:y2, x1:x2]
+                if crop is not None and crop.size > 0:
+                    ch, cw = crop.shape[:2]
+                    if cw != 224 or ch != 224:
+                        try:
+                            crop = cv2.resize(crop, (224, 224), interpolation=cv2.INTER_LINEAR)
+                        except Exception:
+                            pass
+                df_out = DeepFace.analyze(crop, actions=actions, enforce_detection=False)
+            if df_out and isinstance(df_out, list):
+                df_out = df_out[0]
+            if isinstance(df_out, dict):
+                if 'dominant_gender' in df_out:
+                    out['perceived_gender'] = df_out['dominant_gender']
+                if 'age' in df_out:
+                    age = int(df_out['age'])
+                    out['perceived_age'] = age
+                    out['perceived_age_range'] = str(age)
+                if 'dominant_race' in df_out:
+                    out['perceived_ethnicity'] = df_out['dominant_race']
+        except Exception:
+            pass
+
+    if not out.get('perceived_gender'):
+        out['perceived_gender'] = None
+    if not out.get('perceived_age_range'):
+        out['perceived_age_range'] = None
+    if 'perceived_age' not in out:
+        out['perceived_age'] = None
+    if not out.get('perceived_ethnicity'):
+        out['perceived_ethnicity'] = None
+    if 'detection_confidence' not in out:
+        out['detection_confidence'] = None
+    return out
+
+
+def _extract_behavior_attributes(pose, emotion, event):
+    """Event/pose/emotion-derived extended attributes (behaviour, stress, threat, period, micro-expression)."""
+    out = {}
     # Behavioral from event (and pose when event is None)
     if event == 'Fall Detected':
         out['suspicious_behavior'] = 'person_down'
@@ -2350,7 +3909,6 @@ def _extract_extended_attributes(frame, results, pose, emotion, event, results_p
     # Intoxication / drug: stubs (would need temporal gait or behavioral model)
     out['intoxication_indicator'] = 'none'
     out['drug_use_indicator'] = 'none'
-    out['gait_notes'] = _gait_notes_from_pose(results_pose) if (_is_gait_notes_enabled() and results_pose) else 'unknown'
 
     # Threat score 0-100 heuristic (BEST_PATH_FORWARD Phase 2.3: aligned with event)
     threat = 0
@@ -2366,19 +3924,7 @@ def _extract_extended_attributes(frame, results, pose, emotion, event, results_p
         threat += 10
     out['threat_score'] = min(100, threat)
 
-    # Illumination and time period (no extra inference)
-    if frame is not None and frame.size > 0:
-        mean_val = float(np.mean(frame))
-        if mean_val < 80:
-            out['illumination_band'] = 'dark'
-        elif mean_val < 120:
-            out['illumination_band'] = 'dim'
-        elif mean_val < 180:
-            out['illumination_band'] = 'normal'
-        else:
-            out['illumination_band'] = 'bright'
-    else:
-        out['illumination_band'] = None
+    # Time period (no extra inference)
     hour_utc = time.gmtime().tm_hour
     if 0 <= hour_utc < 5 or hour_utc >= 21:
         out['period_of_day_utc'] = 'night'
@@ -2388,70 +3934,8 @@ def _extract_extended_attributes(frame, results, pose, emotion, event, results_p
         out['period_of_day_utc'] = 'day'
     else:
         out['period_of_day_utc'] = 'dusk'
-
     # Micro-expression: reuse emotion for now (real MER needs dedicated model)
     out['micro_expression'] = emotion or 'neutral'
-    # Person position in frame (left/center/right, top/middle/bottom) from bbox center; "attention_region" until gaze model
-    if person_bbox and frame is not None and frame.size > 0:
-        x1, y1, x2, y2 = person_bbox
-        h, w = frame.shape[:2]
-        if w > 0 and h > 0:
-            cx = (x1 + x2) * 0.5 / w
-            cy = (y1 + y2) * 0.5 / h
-            hzone = 'left' if cx < 0.33 else ('right' if cx > 0.67 else 'center')
-            vzone = 'top' if cy < 0.33 else ('bottom' if cy > 0.67 else 'middle')
-            out['attention_region'] = '%s,%s' % (hzone, vzone)
-        else:
-            out['attention_region'] = 'unknown'
-    else:
-        out['attention_region'] = 'unknown'
-
-    # DeepFace: raw age, gender, race — no bucketing or gating; single call for speed
-    if enable_extended and frame is not None and frame.size > 0:
-        try:
-            actions = ['age', 'gender', 'race']
-            if DEEPFACE_AVAILABLE and DeepFace:
-                crop = frame
-                if person_bbox:
-                    x1, y1, x2, y2 = person_bbox
-                    h, w = frame.shape[:2]
-                    pad = 20
-                    x1, y1 = max(0, x1 - pad), max(0, y1 - pad)
-                    x2, y2 = min(w, x2 + pad), min(h, y2 + pad)
-                    if x2 > x1 and y2 > y1 and (y2 - y1) >= 40:
-                        crop = frame[y1:y2, x1:x2]
-                if crop is not None and crop.size > 0:
-                    ch, cw = crop.shape[:2]
-                    if cw != 224 or ch != 224:
-                        try:
-                            crop = cv2.resize(crop, (224, 224), interpolation=cv2.INTER_LINEAR)
-                        except Exception:
-                            pass
-                df_out = DeepFace.analyze(crop, actions=actions, enforce_detection=False)
-                if df_out and isinstance(df_out, list):
-                    df_out = df_out[0]
-                if isinstance(df_out, dict):
-                    if 'dominant_gender' in df_out:
-                        out['perceived_gender'] = df_out['dominant_gender']
-                    if 'age' in df_out:
-                        age = int(df_out['age'])
-                        out['perceived_age'] = age
-                        out['perceived_age_range'] = str(age)
-                    if 'dominant_race' in df_out:
-                        out['perceived_ethnicity'] = df_out['dominant_race']
-        except Exception:
-            pass
-
-    if not out.get('perceived_gender'):
-        out['perceived_gender'] = None
-    if not out.get('perceived_age_range'):
-        out['perceived_age_range'] = None
-    if 'perceived_age' not in out:
-        out['perceived_age'] = None
-    if not out.get('perceived_ethnicity'):
-        out['perceived_ethnicity'] = None
-    if 'detection_confidence' not in out:
-        out['detection_confidence'] = None
     return out
 
 
@@ -2496,62 +3980,491 @@ def _enhance_frame(frame):
     return out
 
 
-def gen_frames(camera_id='0'):
-    global is_recording, out
-    cap = _cameras.get(camera_id, camera)
+# Encode-once MJPEG: one broadcaster thread per camera enhances each captured frame once, encodes it once per
+# quality tier that has viewers, and hands the same bytes to every subscriber (slow clients skip to the latest).
+# Only runs while someone is watching; recording is fed separately from the capture thread (_RecordingWriter).
+try:
+    _stream_low_jpeg_quality = max(1, min(100, int(os.environ.get('STREAM_LOW_JPEG_QUALITY', '60'))))
+except (TypeError, ValueError):
+    _stream_low_jpeg_quality = 60
+try:
+    _stream_low_max_width = max(0, int(os.environ.get('STREAM_LOW_MAX_WIDTH', '640')))
+except (TypeError, ValueError):
+    _stream_low_max_width = 640
+STREAM_TIERS = {
+    'default': (_stream_jpeg_quality, _stream_max_width),
+    'low': (_stream_low_jpeg_quality, _stream_low_max_width),
+}
+
+
+# Recording: one writer per camera, fed by the capture thread through a bounded queue. Enhance/resize/encode run on the
+# writer's own thread, so recording no longer depends on anyone watching /video_feed and never blocks capture.
+try:
+    RECORDING_QUEUE_SIZE = max(8, min(600, int(os.environ.get('RECORDING_QUEUE_SIZE', '120'))))
+except (TypeError, ValueError):
+    RECORDING_QUEUE_SIZE = 120
+try:
+    RECORDING_SEGMENT_SECONDS = int(os.environ.get('RECORDING_SEGMENT_SECONDS', '300'))
+    RECORDING_SEGMENT_SECONDS = 0 if RECORDING_SEGMENT_SECONDS <= 0 else max(30, min(3600, RECORDING_SEGMENT_SECONDS))
+except (TypeError, ValueError):
+    RECORDING_SEGMENT_SECONDS = 300
+RECORDING_FRAME_SIZE = (1280, 720)
+RECORDING_CODEC = 'XVID'
+
+
+class _RecordingWriter:
+    """Per-camera recorder thread: drains a bounded frame queue into recording_<camera>_<unix>.avi segments (rotated every
+    RECORDING_SEGMENT_SECONDS) at the measured capture fps, cataloguing each segment in the recordings table."""
+
+    def __init__(self, camera_id, queue_size=RECORDING_QUEUE_SIZE, segment_seconds=RECORDING_SEGMENT_SECONDS):
+        self.camera_id = camera_id
+        self.segment_seconds = segment_seconds
+        self.path = None
+        self.container_fps = None
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.segments = 0
+        self._segment_started = 0.0
+        self._segment_frames = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._writer = None
+        self._write_times = deque(maxlen=60)
+        self._thread = threading.Thread(target=self._run, daemon=True, name='record-%s' % camera_id)
+        self._thread.start()
+
+    def offer(self, frame, ts):
+        """Non-blocking enqueue from the capture thread; a full queue drops the frame (counted) instead of stalling capture."""
+        if self._stop.is_set():
+            return
+        try:
+            self._queue.put_nowait((ts, frame))
+        except queue.Full:
+            self.frames_dropped += 1
+
+    def stop(self):
+        """Stop accepting frames; the thread drains what is queued, then releases the file."""
+        self._stop.set()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def stats(self):
+        """Current file, frames written/dropped, queue depth and measured write fps."""
+        times = list(self._write_times)
+        span = (times[-1] - times[0]) if len(times) >= 2 else 0
+        return {
+            'file': os.path.basename(self.path) if self.path else None,
+            'frames_written': self.frames_written,
+            'frames_dropped': self.frames_dropped,
+            'queue_depth': self._queue.qsize(),
+            'fps': round((len(times) - 1) / span, 1) if span > 0 else 0.0,
+            'container_fps': self.container_fps,
+            'segments': self.segments,
+        }
+
+    def _open(self):
+        # Container fps = what the camera actually delivers (capture ring), not a hard-coded 20
+        ring = _frame_rings.get(self.camera_id)
+        fps = ring.fps() if ring is not None else 0.0
+        self.container_fps = fps if fps >= 1 else 20.0
+        now = time.time()
+        safe_id = re.sub(r'[^A-Za-z0-9-]', '-', str(self.camera_id))
+        name_ts = int(now)
+        while os.path.exists(os.path.join(_recordings_dir(), 'recording_%s_%d.avi' % (safe_id, name_ts))):
+            name_ts += 1  # never overwrite an existing segment (rotation or restart within the same second)
+        self.path = os.path.join(_recordings_dir(), 'recording_%s_%d.avi' % (safe_id, name_ts))
+        self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*RECORDING_CODEC), self.container_fps, RECORDING_FRAME_SIZE)
+        self._segment_started = now
+        self._segment_frames = 0
+        self.segments += 1
+        try:
+            get_cursor().execute(
+                'INSERT OR REPLACE INTO recordings (name, camera_id, start_utc, codec, fps) VALUES (?, ?, ?, ?, ?)',
+                (os.path.basename(self.path), str(self.camera_id), time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now)), RECORDING_CODEC, round(self.container_fps, 2)),
+            )
+            get_conn().commit()
+        except Exception:
+            pass
+
+    def _close_segment(self):
+        """Release the current file and record its end time, frame count and size in the catalog."""
+        if self._writer is None:
+            return
+        try:
+            self._writer.release()
+        except Exception:
+            pass
+        self._writer = None
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = None
+        try:
+            get_cursor().execute(
+                'UPDATE recordings SET end_utc = ?, frame_count = ?, size_bytes = ? WHERE name = ?',
+                (time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), self._segment_frames, size, os.path.basename(self.path)),
+            )
+            get_conn().commit()
+        except Exception:
+            pass
+        # Queue the digest once the file is final (the AVI header is rewritten on release, so bytes cannot be hashed as they
+        # are written); the background digester fills recording_fixity for manifest/export/bundle without stalling capture.
+        if size:
+            _queue_recording_digest(self.path)
+        if MP4_CACHE_PREFETCH and size:
+            _mp4_cache.prefetch(self.path)
+
+    def _write(self, frame):
+        if frame is None or frame.size == 0:
+            return
+        frame = _enhance_frame(frame)
+        h, w = frame.shape[:2]
+        if (w, h) != RECORDING_FRAME_SIZE:
+            rec_frame = cv2.resize(frame, RECORDING_FRAME_SIZE, interpolation=cv2.INTER_AREA)
+        else:
+            rec_frame = np.ascontiguousarray(frame)
+        # Validate to avoid SIGSEGV in OpenCV/FFmpeg (null or invalid buffer)
+        ok = (
+            isinstance(rec_frame, np.ndarray)
+            and rec_frame.dtype == np.uint8
+            and rec_frame.ndim == 3
+            and rec_frame.shape == (RECORDING_FRAME_SIZE[1], RECORDING_FRAME_SIZE[0], 3)
+            and rec_frame.flags['C_CONTIGUOUS']
+        )
+        if not ok:
+            return
+        if self._writer is not None and self.segment_seconds > 0 and (time.time() - self._segment_started) >= self.segment_seconds:
+            self._close_segment()
+        if self._writer is None:
+            self._open()
+        try:
+            self._writer.write(rec_frame)
+            self.frames_written += 1
+            self._segment_frames += 1
+            self._write_times.append(time.time())
+        except Exception:
+            pass  # avoid process crash on VideoWriter/FFmpeg errors (e.g. Python 3.14 + opencv/ffmpeg on macOS)
+
+    def _run(self):
+        try:
+            while not (self._stop.is_set() and self._queue.empty()):
+                try:
+                    _, frame = self._queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                self._write(frame)
+        finally:
+            self._close_segment()
+            _close_thread_db()
+
+
+_recording_writers = {}  # camera_id -> _RecordingWriter (only while recording)
+
+
+def _start_recording_writers():
+    """Start a writer, and an event-clip buffer when enabled, for every configured camera that does not have one."""
+    with _recording_lock:
+        for cam_id in list(_cameras.keys()):
+            ring = _get_frame_ring(cam_id)
+            if ring is None:
+                continue
+            if cam_id not in _recording_writers:
+                _recording_writers[cam_id] = _RecordingWriter(cam_id)
+            if ENABLE_EVENT_CLIPS and cam_id not in _clip_buffers:
+                _clip_buffers[cam_id] = _ClipBuffer(cam_id, ring)
+
+
+def _stop_recording_writers():
+    """Detach all writers from capture; each drains its queue and closes its file in the background."""
+    with _recording_lock:
+        writers = list(_recording_writers.values())
+        _recording_writers.clear()
+        buffers = list(_clip_buffers.values())
+        _clip_buffers.clear()
+    for w in writers:
+        w.stop()
+    for b in buffers:
+        b.stop()
+
+
+# Event clips: while recording, each camera keeps a pre-event buffer of downscaled JPEG frames (bounded by seconds and
+# bytes). When a clip-worthy event is inserted, the pre-roll plus EVENT_CLIP_POST_SECONDS of post-roll are written to
+# <recordings>/clips/clip_<event_id>.avi and linked on the event row (events.clip_path).
+ENABLE_EVENT_CLIPS = os.environ.get('ENABLE_EVENT_CLIPS', '1').strip().lower() in ('1', 'true', 'yes')
+try:
+    EVENT_CLIP_PRE_SECONDS = max(1, min(60, int(os.environ.get('EVENT_CLIP_PRE_SECONDS', '10'))))
+except (TypeError, ValueError):
+    EVENT_CLIP_PRE_SECONDS = 10
+try:
+    EVENT_CLIP_POST_SECONDS = max(0, min(60, int(os.environ.get('EVENT_CLIP_POST_SECONDS', '10'))))
+except (TypeError, ValueError):
+    EVENT_CLIP_POST_SECONDS = 10
+try:
+    EVENT_CLIP_FPS = max(1, min(30, int(os.environ.get('EVENT_CLIP_FPS', '10'))))
+except (TypeError, ValueError):
+    EVENT_CLIP_FPS = 10
+try:
+    EVENT_CLIP_MAX_WIDTH = max(160, min(1920, int(os.environ.get('EVENT_CLIP_MAX_WIDTH', '640'))))
+except (TypeError, ValueError):
+    EVENT_CLIP_MAX_WIDTH = 640
+try:
+    EVENT_CLIP_MAX_MB = max(1, min(512, int(os.environ.get('EVENT_CLIP_MAX_MB', '32'))))
+except (TypeError, ValueError):
+    EVENT_CLIP_MAX_MB = 32
+EVENT_CLIP_TYPES = {t.strip() for t in (os.environ.get('EVENT_CLIP_TYPES') or 'line_cross,loitering,fall').split(',') if t.strip()}
+
+
+def _event_clips_dir():
+    """Directory for event clips (clips/ under the recordings directory)."""
+    d = os.path.join(_recordings_dir(), 'clips')
+    os.makedirs(d, exist_ok=True)
+    return d
+
+
+def _safe_clip_basename(name):
+    """Allow only clip_<event_id>.avi to prevent path traversal."""
+    return name if name and re.match(r'^clip_\d+\.avi$', name) else None
+
+
+class _ClipBuffer:
+    """Per-camera pre-event buffer: (ts, jpeg) at EVENT_CLIP_FPS, trimmed to EVENT_CLIP_PRE_SECONDS and EVENT_CLIP_MAX_MB,
+    plus pending clips collecting post-roll until their deadline."""
+
+    def __init__(self, camera_id, ring, pre_seconds=EVENT_CLIP_PRE_SECONDS, post_seconds=EVENT_CLIP_POST_SECONDS,
+                 fps=EVENT_CLIP_FPS, max_bytes=EVENT_CLIP_MAX_MB * 1024 * 1024):
+        self.camera_id = camera_id
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.max_bytes = max_bytes
+        self._ring = ring
+        self._lock = threading.Lock()
+        self._frames = deque()  # (ts, jpeg_bytes)
+        self._bytes = 0
+        self._pending = []  # {'event_id', 'until', 'frames'}
+        self._stop = threading.Event()
+        self.clips_written = 0
+        self._thread = threading.Thread(target=self._run, daemon=True, name='clipbuf-%s' % camera_id)
+        self._thread.start()
+
+    def request_clip(self, event_id, ts=None):
+        """Start a clip for event_id: buffered frames from the last pre_seconds now, post-roll as it arrives."""
+        ts = ts if ts is not None else time.time()
+        with self._lock:
+            pre = [f for f in self._frames if f[0] >= ts - self.pre_seconds]
+            self._pending.append({'event_id': event_id, 'until': ts + self.post_seconds, 'frames': pre})
+        if self.post_seconds == 0:
+            self._flush_due(ts)
+
+    def stop(self):
+        """Stop buffering; clips still collecting post-roll are written with what they have."""
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            span = (self._frames[-1][0] - self._frames[0][0]) if len(self._frames) >= 2 else 0.0
+            return {'buffered_seconds': round(span, 1), 'buffered_bytes': self._bytes, 'pending_clips': len(self._pending), 'clips_written': self.clips_written}
+
+    def add(self, ts, jpeg):
+        """Append one encoded frame, trim by age and memory cap, feed pending clips and write those past their deadline."""
+        with self._lock:
+            self._frames.append((ts, jpeg))
+            self._bytes += len(jpeg)
+            while self._frames and (self._frames[0][0] < ts - self.pre_seconds or self._bytes > self.max_bytes):
+                self._bytes -= len(self._frames.popleft()[1])
+            for clip in self._pending:
+                if ts <= clip['until']:
+                    clip['frames'].append((ts, jpeg))
+        self._flush_due(ts)
+
+    def _flush_due(self, now, force=False):
+        with self._lock:
+            due = [c for c in self._pending if force or now >= c['until']]
+            self._pending = [c for c in self._pending if c not in due]
+        for clip in due:
+            threading.Thread(target=self._write_clip, args=(clip,), daemon=True, name='clip-%s' % clip['event_id']).start()
+
+    def _write_clip(self, clip):
+        try:
+            if _write_event_clip(clip['event_id'], clip['frames'], self.fps):
+                self.clips_written += 1
+        finally:
+            _close_thread_db()
+
+    def _run(self):
+        last_seq = 0
+        last_kept = 0.0
+        while not self._stop.is_set():
+            item = self._ring.wait_next(last_seq, timeout=1.0)
+            if item is None:
+                self._flush_due(time.time())
+                continue
+            last_seq, ts, frame = item
+            if ts - last_kept < 1.0 / self.fps:
+                continue
+            last_kept = ts
+            try:
+                jpeg = _encode_stream_jpeg(frame, 75, EVENT_CLIP_MAX_WIDTH)
+            except Exception:
+                jpeg = None
+            if jpeg:
+                self.add(ts, jpeg)
+        self._flush_due(time.time(), force=True)
+
+
+def _write_event_clip(event_id, frames, fps):
+    """Decode buffered JPEGs into clips/clip_<event_id>.avi (MJPG) and set events.clip_path. Returns True on success."""
+    if not frames:
+        return False
+    first = cv2.imdecode(np.frombuffer(frames[0][1], dtype=np.uint8), cv2.IMREAD_COLOR)
+    if first is None:
+        return False
+    h, w = first.shape[:2]
+    name = 'clip_%d.avi' % int(event_id)
+    path = os.path.join(_event_clips_dir(), name)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), float(fps), (w, h))
+    try:
+        for _, jpeg in frames:
+            img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is not None and img.shape[:2] == (h, w):
+                writer.write(img)
+    finally:
+        writer.release()
+    try:
+        _db_writer.execute('UPDATE events SET clip_path = ? WHERE id = ?', (name, int(event_id)))
+    except Exception:
+        pass
+    return True
+
+
+_clip_buffers = {}  # camera_id -> _ClipBuffer (only while recording)
+
+
+def _request_event_clip(camera_id, event_id, event_type):
+    """Queue a pre/post-roll clip for a newly inserted event when clips are enabled for its type."""
+    if not ENABLE_EVENT_CLIPS or event_type not in EVENT_CLIP_TYPES or not event_id:
+        return
+    buf = _clip_buffers.get(camera_id)
+    if buf is not None:
+        buf.request_clip(event_id)
+
+
+def _encode_stream_jpeg(frame, quality, max_width):
+    """JPEG-encode a frame for MJPEG, optionally downscaled to max_width (recording stays full res). Returns bytes or None."""
+    encode_frame = frame
+    if max_width > 0 and frame.shape[1] > max_width:
+        h, w = frame.shape[:2]
+        encode_frame = cv2.resize(frame, (max_width, int(h * max_width / w)), interpolation=cv2.INTER_AREA)
+    ret, buffer = cv2.imencode('.jpg', encode_frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes() if ret else None
+
+
+class _MjpegBroadcaster:
+    """Per-camera encode-once MJPEG source: latest (seq, jpeg_bytes) per tier, shared by all subscribers of that tier."""
+
+    def __init__(self, camera_id, ring):
+        self.camera_id = camera_id
+        self._ring = ring
+        self._cond = threading.Condition()
+        self._latest = {}  # tier -> (seq, bytes)
+        self._subscribers = {tier: 0 for tier in STREAM_TIERS}
+        self._encode_times = {tier: deque(maxlen=60) for tier in STREAM_TIERS}
+        self._thread = threading.Thread(target=self._run, daemon=True, name='mjpeg-%s' % camera_id)
+        self._thread.start()
+
+    def subscribe(self, tier):
+        with self._cond:
+            self._subscribers[tier] = self._subscribers.get(tier, 0) + 1
+
+    def unsubscribe(self, tier):
+        with self._cond:
+            self._subscribers[tier] = max(0, self._subscribers.get(tier, 0) - 1)
+
+    def wait_next(self, tier, after_seq, timeout=1.0):
+        """Block until this tier has a frame newer than after_seq; return the latest (seq, bytes) or None on timeout."""
+        with self._cond:
+            item = self._latest.get(tier)
+            if item is None or item[0] <= after_seq:
+                self._cond.wait(timeout)
+                item = self._latest.get(tier)
+            return item if item is not None and item[0] > after_seq else None
+
+    def stats(self):
+        """Subscriber count and measured encode fps per tier."""
+        with self._cond:
+            fps = {}
+            for tier, times in self._encode_times.items():
+                span = (times[-1] - times[0]) if len(times) >= 2 else 0
+                fps[tier] = round((len(times) - 1) / span, 1) if span > 0 else 0.0
+            return {'subscribers': dict(self._subscribers), 'encode_fps': fps}
+
+    def _run(self):
+        last_seq = 0
+        while True:
+            item = self._ring.wait_next(last_seq, timeout=1.0)
+            if item is None:
+                continue
+            last_seq, _, frame = item
+            with self._cond:
+                tiers = [t for t, n in self._subscribers.items() if n > 0]
+            if not tiers:
+                continue
+            try:
+                frame = _enhance_frame(frame)
+                for tier in tiers:
+                    quality, max_width = STREAM_TIERS[tier]
+                    data = _encode_stream_jpeg(frame, quality, max_width)
+                    if data is None:
+                        continue
+                    with self._cond:
+                        self._latest[tier] = (last_seq, data)
+                        self._encode_times[tier].append(time.time())
+                        self._cond.notify_all()
+            except Exception:
+                pass
+
+
+_mjpeg_broadcasters = {}  # camera_id -> _MjpegBroadcaster
+_mjpeg_broadcasters_lock = threading.Lock()
+
+
+def _get_mjpeg_broadcaster(camera_id):
+    """Return the camera's broadcaster, starting it (and its capture thread) on first use. None for unknown cameras."""
+    with _mjpeg_broadcasters_lock:
+        b = _mjpeg_broadcasters.get(camera_id)
+        if b is None:
+            ring = _get_frame_ring(camera_id)
+            if ring is None:
+                return None
+            b = _MjpegBroadcaster(camera_id, ring)
+            _mjpeg_broadcasters[camera_id] = b
+        return b
+
+
+def gen_frames(camera_id='0', tier='default'):
+    tier = tier if tier in STREAM_TIERS else 'default'
+    broadcaster = _get_mjpeg_broadcaster(camera_id)
+    last_seq = 0
     placeholder = _placeholder_frame_jpeg()
     if not placeholder:
         placeholder = (b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00\xff'
                      b'\xdb\x00C\x00\x08\x06\x06\x07\x06\x05\x08\x07\x07\x07\t\t\x08\n\x0c\x14\r\x0c\x0b\x0b\x0c\x19\x12\x13\x0f\x14\x1d\x1a\x1f\x1e\x1d\x1a\x1c\x1c $.\' ",#\x1c\x1c(7),01444\x1f\'9=82<.342\xff\xd9')  # minimal 1x1 JPEG fallback
     boundary = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
-    while True:
-        frame_bytes = None
-        if cap is not None and cap.isOpened():
-            success, frame = cap.read()
-            if success:
-                _camera_last_frame_time[camera_id] = time.time()
-                frame = _enhance_frame(frame)
-                if is_recording:
-                    rec_size = (1280, 720)
-                    with _recording_lock:
-                        if out is None:
-                            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-                            rec_path = os.path.join(_recordings_dir(), 'recording_%d.avi' % int(time.time()))
-                            out = cv2.VideoWriter(rec_path, fourcc, 20.0, rec_size)
-                    if out is not None and frame is not None and frame.size > 0:
-                        h, w = frame.shape[:2]
-                        if (w, h) != rec_size:
-                            rec_frame = cv2.resize(frame, rec_size, interpolation=cv2.INTER_AREA)
-                        else:
-                            rec_frame = np.ascontiguousarray(frame) if not frame.flags['C_CONTIGUOUS'] else frame
-                        # Validate to avoid SIGSEGV in OpenCV/FFmpeg (null or invalid buffer)
-                        ok = (
-                            isinstance(rec_frame, np.ndarray)
-                            and rec_frame.dtype == np.uint8
-                            and rec_frame.ndim == 3
-                            and rec_frame.shape == (rec_size[1], rec_size[0], 3)
-                            and rec_frame.flags['C_CONTIGUOUS']
-                        )
-                        if ok:
-                            try:
-                                with _recording_lock:
-                                    out.write(rec_frame.copy())
-                            except Exception:
-                                pass  # avoid process crash on VideoWriter/FFmpeg errors (e.g. Python 3.14 + opencv/ffmpeg on macOS)
-                # Optional resize for lighter stream (recording stays full res)
-                encode_frame = frame
-                if _stream_max_width > 0 and frame.shape[1] > _stream_max_width:
-                    h, w = frame.shape[:2]
-                    new_w = _stream_max_width
-                    new_h = int(h * new_w / w)
-                    encode_frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_AREA)
-                ret, buffer = cv2.imencode('.jpg', encode_frame, [cv2.IMWRITE_JPEG_QUALITY, _stream_jpeg_quality])
-                if ret:
-                    frame_bytes = buffer.tobytes()
-        if frame_bytes is None:
-            frame_bytes = placeholder
-            time.sleep(0.5)
-        yield boundary + frame_bytes + b'\r\n'
+    if broadcaster is not None:
+        broadcaster.subscribe(tier)
+    try:
+        while True:
+            item = broadcaster.wait_next(tier, last_seq, timeout=1.0) if broadcaster is not None else None
+            if item is not None:
+                last_seq, frame_bytes = item
+            else:
+                frame_bytes = placeholder
+                time.sleep(0.5)
+            yield boundary + frame_bytes + b'\r\n'
+    finally:
+        if broadcaster is not None:
+            broadcaster.unsubscribe(tier)
 
 
 def gen_thermal_frames():
@@ -2581,13 +4494,14 @@ def analyze_thermal():
 
 
 # Predictive threat: optional integration with proactive.predictor (rule_based_threat) for live pipeline
-def _apply_predictive_threat(data, event, timestamp_utc):
+def _apply_predictive_threat(data, event, timestamp_utc, state=None):
     """Apply proactive predictor rule-based escalation to data (threat_score, predicted_intent). No-op if proactive not available."""
     try:
         from proactive.predictor import rule_based_threat  # type: ignore[import-untyped]
     except ImportError:
         return
-    dwell_seconds = max(_zone_ticks.values(), default=0) * ANALYZE_INTERVAL_SECONDS
+    state = state if state is not None else _get_analytics_state(str(data.get('camera_id') or '0'))
+    dwell_seconds = max(state.zone_ticks.values(), default=0) * ANALYZE_INTERVAL_SECONDS
     anomaly = data.get('anomaly_score')
     if anomaly is not None and not isinstance(anomaly, (int, float)):
         try:
@@ -2693,12 +4607,11 @@ def _maybe_capture_notable(frame, data, event, camera_id, event_id, timestamp_ut
     if not rel_path:
         return
     try:
-        get_cursor().execute(
+        _db_writer.executemany(
             '''INSERT INTO notable_screenshots (timestamp_utc, reason, reason_detail, file_path, camera_id, event_id)
                VALUES (?, ?, ?, ?, ?, ?)''',
-            (timestamp_utc, reason, detail, rel_path, camera_id or '0', event_id)
+            [(timestamp_utc, reason, detail, rel_path, camera_id or '0', event_id)]
         )
-        get_conn().commit()
     except Exception:
         pass
 
@@ -2723,362 +4636,772 @@ def _update_pipeline_state(step, message, detail=None, confidence=None):
         _ai_pipeline_state['steps'] = _ai_pipeline_state['steps'][-12:]
 
 
-def analyze_frame():
-    global is_recording, _event_history, _pose_history, _scene_history, _last_event_insert, _last_motion_time, _last_upright_pose_time
+class _YoloBatcher:
+    """Inference service in front of yolo_model: collects frames from analysis workers for up to max_wait seconds (or max_batch
+    frames), runs one batched predict() and routes each Results back to its caller. Also serializes access to the shared model."""
+
+    def __init__(self, max_batch, max_wait):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._requests = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._batches = 0
+        self._frames = 0
+        self._last_batch_size = 0
+        self._max_batch_seen = 0
+        self._batch_sizes = deque(maxlen=100)
+
+    def predict(self, frame):
+        """Same contract as yolo_model.predict(frame): returns a one-element list of Results. Raises what predict raised."""
+        self._ensure_thread()
+        req = {'frame': frame, 'done': threading.Event(), 'result': None, 'error': None}
+        self._requests.put(req)
+        req['done'].wait()
+        if req['error'] is not None:
+            raise req['error']
+        return [req['result']]
+
+    def stats(self):
+        """Achieved batching: batches run, frames inferred, last/max/recent-average batch size."""
+        recent = list(self._batch_sizes)
+        return {
+            'max_batch': self.max_batch,
+            'max_wait_ms': int(self.max_wait * 1000),
+            'batches': self._batches,
+            'frames': self._frames,
+            'last_batch_size': self._last_batch_size,
+            'max_batch_size_seen': self._max_batch_seen,
+            'avg_batch_size': round(sum(recent) / len(recent), 2) if recent else None,
+        }
+
+    def _ensure_thread(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name='yolo-batch')
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.time()
+                try:
+                    batch.append(self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                results = yolo_model.predict([r['frame'] for r in batch], imgsz=_yolo_imgsz, conf=_yolo_conf, verbose=False)
+                for req, res in zip(batch, results):
+                    req['result'] = res
+            except Exception as e:
+                for req in batch:
+                    req['error'] = e
+            n = len(batch)
+            self._batches += 1
+            self._frames += n
+            self._last_batch_size = n
+            self._max_batch_seen = max(self._max_batch_seen, n)
+            self._batch_sizes.append(n)
+            for req in batch:
+                req['done'].set()
+
+
+_yolo_batcher = _YoloBatcher(YOLO_BATCH_MAX, YOLO_BATCH_WAIT_MS / 1000.0)
+
+
+def _yolo_predict(frame):
+    """YOLO predict for one analysis frame, batched with frames from other cameras by _yolo_batcher."""
+    return _yolo_batcher.predict(frame)
+
+
+def _mp_pose_process(rgb):
+    """Serialized MediaPipe pose call (one Pose graph shared by all analysis workers)."""
+    with _mp_pose_lock:
+        return mp_pose.process(rgb)
+
+
+# ANALYZE_MODE=process: the perception stage (_perceive_frame: YOLO, pose, emotion, attribute heuristics) runs in
+# ANALYZE_PROCESSES spawned worker processes so it never competes with request threads and MJPEG generators for this
+# process's GIL. Frames cross through multiprocessing.shared_memory slots (no pickling of pixels); only the compact
+# perception dict comes back. Stateful steps (smoothing, zones, events, DB) stay in the web process. Each worker loads
+# its own models, so memory grows with ANALYZE_PROCESSES and YOLO batching across cameras does not apply.
+ANALYZE_MODE = (os.environ.get('ANALYZE_MODE') or 'thread').strip().lower()
+try:
+    ANALYZE_PROCESSES = max(1, min(16, int(os.environ.get('ANALYZE_PROCESSES', str(max(1, min(4, (os.cpu_count() or 2) - 1)))))))
+except (TypeError, ValueError):
+    ANALYZE_PROCESSES = 2
+try:
+    ANALYZE_PROCESS_TIMEOUT_SECONDS = max(5.0, min(600.0, float(os.environ.get('ANALYZE_PROCESS_TIMEOUT_SECONDS', '60'))))
+except (TypeError, ValueError):
+    ANALYZE_PROCESS_TIMEOUT_SECONDS = 60.0
+_analysis_pool = None
+
+
+def _attach_shared_memory(name):
+    """Attach a shared_memory block owned (and unlinked) by the web process."""
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13: spawned children share the parent's resource tracker, so the duplicate registration is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+def _analysis_process_main(requests, results):
+    """ANALYZE_MODE=process worker entry: view each request's frame in its shared-memory slot and run _perceive_frame on it."""
+    attached = {}
+
+    def predict(frame):
+        return yolo_model.predict(frame, imgsz=_yolo_imgsz, conf=_yolo_conf, verbose=False)
+
     while True:
+        msg = requests.get()
+        if msg is None:
+            break
+        req_id, shm_name, shape, dtype, opts = msg
         try:
-            if is_recording:
-                success, frame = camera.read()
-                if success:
-                    _update_pipeline_state('object_detection', 'Running object detection…', None, None)
-                    results = yolo_model.predict(frame, imgsz=_yolo_imgsz, conf=_yolo_conf, verbose=False) if yolo_model else None
-                    if results and results[0].boxes:
-                        _filter_yolo_results(results)
-                    objects = [results[0].names[int(cls)] for cls in results[0].boxes.cls] if results and results[0].boxes else []
-                    max_conf = float(results[0].boxes.conf.max()) if results and results[0].boxes and hasattr(results[0].boxes, 'conf') and results[0].boxes.conf.numel() else 0.0
-                    obj_detail = ', '.join(objects[:3]) if objects else 'none'
-                    _update_pipeline_state('object_detection', 'Objects: %s' % (obj_detail or 'none'), obj_detail, max_conf)
-
-                    _update_pipeline_state('pose', 'Estimating pose…', None, None)
-                    results_pose = None
-                    pose = 'Unknown'
-                    pose_min_crop = max(32, min(64, int(os.environ.get('POSE_MIN_CROP_SIZE', '48'))))
-                    if MEDIAPIPE_AVAILABLE and mp_pose:
-                        # Phase 2.2: prefer person crop when available for more stable landmarks
-                        if results and results[0].boxes and hasattr(results[0], 'names'):
-                            person_idxs = [i for i, c in enumerate(results[0].boxes.cls) if results[0].names.get(int(c), '').lower() == 'person']
-                            if person_idxs:
-                                boxes = results[0].boxes
-                                best_idx = max(person_idxs, key=lambda i: (boxes.xyxy[i][2] - boxes.xyxy[i][0]) * (boxes.xyxy[i][3] - boxes.xyxy[i][1]))
-                                xyxy = boxes.xyxy[best_idx].cpu().numpy()
-                                h, w = frame.shape[:2]
-                                pad = 0.15
-                                bw, bh = xyxy[2] - xyxy[0], xyxy[3] - xyxy[1]
-                                x1 = max(0, int(xyxy[0] - pad * bw))
-                                y1 = max(0, int(xyxy[1] - pad * bh))
-                                x2 = min(w, int(xyxy[2] + pad * bw))
-                                y2 = min(h, int(xyxy[3] + pad * bh))
-                                if x2 > x1 and y2 > y1 and (y2 - y1) >= pose_min_crop and (x2 - x1) >= pose_min_crop:
-                                    crop = frame[y1:y2, x1:x2]
-                                    results_pose = mp_pose.process(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
-                                    if getattr(results_pose, 'pose_landmarks', None):
-                                        pose = _pose_label_from_landmarks(results_pose)
-                        if pose == 'Unknown':
-                            results_pose = mp_pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-                            if getattr(results_pose, 'pose_landmarks', None):
-                                pose = _pose_label_from_landmarks(results_pose)
-                            elif results and results[0].boxes and hasattr(results[0], 'names'):
-                                person_idxs = [i for i, c in enumerate(results[0].boxes.cls) if results[0].names.get(int(c), '').lower() == 'person']
-                                if person_idxs:
-                                    boxes = results[0].boxes
-                                    best_idx = max(person_idxs, key=lambda i: (boxes.xyxy[i][2] - boxes.xyxy[i][0]) * (boxes.xyxy[i][3] - boxes.xyxy[i][1]))
-                                    xyxy = boxes.xyxy[best_idx].cpu().numpy()
-                                    h, w = frame.shape[:2]
-                                    pad = 0.15
-                                    bw, bh = xyxy[2] - xyxy[0], xyxy[3] - xyxy[1]
-                                    x1 = max(0, int(xyxy[0] - pad * bw))
-                                    y1 = max(0, int(xyxy[1] - pad * bh))
-                                    x2 = min(w, int(xyxy[2] + pad * bw))
-                                    y2 = min(h, int(xyxy[3] + pad * bh))
-                                    if x2 > x1 and y2 > y1 and (y2 - y1) >= pose_min_crop and (x2 - x1) >= pose_min_crop:
-                                        crop = frame[y1:y2, x1:x2]
-                                        res_crop = mp_pose.process(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
-                                        if getattr(res_crop, 'pose_landmarks', None):
-                                            results_pose = res_crop
-                                            pose = _pose_label_from_landmarks(results_pose)
-                        if pose in ('Standing', 'Walking') and _detect_person_down(frame, results, results_pose):
-                            pose = 'Person down'
-                    # Pose temporal smoothing: require 2 of last 3 frames to agree (reduce Standing <-> Person down jitter)
-                    _pose_history.append(pose)
-                    if len(_pose_history) >= 3:
-                        recent_pose = list(_pose_history)[-3:]
-                        pose_counts = Counter(recent_pose)
-                        maj = pose_counts.most_common(1)[0]
-                        if maj[1] >= 2:
-                            pose = maj[0]
-                    # Track last time we saw upright (for fall false-positive reduction: "in bed" vs real fall)
-                    _analysis_camera_id = '0'
-                    if pose in ('Standing', 'Walking'):
-                        _last_upright_pose_time[_analysis_camera_id] = time.time()
-                    _update_pipeline_state('pose', 'Pose: %s' % pose, pose, None)
-
-                    cfg_early = _recording_config
-                    if not _is_personal_use() and cfg_early.get('ai_detail') == 'minimal':
-                        emotion = 'Unknown'
-                        license_plate = None
-                        scene = 'Unknown'
-                        _update_pipeline_state('emotion', 'Emotion: (minimal — disabled)', emotion, None)
-                        _update_pipeline_state('scene', 'Scene: (minimal)', scene, None)
-                    else:
-                        _update_pipeline_state('emotion', 'Analyzing emotion…', None, None)
-                        emotion = _get_dominant_emotion(frame, results)
-                        _update_pipeline_state('emotion', 'Emotion: %s' % (emotion or 'Unknown'), emotion, None)
-                        _update_pipeline_state('scene', 'Classifying scene…', None, None)
-                        # Scene: lower-half mean + variance (PLAN_90_PLUS; IEEE/Sciencedirect); Indoor = low mean and low var
-                        h, w = frame.shape[:2]
-                        lower_half = frame[h // 2:, :] if h >= 2 else frame
-                        scene_mean = float(np.mean(lower_half))
-                        scene_var = float(np.var(lower_half)) if lower_half.size else 0
-                        var_max = max(1000, min(20000, int(os.environ.get('SCENE_VAR_MAX_INDOOR', '5000'))))
-                        scene = 'Indoor' if (scene_mean < 100 and scene_var < var_max) else 'Outdoor'
-                        # Scene temporal smoothing: 2 of last 3 frames to reduce Indoor/Outdoor jitter
-                        _scene_history.append(scene)
-                        if len(_scene_history) >= 3:
-                            recent_scene = list(_scene_history)[-3:]
-                            scene_counts = Counter(recent_scene)
-                            maj_s = scene_counts.most_common(1)[0]
-                            if maj_s[1] >= 2:
-                                scene = maj_s[0]
-                        license_plate = lpr_on_vehicle_roi(frame, results)
-                        _update_pipeline_state('scene', 'Scene: %s' % scene, scene, None)
-
-                    _update_pipeline_state('motion', 'Checking motion / loiter / line…', None, None)
-                    motion = detect_motion(frame)
-                    if motion:
-                        _last_motion_time = time.time()
-                    loiter, line_cross, zones_with_person = check_loiter_and_line_cross(frame, results)
-                    raw_event = 'line_cross' if line_cross else ('loitering' if loiter else ('motion' if motion else None))
-                    _event_history.append(raw_event)
-                    recent = list(_event_history)
-                    if len(recent) >= 2:
-                        counts = Counter(recent)
-                        majority = counts.most_common(1)[0]
-                        if majority[1] >= 2 and majority[0] is not None:
-                            raw_event = majority[0]
-                        else:
-                            raw_event = None
-                    if raw_event == 'line_cross':
-                        event = 'Line Crossing Detected'
-                    elif raw_event == 'loitering':
-                        event = 'Loitering Detected'
-                    elif raw_event == 'motion':
-                        event = 'Motion Detected'
-                    else:
-                        event = 'None'
-                    # Only emit Fall Detected if person was upright recently (avoids "in bed" false positives)
-                    if pose == 'Person down':
-                        try:
-                            fall_require_sec = max(0, int(os.environ.get('FALL_REQUIRE_RECENT_UPRIGHT_SECONDS', '90')))
-                        except (TypeError, ValueError):
-                            fall_require_sec = 90
-                        last_upright = _last_upright_pose_time.get(_analysis_camera_id, 0)
-                        if fall_require_sec == 0 or (time.time() - last_upright) <= fall_require_sec:
-                            raw_event = 'fall'
-                            event = 'Fall Detected'
-                    _update_pipeline_state('motion', 'Event: %s' % event, event, None)
-
-                    _ptz_auto_follow_from_bbox(frame, results)
-
-                    crowd_count = sum(1 for cls in results[0].boxes.cls if results[0].names.get(int(cls), '').lower() == 'person') if results and results[0].boxes else 0
-
-                    cfg = _recording_config
-                    _update_pipeline_state('audio', 'Processing audio…', None, None)
-                    if cfg.get('capture_audio', True):
-                        audio_raw = get_audio_event()
-                        if isinstance(audio_raw, dict):
-                            audio_event = audio_raw.get('text', 'None')
-                            audio_attrs = _extract_audio_attributes(
-                                audio_raw.get('text'),
-                                audio_raw.get('energy_db'),
-                                audio_raw.get('duration_sec'),
-                            )
-                        else:
-                            audio_event = audio_raw if isinstance(audio_raw, str) else 'None'
-                            audio_attrs = _extract_audio_attributes(audio_event, None, None)
-                    else:
-                        audio_event = 'None'
-                        audio_attrs = _extract_audio_attributes('None', None, None)
-                    audio_msg = (audio_event[:50] + '…') if isinstance(audio_event, str) and len(audio_event) > 50 else (str(audio_event) if audio_event else 'none')
-                    _update_pipeline_state('audio', 'Audio: %s' % audio_msg, audio_msg, None)
-
-                    _update_pipeline_state('fuse', 'Fusing sensors…', None, None)
-                    wifi_raw = get_wifi_device()
-                    if isinstance(wifi_raw, dict):
-                        macs = wifi_raw.get('macs') or []
-                        device_mac = ','.join(macs) if macs else 'None'
-                        device_oui_vendor = wifi_raw.get('oui_vendor')
-                        device_probe_ssids = json.dumps(wifi_raw.get('probe_ssids') or []) if wifi_raw.get('probe_ssids') else None
-                    else:
-                        device_mac = wifi_raw if isinstance(wifi_raw, str) else 'None'
-                        device_oui_vendor = None
-                        device_probe_ssids = None
-                    thermal_signature = analyze_thermal()
-                    timestamp_utc = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
-                    if not cfg.get('capture_thermal', True):
-                        thermal_signature = 'None'
-                    if not cfg.get('capture_wifi', True):
-                        device_mac = 'None'
-                        device_oui_vendor = None
-                        device_probe_ssids = None
-                    data = {
-                        'date': time.strftime('%Y-%m-%d'),
-                        'time': time.strftime('%H:%M:%S'),
-                        'individual': 'Unidentified',
-                        'facial_features': f'pose={pose},emotion={emotion}',
-                        'object': objects[0] if objects else 'None',
-                        'pose': pose,
-                        'emotion': emotion,
-                        'scene': scene,
-                        'license_plate': license_plate,
-                        'event': event,
-                        'crowd_count': crowd_count,
-                        'audio_event': audio_event if cfg.get('capture_audio', True) else 'None',
-                        'device_mac': device_mac,
-                        'device_oui_vendor': device_oui_vendor,
-                        'device_probe_ssids': device_probe_ssids,
-                        'thermal_signature': thermal_signature,
-                        'camera_id': '0',
-                        'timestamp_utc': timestamp_utc,
-                        'zone_presence': ','.join(map(str, sorted(zones_with_person))) if zones_with_person else '',
-                        'model_version': _yolo_model_version(),
-                        'system_id': _system_id(),
-                    }
-                    cnx, cny = _get_primary_centroid_normalized(frame, results)
-                    cam_id = data.get('camera_id') or '0'
-                    if cnx is not None and cny is not None:
-                        data['centroid_nx'] = round(cnx, 4)
-                        data['centroid_ny'] = round(cny, 4)
-                        wx, wy = _apply_homography(cam_id, cnx, cny)
-                        if wx is not None and wy is not None:
-                            data['world_x'] = wx
-                            data['world_y'] = wy
-                    if cfg.get('capture_audio', True):
-                        for k, v in audio_attrs.items():
-                            if v is not None and (k not in data or data.get(k) is None):
-                                data[k] = v
-                    else:
-                        for k in list(data.keys()):
-                            if k.startswith('audio_'):
-                                data[k] = data.get(k) if k == 'audio_event' else None
-                    extended = _extract_extended_attributes(frame, results, pose, emotion, event, results_pose=results_pose) if (_is_personal_use() or cfg.get('ai_detail') == 'full') else {}
-                    for k, v in extended.items():
-                        if v is not None and (k not in data or data.get(k) is None):
-                            data[k] = v
-                    if os.environ.get('ENABLE_PREDICTIVE_THREAT', '').strip().lower() in ('1', 'true', 'yes'):
-                        _apply_predictive_threat(data, event, timestamp_utc)
-                    _apply_watchlist(frame, data, results)
-                    _maybe_capture_notable(frame, data, event, data.get('camera_id') or '0', None, timestamp_utc)
-                    if not _is_personal_use() and cfg.get('ai_detail') == 'minimal':
-                        minimal_keys = ('date', 'time', 'event', 'object', 'camera_id', 'timestamp_utc')
-                        data = {k: data.get(k) for k in minimal_keys if k in data}
-                        for k in list(data.keys()):
-                            if data[k] is None:
-                                data[k] = 'None' if k != 'timestamp_utc' else time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
-                    # Normalize row to canonical columns so every insert has same shape (consistent export/analytics)
-                    data = {k: data.get(k) for k in AI_DATA_EXPORT_COLUMNS}
-                    data['integrity_hash'] = _ai_data_integrity_hash(data)
-                    cols = list(AI_DATA_EXPORT_COLUMNS)
-                    _ai_data_batch.append(data)
-                    if len(_ai_data_batch) >= AI_DATA_BATCH_SIZE:
-                        for row in _ai_data_batch:
-                            get_cursor().execute(
-                                f'''INSERT INTO ai_data ({",".join(cols)}) VALUES ({",".join("?" * len(cols))})''',
-                                tuple(row.get(k) for k in cols),
-                            )
-                        get_conn().commit()
-                        _ai_data_batch.clear()
-                        _broadcast_event({'type': 'activity_update'})
-                    if event != 'None':
-                        ev_type = 'fall' if 'Fall' in event else ('line_cross' if 'Line' in event else ('loitering' if 'Loitering' in event else 'motion'))
-                        if ev_type not in cfg.get('event_types', ['motion', 'loitering', 'line_cross', 'fall']):
-                            pass
-                        else:
-                            dedupe_key = (ev_type, '0')
-                            now_ts = time.time()
-                            if dedupe_key in _last_event_insert and (now_ts - _last_event_insert[dedupe_key]) < _LAST_EVENT_DEDUPE_SEC:
-                                pass
-                            else:
-                                _last_event_insert[dedupe_key] = now_ts
-                                _ai_pipeline_state['last_event'] = event
-                                ev_ts_utc = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
-                                ev_meta = json.dumps({
-                                    'event': event, 'object': data['object'], 'crowd_count': crowd_count,
-                                    'emotion': data.get('emotion'), 'pose': data.get('pose'), 'scene': data.get('scene'),
-                                    'license_plate': data.get('license_plate') or None,
-                                    'suspicious_behavior': data.get('suspicious_behavior'),
-                                    'predicted_intent': data.get('predicted_intent'),
-                                    'stress_level': data.get('stress_level'),
-                                    'threat_score': data.get('threat_score'),
-                                    'anomaly_score': data.get('anomaly_score'),
-                                    'build': data.get('build'),
-                                    'hair_color': data.get('hair_color'),
-                                    'estimated_height_cm': data.get('estimated_height_cm'),
-                                    'perceived_age_range': data.get('perceived_age_range'),
-                                    'perceived_age': data.get('perceived_age'),
-                                    'perceived_gender': data.get('perceived_gender'),
-                                    'perceived_ethnicity': data.get('perceived_ethnicity'),
-                                    'attention_region': data.get('attention_region'),
-                                    'gait_notes': data.get('gait_notes'),
-                                    'illumination_band': data.get('illumination_band'),
-                                    'period_of_day_utc': data.get('period_of_day_utc'),
-                                    'audio_transcription': data.get('audio_transcription'),
-                                    'audio_sentiment': data.get('audio_sentiment'),
-                                    'audio_emotion': data.get('audio_emotion'),
-                                    'audio_stress_level': data.get('audio_stress_level'),
-                                    'audio_threat_score': data.get('audio_threat_score'),
-                                    'audio_anomaly_score': data.get('audio_anomaly_score'),
-                                    'device_mac': data.get('device_mac'),
-                                    'device_oui_vendor': data.get('device_oui_vendor'),
-                                    'device_probe_ssids': data.get('device_probe_ssids'),
-                                })
-                                ev_severity = 'medium'
-                                ev_hash = _event_integrity_hash(ev_ts_utc, ev_type, '0', 'default', ev_meta, ev_severity)
-                                get_cursor().execute(
-                                    '''INSERT INTO events (event_type, camera_id, site_id, timestamp, timestamp_utc, metadata, severity, integrity_hash)
-                                       VALUES (?, ?, ?, datetime("now"), ?, ?, ?, ?)''',
-                                    (ev_type, '0', 'default', ev_ts_utc, ev_meta, ev_severity, ev_hash)
-                                )
-                                get_conn().commit()
-                                _broadcast_event({'type': 'new_event'})
-                                _trigger_alert(ev_type, 'medium', json.dumps({'event': event, 'object': data['object']}))
-                                _perimeter_action(ev_type, '0', ev_ts_utc)
-                                _autonomous_action(ev_type, '0', ev_ts_utc, data.get('threat_score'), ev_meta)
-                    # Crowd density alert: when count >= threshold, emit crowding event and alert (deduped)
-                    try:
-                        crowd_alert_threshold = int(os.environ.get('CROWD_DENSITY_ALERT_THRESHOLD', '0'))
-                    except (TypeError, ValueError):
-                        crowd_alert_threshold = 0
-                    if crowd_alert_threshold > 0 and crowd_count >= crowd_alert_threshold:
-                        dedupe_key = ('crowding', '0')
-                        now_ts = time.time()
-                        if dedupe_key not in _last_event_insert or (now_ts - _last_event_insert[dedupe_key]) >= _LAST_EVENT_DEDUPE_SEC:
-                            _last_event_insert[dedupe_key] = now_ts
-                            ev_ts_utc = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
-                            ev_meta = json.dumps({'event': 'Crowding Detected', 'crowd_count': crowd_count, 'camera_id': '0'})
-                            ev_hash = _event_integrity_hash(ev_ts_utc, 'crowding', '0', 'default', ev_meta, 'medium')
-                            get_cursor().execute(
-                                '''INSERT INTO events (event_type, camera_id, site_id, timestamp, timestamp_utc, metadata, severity, integrity_hash)
-                                   VALUES (?, ?, ?, datetime("now"), ?, ?, ?, ?)''',
-                                ('crowding', '0', 'default', ev_ts_utc, ev_meta, 'medium', ev_hash)
-                            )
-                            get_conn().commit()
-                            _broadcast_event({'type': 'new_event'})
-                            _trigger_alert('crowding', 'medium', json.dumps({'event': 'Crowding Detected', 'crowd_count': crowd_count}))
+            shm = attached.get(shm_name)
+            if shm is None:
+                shm = attached[shm_name] = _attach_shared_memory(shm_name)
+            frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            out = _perceive_frame(frame, predict=predict, **opts)
+            dets = out['dets']
+            # Plain arrays only: classes defined in a spawned __mp_main__ do not unpickle in the web process
+            out['dets'] = (dets.xyxy, dets.conf, dets.cls, dets.names, dets.ids)
+            results.put((req_id, True, out))
+        except Exception as e:
+            results.put((req_id, False, '%s: %s' % (type(e).__name__, e)))
+        finally:
+            frame = None
+    for shm in attached.values():
+        try:
+            shm.close()
+        except Exception:
+            pass
+
+
+class _AnalysisProcessPool:
+    """Web-process side of ANALYZE_MODE=process. Each worker process owns `slots_per_worker` shared-memory frame slots; perceive()
+    copies the frame into a free slot, sends the slot name with the options and blocks (GIL released) until the worker's
+    result arrives. A collector thread routes results; dead workers, and workers that let a request time out, are restarted
+    and their in-flight requests failed, so a hung worker cannot keep its slots."""
+
+    def __init__(self, processes=ANALYZE_PROCESSES, slots_per_worker=2, slot_bytes=RECORDING_FRAME_SIZE[0] * RECORDING_FRAME_SIZE[1] * 3,
+                 timeout=ANALYZE_PROCESS_TIMEOUT_SECONDS):
+        from multiprocessing import shared_memory
+        self._shared_memory = shared_memory
+        self._ctx = multiprocessing.get_context('spawn')
+        self.processes = processes
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._results = self._ctx.Queue()
+        self._workers = []  # [process, request queue, {req_id: slot}]
+        self._free = queue.Queue()  # (worker index, slot index)
+        self._slots = {}  # (worker index, slot index) -> SharedMemory
+        self._pending = {}  # req_id -> [threading.Event, ok, payload]
+        self._next_id = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self.total_seconds = 0.0
+        for wi in range(processes):
+            self._workers.append(self._spawn(wi))
+            for si in range(slots_per_worker):
+                self._slots[(wi, si)] = shared_memory.SharedMemory(create=True, size=slot_bytes)
+                self._free.put((wi, si))
+        threading.Thread(target=self._collect, daemon=True, name='analysis-pool-results').start()
+        threading.Thread(target=self._monitor, daemon=True, name='analysis-pool-monitor').start()
+        import atexit
+        atexit.register(self.close)
+
+    def _spawn(self, wi):
+        requests = self._ctx.Queue()
+        proc = self._ctx.Process(target=_analysis_process_main, args=(requests, self._results), daemon=True, name='analysis-proc-%d' % wi)
+        proc.start()
+        return [proc, requests, {}]
+
+    def perceive(self, frame, **opts):
+        """Run _perceive_frame(frame, **opts) in a worker process and return its dict. Raises RuntimeError on failure/timeout."""
+        frame = np.ascontiguousarray(frame)
+        slot_key = self._free.get(timeout=self.timeout)
+        wi = slot_key[0]
+        try:
+            shm = self._slots[slot_key]
+            if shm.size < frame.nbytes:  # larger camera than the slot was sized for: replace the block (worker attaches by name)
+                shm.close()
+                shm.unlink()
+                shm = self._slots[slot_key] = self._shared_memory.SharedMemory(create=True, size=frame.nbytes)
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[...] = frame
+            event = threading.Event()
+            with self._lock:
+                self._next_id += 1
+                req_id = self._next_id
+                self._pending[req_id] = [event, False, None]
+                proc, requests, in_flight = self._workers[wi]
+                in_flight[req_id] = slot_key
+            started = time.time()
+            requests.put((req_id, shm.name, frame.shape, frame.dtype.str, opts))
+        except Exception:
+            self._free.put(slot_key)
+            raise
+        if not event.wait(self.timeout):
+            with self._lock:
+                self._pending.pop(req_id, None)
+                self.failed += 1
+                # Reclaim the slot by replacing the worker (never by reusing the slot while it may still write a result)
+                if req_id in self._workers[wi][2]:
+                    self._restart(wi, 'timed out after %.0fs' % self.timeout)
+            raise RuntimeError('analysis worker timed out after %.0fs' % self.timeout)
+        with self._lock:
+            _, ok, payload = self._pending.pop(req_id)
+            self.total_seconds += time.time() - started
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+        if not ok:
+            raise RuntimeError('analysis worker: %s' % payload)
+        payload['dets'] = _Detections(*payload['dets'])
+        return payload
+
+    def _release(self, req_id):
+        """Return the slot used by req_id to the free list. Caller holds _lock."""
+        for proc, requests, in_flight in self._workers:
+            slot_key = in_flight.pop(req_id, None)
+            if slot_key is not None:
+                self._free.put(slot_key)
+                return
+
+    def _collect(self):
+        while True:
+            try:
+                req_id, ok, payload = self._results.get()
+            except Exception:
+                time.sleep(0.1)
+                continue
+            with self._lock:
+                self._release(req_id)
+                pending = self._pending.get(req_id)
+                if pending is not None:
+                    pending[1], pending[2] = ok, payload
+                    pending[0].set()
+
+    def _restart(self, wi, reason):
+        """Replace worker wi (terminating it if still running), fail its in-flight requests and free their slots.
+        Caller holds _lock."""
+        proc, requests, in_flight = self._workers[wi]
+        print('[analysis-pool] worker %d %s; restarting' % (wi, reason), flush=True)
+        if proc.is_alive():
+            proc.terminate()
+            proc.join(timeout=1.0)
+            if proc.is_alive():
+                proc.kill()
+        for req_id in list(in_flight):
+            self._release(req_id)
+            pending = self._pending.get(req_id)
+            if pending is not None:
+                pending[1], pending[2] = False, 'worker process %s' % reason
+                pending[0].set()
+        self._workers[wi] = self._spawn(wi)
+        self.restarts += 1
+
+    def _monitor(self):
+        while True:
+            time.sleep(2.0)
+            with self._lock:
+                for wi, (proc, requests, in_flight) in enumerate(self._workers):
+                    if not proc.is_alive():
+                        self._restart(wi, 'exited (code %s)' % proc.exitcode)
+
+    def close(self):
+        """Stop workers and unlink the shared-memory slots (registered atexit)."""
+        with self._lock:
+            for proc, requests, _ in self._workers:
+                try:
+                    requests.put(None)
+                except Exception:
+                    pass
+            for proc, _, _ in self._workers:
+                proc.join(timeout=2)
+                if proc.is_alive():
+                    proc.terminate()
+            for shm in self._slots.values():
+                try:
+                    shm.close()
+                    shm.unlink()
+                except Exception:
+                    pass
+            self._slots = {}
+
+    def stats(self):
+        with self._lock:
+            done = self.completed + self.failed
+            return {
+                'mode': 'process',
+                'processes': self.processes,
+                'alive': sum(1 for proc, _, _ in self._workers if proc.is_alive()),
+                'in_flight': sum(len(in_flight) for _, _, in_flight in self._workers),
+                'completed': self.completed,
+                'failed': self.failed,
+                'restarts': self.restarts,
+                'avg_ms': round(1000.0 * self.total_seconds / done, 1) if done else None,
+            }
+
+
+def _flush_ai_data_batch():
+    """Hand buffered ai_data rows to _db_writer as one executemany; clients are told once they are committed.
+    Caller holds _ai_data_batch_lock."""
+    if not _ai_data_batch:
+        return
+    cols = list(AI_DATA_EXPORT_COLUMNS)
+    _db_writer.executemany(
+        f'''INSERT INTO ai_data ({",".join(cols)}) VALUES ({",".join("?" * len(cols))})''',
+        [tuple(row.get(k) for k in cols) for row in _ai_data_batch],
+        on_commit=lambda _: _broadcast_event({'type': 'activity_update'}),
+    )
+    _ai_data_batch.clear()
+
+
+def _queue_ai_data_row(data):
+    """Buffer one ai_data row (shared by all analysis workers); commit once AI_DATA_BATCH_SIZE rows are queued."""
+    with _ai_data_batch_lock:
+        _ai_data_batch.append(data)
+        if len(_ai_data_batch) >= AI_DATA_BATCH_SIZE:
+            _flush_ai_data_batch()
+
+
+def _perceive_frame(frame, extended=False, minimal=False, progress=None, predict=None, skip=(), track=None):
+    """Stateless perception for one frame: detections, pose label (person-down checked for every person), emotion, raw scene label,
+    frame-derived attributes and watchlist face embedding. No DB or per-camera state, so it can run in an
+    ANALYZE_MODE=process worker; returns a small picklable dict. progress: optional _update_pipeline_state-style callback.
+    Faces are detected once (_face_context) and the aligned crop is shared by emotion, demographics and watchlist.
+    skip: attribute groups (_ATTRIBUTE_GROUPS) cached for the primary track, not computed; track: optional callback
+    (dets -> skip groups) that assigns track IDs in-thread. 'skipped' / 'computed' in the result list the groups."""
+    progress = progress or (lambda *a: None)
+    progress('object_detection', 'Running object detection…', None, None)
+    if predict is None:
+        predict = _yolo_predict
+    results = predict(frame) if yolo_model else None
+    # YOLO output is converted to NumPy once here; every helper below reads this _Detections instead of results[0].boxes
+    dets = _filter_yolo_results(_Detections.from_results(results))
+    if track is not None:
+        skip = track(dets)
+
+    progress('pose', 'Estimating pose…', None, None)
+    # Phase 2.2: person crops give more stable landmarks; every person gets fall detection, the primary one the label
+    pose_ctx = _pose_context(frame, dets)
+    primary_pose = pose_ctx['primary']
+    results_pose = primary_pose['results'] if primary_pose else None
+    pose = primary_pose['label'] if primary_pose else 'Unknown'
+    persons_down = sum(1 for p in pose_ctx['persons'] if p['down'])
+    if persons_down:
+        pose = 'Person down'
+    out = {'dets': dets, 'pose': pose, 'emotion': 'Unknown', 'scene': 'Unknown', 'attributes': {}, 'face_embedding': None, 'faces': None,
+           'pose_persons': len(pose_ctx['persons']), 'persons_down': persons_down}
+    watchlist = _watchlist_enabled()
+    computed = set()
+    if not minimal:
+        computed.add('emotion')
+    if extended:
+        computed.update(('appearance', 'demographics'))
+    if watchlist:
+        computed.add('identity')
+    skip = computed & set(skip or ()) if dets.primary is not None else set()
+    computed -= skip
+    out['skipped'], out['computed'] = sorted(skip), sorted(computed)
+    face_ctx = None
+    if computed & {'emotion', 'demographics', 'identity'}:
+        progress('faces', 'Detecting faces…', None, None)
+        face_ctx = _face_context(frame, dets)
+        if face_ctx is not None:
+            out['faces'] = face_ctx['count']
+    if 'emotion' in computed:
+        progress('emotion', 'Analyzing emotion…', None, None)
+        out['emotion'] = _get_dominant_emotion(frame, dets, face_ctx)
+    if not minimal:
+        progress('scene', 'Classifying scene…', None, None)
+        # Scene: lower-half mean + variance (PLAN_90_PLUS; IEEE/Sciencedirect); Indoor = low mean and low var
+        h, w = frame.shape[:2]
+        lower_half = frame[h // 2:, :] if h >= 2 else frame
+        scene_mean = float(np.mean(lower_half))
+        scene_var = float(np.var(lower_half)) if lower_half.size else 0
+        var_max = max(1000, min(20000, int(os.environ.get('SCENE_VAR_MAX_INDOOR', '5000'))))
+        out['scene'] = 'Indoor' if (scene_mean < 100 and scene_var < var_max) else 'Outdoor'
+    if extended:
+        out['attributes'] = _extract_frame_attributes(frame, dets, results_pose, face_ctx, skip)
+    if 'identity' in computed:
+        out['face_embedding'] = _watchlist_face_embedding(frame, dets, face_ctx)
+    return out
+
+
+def _analyze_camera_frame(camera_id, frame, state):
+    """Run the analysis pipeline (detection, pose, scene, motion/loiter/line, fusion, events) on one frame of camera_id.
+    With MOTION_GATE, motion runs first on a downscaled frame and a still scene skips the pipeline (keep-alive excepted)."""
+    gate_motion = None
+    if MOTION_GATE_ENABLED:
+        gate_motion = _detect_motion_gate(frame, state)
+        now = time.time()
+        if gate_motion:
+            state.last_motion_time = now
+        elif MOTION_GATE_KEEPALIVE_SECONDS == 0 or (now - state.last_inference_time) < MOTION_GATE_KEEPALIVE_SECONDS:
+            state.inferences_skipped += 1
+            _update_pipeline_state('motion', 'No motion — detection skipped (motion gate)', 'None', None)
+            return
+    state.inferences_executed += 1
+    state.last_inference_time = time.time()
+    cfg_early = _recording_config
+    minimal = not _is_personal_use() and cfg_early.get('ai_detail') == 'minimal'
+    extended_enabled = _is_personal_use() or cfg_early.get('ai_detail') == 'full'
+    cache = state.attribute_cache
+    if _analysis_pool is not None:
+        _update_pipeline_state('object_detection', 'Running detection, pose and attributes (worker process)…', None, None)
+        # Tracking happens here after the worker returns, so skip is predicted from the previous frame's primary track
+        skip = cache.fresh_groups(cache.last_primary_track) if cache is not None else ()
+        perception = _analysis_pool.perceive(frame, extended=extended_enabled, minimal=minimal, skip=skip)
+        if cache is not None:
+            cache.assign(perception['dets'], frame)
+    else:
+        track = (lambda d: cache.fresh_groups(cache.assign(d, frame))) if cache is not None else None
+        perception = _perceive_frame(frame, extended=extended_enabled, minimal=minimal, progress=_update_pipeline_state, track=track)
+    if cache is not None:
+        cache.resolve(perception)
+    dets = perception['dets']
+    if perception.get('faces') is not None:
+        _face_stage_stats['frames'] += 1
+        _face_stage_stats['frames_with_face'] += perception['faces'] > 0
+    objects = list(dets.labels)
+    max_conf = float(dets.conf.max()) if len(dets) else 0.0
+    obj_detail = ', '.join(objects[:3]) if objects else 'none'
+    _update_pipeline_state('object_detection', 'Objects: %s' % (obj_detail or 'none'), obj_detail, max_conf)
+
+    pose = perception['pose']
+    # Pose temporal smoothing: require 2 of last 3 frames to agree (reduce Standing <-> Person down jitter)
+    state.pose_history.append(pose)
+    if len(state.pose_history) >= 3:
+        recent_pose = list(state.pose_history)[-3:]
+        pose_counts = Counter(recent_pose)
+        maj = pose_counts.most_common(1)[0]
+        if maj[1] >= 2:
+            pose = maj[0]
+    # Track last time we saw upright (for fall false-positive reduction: "in bed" vs real fall)
+    if pose in ('Standing', 'Walking'):
+        state.last_upright_pose_time = time.time()
+    _update_pipeline_state('pose', 'Pose: %s' % pose, pose, None)
+
+    if minimal:
+        emotion = 'Unknown'
+        license_plate = None
+        scene = 'Unknown'
+        _update_pipeline_state('emotion', 'Emotion: (minimal — disabled)', emotion, None)
+        _update_pipeline_state('scene', 'Scene: (minimal)', scene, None)
+    else:
+        emotion = perception['emotion']
+        _update_pipeline_state('emotion', 'Emotion: %s' % (emotion or 'Unknown'), emotion, None)
+        scene = perception['scene']
+        # Scene temporal smoothing: 2 of last 3 frames to reduce Indoor/Outdoor jitter
+        state.scene_history.append(scene)
+        if len(state.scene_history) >= 3:
+            recent_scene = list(state.scene_history)[-3:]
+            scene_counts = Counter(recent_scene)
+            maj_s = scene_counts.most_common(1)[0]
+            if maj_s[1] >= 2:
+                scene = maj_s[0]
+        # LPR: vehicle ROIs go to the OCR pool (after tracking, so reads are voted per vehicle track); never blocks here
+        license_plate = _lpr_pool.submit(camera_id, frame, dets)
+        _update_pipeline_state('scene', 'Scene: %s' % scene, scene, None)
+
+    _update_pipeline_state('motion', 'Checking motion / loiter / line…', None, None)
+    motion = gate_motion if gate_motion is not None else detect_motion(frame, state)
+    if motion:
+        state.last_motion_time = time.time()
+    loiter, line_cross, zones_with_person = check_loiter_and_line_cross(frame, dets, state)
+    raw_event = 'line_cross' if line_cross else ('loitering' if loiter else ('motion' if motion else None))
+    state.event_history.append(raw_event)
+    recent = list(state.event_history)
+    if len(recent) >= 2:
+        counts = Counter(recent)
+        majority = counts.most_common(1)[0]
+        if majority[1] >= 2 and majority[0] is not None:
+            raw_event = majority[0]
+        else:
+            raw_event = None
+    if raw_event == 'line_cross':
+        event = 'Line Crossing Detected'
+    elif raw_event == 'loitering':
+        event = 'Loitering Detected'
+    elif raw_event == 'motion':
+        event = 'Motion Detected'
+    else:
+        event = 'None'
+    # Only emit Fall Detected if person was upright recently (avoids "in bed" false positives)
+    if pose == 'Person down':
+        try:
+            fall_require_sec = max(0, int(os.environ.get('FALL_REQUIRE_RECENT_UPRIGHT_SECONDS', '90')))
+        except (TypeError, ValueError):
+            fall_require_sec = 90
+        last_upright = state.last_upright_pose_time
+        if fall_require_sec == 0 or (time.time() - last_upright) <= fall_require_sec:
+            raw_event = 'fall'
+            event = 'Fall Detected'
+    _update_pipeline_state('motion', 'Event: %s' % event, event, None)
+
+    if camera_id == '0':  # ONVIF PTZ is bound to the primary camera
+        _ptz_auto_follow_from_bbox(frame, dets)
+
+    crowd_count = int(dets.person.sum())
+
+    cfg = _recording_config
+    _update_pipeline_state('audio', 'Processing audio…', None, None)
+    if cfg.get('capture_audio', True):
+        audio_raw = get_audio_event()
+        if isinstance(audio_raw, dict):
+            audio_event = audio_raw.get('text', 'None')
+            audio_attrs = _extract_audio_attributes(
+                audio_raw.get('text'),
+                audio_raw.get('energy_db'),
+                audio_raw.get('duration_sec'),
+            )
+        else:
+            audio_event = audio_raw if isinstance(audio_raw, str) else 'None'
+            audio_attrs = _extract_audio_attributes(audio_event, None, None)
+    else:
+        audio_event = 'None'
+        audio_attrs = _extract_audio_attributes('None', None, None)
+    audio_msg = (audio_event[:50] + '…') if isinstance(audio_event, str) and len(audio_event) > 50 else (str(audio_event) if audio_event else 'none')
+    _update_pipeline_state('audio', 'Audio: %s' % audio_msg, audio_msg, None)
+
+    _update_pipeline_state('fuse', 'Fusing sensors…', None, None)
+    wifi_raw = get_wifi_device()
+    if isinstance(wifi_raw, dict):
+        macs = wifi_raw.get('macs') or []
+        device_mac = ','.join(macs) if macs else 'None'
+        device_oui_vendor = wifi_raw.get('oui_vendor')
+        device_probe_ssids = json.dumps(wifi_raw.get('probe_ssids') or []) if wifi_raw.get('probe_ssids') else None
+    else:
+        device_mac = wifi_raw if isinstance(wifi_raw, str) else 'None'
+        device_oui_vendor = None
+        device_probe_ssids = None
+    thermal_signature = analyze_thermal()
+    timestamp_utc = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    if not cfg.get('capture_thermal', True):
+        thermal_signature = 'None'
+    if not cfg.get('capture_wifi', True):
+        device_mac = 'None'
+        device_oui_vendor = None
+        device_probe_ssids = None
+    data = {
+        'date': time.strftime('%Y-%m-%d'),
+        'time': time.strftime('%H:%M:%S'),
+        'individual': 'Unidentified',
+        'facial_features': f'pose={pose},emotion={emotion}',
+        'object': objects[0] if objects else 'None',
+        'pose': pose,
+        'emotion': emotion,
+        'scene': scene,
+        'license_plate': license_plate,
+        'event': event,
+        'crowd_count': crowd_count,
+        'audio_event': audio_event if cfg.get('capture_audio', True) else 'None',
+        'device_mac': device_mac,
+        'device_oui_vendor': device_oui_vendor,
+        'device_probe_ssids': device_probe_ssids,
+        'thermal_signature': thermal_signature,
+        'camera_id': camera_id,
+        'timestamp_utc': timestamp_utc,
+        'zone_presence': ','.join(map(str, sorted(zones_with_person))) if zones_with_person else '',
+        'model_version': _yolo_model_version(),
+        'system_id': _system_id(),
+    }
+    cnx, cny = _get_primary_centroid_normalized(frame, dets)
+    cam_id = data.get('camera_id') or '0'
+    if cnx is not None and cny is not None:
+        data['centroid_nx'] = round(cnx, 4)
+        data['centroid_ny'] = round(cny, 4)
+        wx, wy = _apply_homography(cam_id, cnx, cny)
+        if wx is not None and wy is not None:
+            data['world_x'] = wx
+            data['world_y'] = wy
+    if cfg.get('capture_audio', True):
+        for k, v in audio_attrs.items():
+            if v is not None and (k not in data or data.get(k) is None):
+                data[k] = v
+    else:
+        for k in list(data.keys()):
+            if k.startswith('audio_'):
+                data[k] = data.get(k) if k == 'audio_event' else None
+    extended = {}
+    if extended_enabled:
+        extended = dict(perception['attributes'])
+        extended.update(_extract_behavior_attributes(pose, emotion, event))
+    for k, v in extended.items():
+        if v is not None and (k not in data or data.get(k) is None):
+            data[k] = v
+    if os.environ.get('ENABLE_PREDICTIVE_THREAT', '').strip().lower() in ('1', 'true', 'yes'):
+        _apply_predictive_threat(data, event, timestamp_utc, state)
+    if perception.get('identity'):
+        data.update(perception['identity'])
+    elif perception.get('face_embedding') is not None:
+        _apply_watchlist_embedding(data, perception['face_embedding'])
+        if cache is not None:
+            cache.store_identity(dets.track_id(dets.primary), data)
+    _maybe_capture_notable(frame, data, event, data.get('camera_id') or '0', None, timestamp_utc)
+    if not _is_personal_use() and cfg.get('ai_detail') == 'minimal':
+        minimal_keys = ('date', 'time', 'event', 'object', 'camera_id', 'timestamp_utc')
+        data = {k: data.get(k) for k in minimal_keys if k in data}
+        for k in list(data.keys()):
+            if data[k] is None:
+                data[k] = 'None' if k != 'timestamp_utc' else time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    # Normalize row to canonical columns so every insert has same shape (consistent export/analytics)
+    data = {k: data.get(k) for k in AI_DATA_EXPORT_COLUMNS}
+    data['integrity_hash'] = _ai_data_integrity_hash(data)
+    _queue_ai_data_row(data)
+    if event != 'None':
+        ev_type = 'fall' if 'Fall' in event else ('line_cross' if 'Line' in event else ('loitering' if 'Loitering' in event else 'motion'))
+        if ev_type not in cfg.get('event_types', ['motion', 'loitering', 'line_cross', 'fall']):
+            pass
+        else:
+            dedupe_key = (ev_type, camera_id)
+            now_ts = time.time()
+            if dedupe_key in _last_event_insert and (now_ts - _last_event_insert[dedupe_key]) < _LAST_EVENT_DEDUPE_SEC:
+                pass
+            else:
+                _last_event_insert[dedupe_key] = now_ts
+                _ai_pipeline_state['last_event'] = event
+                ev_ts_utc = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+                ev_meta = json.dumps({
+                    'event': event, 'object': data['object'], 'crowd_count': crowd_count,
+                    'emotion': data.get('emotion'), 'pose': data.get('pose'), 'scene': data.get('scene'),
+                    'license_plate': data.get('license_plate') or None,
+                    'suspicious_behavior': data.get('suspicious_behavior'),
+                    'predicted_intent': data.get('predicted_intent'),
+                    'stress_level': data.get('stress_level'),
+                    'threat_score': data.get('threat_score'),
+                    'anomaly_score': data.get('anomaly_score'),
+                    'build': data.get('build'),
+                    'hair_color': data.get('hair_color'),
+                    'estimated_height_cm': data.get('estimated_height_cm'),
+                    'perceived_age_range': data.get('perceived_age_range'),
+                    'perceived_age': data.get('perceived_age'),
+                    'perceived_gender': data.get('perceived_gender'),
+                    'perceived_ethnicity': data.get('perceived_ethnicity'),
+                    'attention_region': data.get('attention_region'),
+                    'gait_notes': data.get('gait_notes'),
+                    'illumination_band': data.get('illumination_band'),
+                    'period_of_day_utc': data.get('period_of_day_utc'),
+                    'audio_transcription': data.get('audio_transcription'),
+                    'audio_sentiment': data.get('audio_sentiment'),
+                    'audio_emotion': data.get('audio_emotion'),
+                    'audio_stress_level': data.get('audio_stress_level'),
+                    'audio_threat_score': data.get('audio_threat_score'),
+                    'audio_anomaly_score': data.get('audio_anomaly_score'),
+                    'device_mac': data.get('device_mac'),
+                    'device_oui_vendor': data.get('device_oui_vendor'),
+                    'device_probe_ssids': data.get('device_probe_ssids'),
+                })
+                ev_severity = 'medium'
+                ev_hash = _event_integrity_hash(ev_ts_utc, ev_type, camera_id, 'default', ev_meta, ev_severity)
+                _db_writer.execute(
+                    '''INSERT INTO events (event_type, camera_id, site_id, timestamp, timestamp_utc, metadata, severity, integrity_hash)
+                       VALUES (?, ?, ?, datetime("now"), ?, ?, ?, ?)''',
+                    (ev_type, camera_id, 'default', ev_ts_utc, ev_meta, ev_severity, ev_hash),
+                    on_commit=lambda event_id, ev_type=ev_type: (
+                        _request_event_clip(camera_id, event_id, ev_type), _broadcast_event({'type': 'new_event'})),
+                )
+                _trigger_alert(ev_type, 'medium', json.dumps({'event': event, 'object': data['object']}))
+                _perimeter_action(ev_type, camera_id, ev_ts_utc)
+                _autonomous_action(ev_type, camera_id, ev_ts_utc, data.get('threat_score'), ev_meta)
+    # Crowd density alert: when count >= threshold, emit crowding event and alert (deduped)
+    try:
+        crowd_alert_threshold = int(os.environ.get('CROWD_DENSITY_ALERT_THRESHOLD', '0'))
+    except (TypeError, ValueError):
+        crowd_alert_threshold = 0
+    if crowd_alert_threshold > 0 and crowd_count >= crowd_alert_threshold:
+        dedupe_key = ('crowding', camera_id)
+        now_ts = time.time()
+        if dedupe_key not in _last_event_insert or (now_ts - _last_event_insert[dedupe_key]) >= _LAST_EVENT_DEDUPE_SEC:
+            _last_event_insert[dedupe_key] = now_ts
+            ev_ts_utc = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            ev_meta = json.dumps({'event': 'Crowding Detected', 'crowd_count': crowd_count, 'camera_id': camera_id})
+            ev_hash = _event_integrity_hash(ev_ts_utc, 'crowding', camera_id, 'default', ev_meta, 'medium')
+            _db_writer.execute(
+                '''INSERT INTO events (event_type, camera_id, site_id, timestamp, timestamp_utc, metadata, severity, integrity_hash)
+                   VALUES (?, ?, ?, datetime("now"), ?, ?, ?, ?)''',
+                ('crowding', camera_id, 'default', ev_ts_utc, ev_meta, 'medium', ev_hash),
+                on_commit=lambda _: _broadcast_event({'type': 'new_event'}),
+            )
+            _trigger_alert('crowding', 'medium', json.dumps({'event': 'Crowding Detected', 'crowd_count': crowd_count}))
+
+
+def _analysis_interval(state, now):
+    """Seconds until this camera is due again: ANALYZE_INTERVAL_SECONDS, stretched by the idle multiplier when it has had no motion."""
+    try:
+        idle_skip_sec = int(os.environ.get('ANALYZE_IDLE_SKIP_SECONDS', '0'))
+        idle_mult = max(1.0, min(5.0, float(os.environ.get('ANALYZE_IDLE_INTERVAL_MULTIPLIER', '2'))))
+    except (TypeError, ValueError):
+        idle_skip_sec = 0
+        idle_mult = 2.0
+    # Optional idle skip: when no motion for N seconds, analyse less often to save CPU (sustainable AI efficiency)
+    if idle_skip_sec > 0 and state.last_motion_time > 0 and (now - state.last_motion_time) >= idle_skip_sec:
+        return ANALYZE_INTERVAL_SECONDS * idle_mult
+    return ANALYZE_INTERVAL_SECONDS
+
+
+def _analysis_worker():
+    """Pool worker: analyse the newest captured frame of each camera_id taken from _analysis_queue."""
+    while True:
+        camera_id = _analysis_queue.get()
+        state = _get_analytics_state(camera_id)
+        started = time.time()
+        try:
+            ring = _get_frame_ring(camera_id)
+            item = ring.latest() if ring is not None else None
+            if item is not None and item[0] != state.last_seq:
+                state.last_seq, _, frame = item
+                _analyze_camera_frame(camera_id, frame, state)
+                state.runs += 1
+                state.last_run_at = started
+        except Exception as e:
+            print('[analyze_frame]', camera_id, e, flush=True)
+        finally:
+            state.last_duration = time.time() - started
+            state.busy = False
+
+
+def analyze_frame():
+    """Analysis scheduler: while recording, dispatch every camera in _cameras to the ANALYZE_WORKERS pool at most once per
+    ANALYZE_INTERVAL_SECONDS (per-camera budget), most overdue first. A camera still being analysed is skipped, not queued.
+    ANALYZE_MODE=process: the pool threads hand perception to _AnalysisProcessPool worker processes."""
+    global _analysis_pool
+    if ANALYZE_MODE == 'process' and _analysis_pool is None:
+        try:
+            _analysis_pool = _AnalysisProcessPool()
+        except Exception as e:
+            print('[analyze_frame] process pool unavailable, analysing in threads:', e, flush=True)
+    for i in range(ANALYZE_WORKERS):
+        threading.Thread(target=_analysis_worker, daemon=True, name='analyze-%d' % i).start()
+    while True:
+        try:
+            now = time.time()
+            if is_recording:
+                states = sorted((_get_analytics_state(cid) for cid in list(_cameras.keys())), key=lambda st: st.next_due)
+                for state in states:
+                    if state.next_due > now:
+                        continue
+                    state.next_due = now + _analysis_interval(state, now)
+                    if state.busy:
+                        state.overruns += 1
+                        continue
+                    state.busy = True
+                    _analysis_queue.put(state.camera_id)
             else:
                 # Flush any buffered ai_data when recording stops (collection optimization research).
-                if _ai_data_batch:
-                    cols = list(AI_DATA_EXPORT_COLUMNS)
-                    for row in _ai_data_batch:
-                        get_cursor().execute(
-                            f'''INSERT INTO ai_data ({",".join(cols)}) VALUES ({",".join("?" * len(cols))})''',
-                            tuple(row.get(k) for k in cols),
-                        )
-                    get_conn().commit()
-                    _ai_data_batch.clear()
-                    _broadcast_event({'type': 'activity_update'})
-            # Optional idle skip: when no motion for N seconds, sleep longer to save CPU (sustainable AI efficiency)
-            try:
-                idle_skip_sec = int(os.environ.get('ANALYZE_IDLE_SKIP_SECONDS', '0'))
-                idle_mult = max(1.0, min(5.0, float(os.environ.get('ANALYZE_IDLE_INTERVAL_MULTIPLIER', '2'))))
-            except (TypeError, ValueError):
-                idle_skip_sec = 0
-                idle_mult = 2.0
-            if idle_skip_sec > 0 and _last_motion_time > 0 and (time.time() - _last_motion_time) >= idle_skip_sec:
-                time.sleep(ANALYZE_INTERVAL_SECONDS * idle_mult)
-            else:
-                time.sleep(ANALYZE_INTERVAL_SECONDS)
+                with _ai_data_batch_lock:
+                    _flush_ai_data_batch()
+            time.sleep(0.25)
         except Exception as e:
             print('[analyze_frame]', e, flush=True)
+            time.sleep(1)
 
 
 # Optional: serve React production build (set USE_REACT_APP=1 and run "cd frontend && npm run build")
@@ -3152,7 +5475,8 @@ def serve_react(path):
 def video_feed(camera_id='0'):
     if camera_id not in _cameras:
         return jsonify({'error': 'Camera not found'}), 404
-    return Response(gen_frames(camera_id), mimetype='multipart/x-mixed-replace; boundary=frame')
+    tier = (request.args.get('tier') or 'default').strip().lower()
+    return Response(gen_frames(camera_id, tier), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
 @app.route('/thermal_feed')
@@ -3295,7 +5619,7 @@ def list_streams():
 
 
 def _get_camera_status_list():
-    """Return list of camera status dicts for system status: id, name, status (ok/no_signal/offline), resolution, source, last_frame_utc, last_offline_utc, flapping."""
+    """Return list of camera status dicts for system status: id, name, status (ok/no_signal/offline), resolution, source, last_frame_utc, last_offline_utc, flapping, capture_fps, stream (subscribers/encode_fps per tier), analysis (scheduler runs/overruns, motion-gate executed/skipped), recording (writer fps/queue/drops)."""
     now = time.time()
     stale_seconds = 30  # no frame in 30s = no_signal
     flapping_window_seconds = 600  # 10 min
@@ -3343,7 +5667,26 @@ def _get_camera_status_list():
         resolution = f'{w}x{h}' if (w and h) else None
         src = _camera_sources[int(cam_id)] if cam_id.isdigit() and int(cam_id) < len(_camera_sources) else cam_id
         last_frame_utc = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(last_ts)) if last_ts else None
-        out_list.append({'id': cam_id, 'name': name, 'status': status, 'resolution': resolution, 'source': str(src), 'last_frame_utc': last_frame_utc, 'last_offline_utc': last_offline_utc, 'flapping': flapping})
+        ring = _frame_rings.get(cam_id)
+        capture_fps = ring.fps() if ring is not None else None
+        broadcaster = _mjpeg_broadcasters.get(cam_id)
+        stream = broadcaster.stats() if broadcaster is not None else None
+        writer = _recording_writers.get(cam_id)
+        recording = writer.stats() if writer is not None else None
+        clip_buf = _clip_buffers.get(cam_id)
+        if recording is not None and clip_buf is not None:
+            recording['event_clips'] = clip_buf.stats()
+        st = _analytics_states.get(cam_id)
+        analysis = {
+            'runs': st.runs,
+            'overruns': st.overruns,
+            'last_duration_ms': int(st.last_duration * 1000) if st.last_duration is not None else None,
+            'last_run_utc': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(st.last_run_at)) if st.last_run_at else None,
+            'inferences_executed': st.inferences_executed,
+            'inferences_skipped': st.inferences_skipped,
+            'attribute_cache': st.attribute_cache.stats() if st.attribute_cache is not None else None,
+        } if st is not None else None
+        out_list.append({'id': cam_id, 'name': name, 'status': status, 'resolution': resolution, 'source': str(src), 'last_frame_utc': last_frame_utc, 'last_offline_utc': last_offline_utc, 'flapping': flapping, 'capture_fps': capture_fps, 'stream': stream, 'analysis': analysis, 'recording': recording})
     if _thermal_capture is not None:
         out_list.append({'id': 'thermal', 'name': 'Thermal', 'status': 'ok', 'resolution': '80x60', 'source': 'flir', 'last_frame_utc': None, 'last_offline_utc': None, 'flapping': False})
     return out_list
@@ -3391,12 +5734,18 @@ def _get_ai_status():
             'device': os.environ.get('YOLO_DEVICE') or 'default',
             'imgsz': yolo_imgsz,
             'conf': _yolo_conf,
+            'batching': _yolo_batcher.stats(),
+            'backend': _yolo_backend_info,
         },
+        'analysis': _analysis_pool.stats() if _analysis_pool is not None else {'mode': 'thread', 'workers': ANALYZE_WORKERS},
+        'face_detection': dict(_face_stage_stats, detector=FACE_DETECTOR if FACE_DETECTOR == 'yunet' and hasattr(cv2, 'FaceDetectorYN') else 'off'),
         'emotion_backend': emotion_backend,
         'mediapipe_pose': MEDIAPIPE_AVAILABLE,
         'gait_notes_enabled': _is_gait_notes_enabled(),
         'lpr': True,  # pytesseract-based LPR always attempted when available
         'lpr_preprocess': _ENABLE_LPR_PREPROCESS,
+        'lpr_ocr': _lpr_pool.stats(),
+        'watchlist_gallery': _watchlist_gallery.stats(),
         'stream_quality': stream_quality,
         'stream_max_width': stream_max_w,
     }
@@ -3467,6 +5816,9 @@ def api_v1_system_status():
         'ai': _get_ai_status(),
         'storage_used_bytes': storage_bytes,
         'recording_count': recording_count,
+        'mp4_cache': _mp4_cache.stats(),
+        'db_writer': _db_writer.stats(),
+        'db_read_pool': _read_pool.stats(),
         'retention_days': retention_days,
         'audio_enabled': _audio_capture_enabled,
         'audio_available': AUDIO_AVAILABLE,
@@ -3759,13 +6111,12 @@ def recording_status():
 
 @app.route('/toggle_recording', methods=['POST'])
 def toggle_recording():
-    global is_recording, out
+    global is_recording
     is_recording = not is_recording
-    if not is_recording:
-        with _recording_lock:
-            if out:
-                out.release()
-                out = None
+    if is_recording:
+        _start_recording_writers()
+    else:
+        _stop_recording_writers()
     _audit(session.get('username'), 'toggle_recording', 'recording', 'on' if is_recording else 'off')
     _broadcast_event({'type': 'recording_toggle', 'recording': is_recording})
     return jsonify({'recording': is_recording})
@@ -3976,13 +6327,8 @@ def _recordings_storage():
     total = 0
     count = 0
     try:
-        for f in os.listdir(rec_dir):
-            if not _safe_recording_basename(f):
-                continue
-            path = os.path.join(rec_dir, f)
-            if os.path.isfile(path):
-                total += os.path.getsize(path)
-                count += 1
+        get_cursor().execute('SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM recordings')
+        count, total = get_cursor().fetchone()
     except Exception:
         pass
     free_bytes = total_bytes_partition = None
@@ -3996,64 +6342,381 @@ def _recordings_storage():
 
 
 def _safe_recording_basename(name):
-    """Allow only recording_<digits>.avi to prevent path traversal."""
-    return name if re.match(r'^recording_\d+\.avi$', name) else None
+    """Allow only recording_<unix>.avi (legacy) or recording_<camera>_<unix>.avi to prevent path traversal."""
+    return name if re.match(r'^recording_(?:[A-Za-z0-9-]+_)?\d+\.avi$', name) else None
+
+
+_RECORDING_CATALOG_COLUMNS = ('name', 'camera_id', 'start_utc', 'end_utc', 'frame_count', 'size_bytes', 'codec', 'fps')
+
+
+def _recordings_in_range(start_utc=None, end_utc=None, camera_id=None, limit=None, newest_first=True, include_unattributed=False):
+    """Catalog lookup: segments overlapping [start_utc, end_utc] (ISO UTC; either may be None), optionally for one camera. Uses the recordings indexes.
+    include_unattributed: with camera_id, also return legacy segments whose camera is unknown (camera_id NULL)."""
+    where = []
+    params = []
+    if end_utc:
+        where.append('start_utc <= ?')
+        params.append(end_utc)
+    if start_utc:
+        where.append('(end_utc IS NULL OR end_utc >= ?)')
+        params.append(start_utc)
+    if camera_id:
+        where.append('(camera_id = ? OR camera_id IS NULL)' if include_unattributed else 'camera_id = ?')
+        params.append(str(camera_id))
+    sql = 'SELECT %s FROM recordings' % ', '.join(_RECORDING_CATALOG_COLUMNS)
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY start_utc %s' % ('DESC' if newest_first else 'ASC')
+    if limit:
+        sql += ' LIMIT %d' % int(limit)
+    cur = get_cursor()
+    cur.execute(sql, params)
+    return [dict(zip(_RECORDING_CATALOG_COLUMNS, row)) for row in cur.fetchall()]
+
+
+def _sync_recordings_catalog():
+    """Reconcile the recordings table with the recordings directory: add files not yet catalogued (legacy or pre-catalog
+    recordings), close segments left open by a crash, and drop rows whose file is gone. Run once at startup."""
+    rec_dir = _recordings_dir()
+    active = {os.path.basename(w.path) for w in list(_recording_writers.values()) if w.path}
+    cur = get_cursor()
+    cur.execute('SELECT name, end_utc FROM recordings')
+    known = dict(cur.fetchall())
+    try:
+        names = [f for f in os.listdir(rec_dir) if _safe_recording_basename(f)]
+    except OSError:
+        return
+    on_disk = set(names)
+    for f in names:
+        path = os.path.join(rec_dir, f)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        end_utc = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(st.st_mtime))
+        if f not in known:
+            m = re.match(r'^recording_(?:([A-Za-z0-9-]+)_)?(\d+)\.avi$', f)
+            start_ts = int(m.group(2)) if m else int(st.st_mtime)
+            cur.execute(
+                'INSERT OR IGNORE INTO recordings (name, camera_id, start_utc, end_utc, size_bytes, codec) VALUES (?, ?, ?, ?, ?, ?)',
+                (f, m.group(1) if m else None, time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(start_ts)), end_utc, st.st_size, RECORDING_CODEC),
+            )
+        elif known[f] is None and f not in active:
+            cur.execute('UPDATE recordings SET end_utc = ?, size_bytes = ? WHERE name = ?', (end_utc, st.st_size, f))
+    for f in known:
+        if f not in on_disk and f not in active:
+            cur.execute('DELETE FROM recordings WHERE name = ?', (f,))
+    get_conn().commit()
 
 
 @app.route('/recordings')
 @require_role('viewer', 'operator', 'admin')
 def list_recordings():
-    """List available recording files (NISTIR 8161 / evidence export)."""
-    rec_dir = _recordings_dir()
+    """List recording segments from the catalog (NISTIR 8161 / evidence export). Optional camera_id, from/to (ISO UTC or YYYY-MM-DD), limit (default 1000)."""
+    camera_id = (request.args.get('camera_id') or '').strip() or None
+    date_from = (request.args.get('from') or '').strip() or None
+    date_to = (request.args.get('to') or '').strip() or None
+    if date_from and len(date_from) == 10:
+        date_from += 'T00:00:00Z'
+    if date_to and len(date_to) == 10:
+        date_to += 'T23:59:59Z'
+    try:
+        limit = max(1, min(10000, int(request.args.get('limit', 1000))))
+    except (TypeError, ValueError):
+        limit = 1000
     result = []
     try:
-        for f in os.listdir(rec_dir):
-            if not _safe_recording_basename(f):
-                continue
-            path = os.path.join(rec_dir, f)
-            if not os.path.isfile(path):
-                continue
-            stat = os.stat(path)
-            result.append({
-                'name': f,
-                'size_bytes': stat.st_size,
-                'created_utc': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(stat.st_mtime)),
-            })
+        for row in _recordings_in_range(date_from, date_to, camera_id, limit=limit):
+            row['created_utc'] = row['start_utc']
+            if row['size_bytes'] is None:  # segment still being written
+                try:
+                    row['size_bytes'] = os.path.getsize(os.path.join(_recordings_dir(), row['name']))
+                except OSError:
+                    row['size_bytes'] = 0
+            result.append(row)
     except Exception:
         pass
-    result.sort(key=lambda x: x['created_utc'], reverse=True)
     return jsonify({'recordings': result})
 
 
-def _compute_recording_sha256(path: str) -> str | None:
-    """Compute SHA-256 of a recording file. Returns hex digest or None on error (OSAC/SWGDE fixity)."""
+def _compute_recording_sha256(path: str, max_bytes_per_sec: float | None = None) -> str | None:
+    """Compute SHA-256 of a recording file. Returns hex digest or None on error (OSAC/SWGDE fixity).
+    max_bytes_per_sec: optional read throttle so background verification does not starve recording I/O."""
     try:
         h = hashlib.sha256()
+        started = time.time()
+        done = 0
         with open(path, 'rb') as f:
             while True:
-                chunk = f.read(65536)
+                chunk = f.read(1024 * 1024)
                 if not chunk:
                     break
                 h.update(chunk)
+                done += len(chunk)
+                if max_bytes_per_sec:
+                    ahead = done / max_bytes_per_sec - (time.time() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
         return h.hexdigest()
     except Exception:
         return None
 
 
+def _store_recording_sha256(basename, sha256, st, checked_at=None):
+    """Persist a recording digest with the size/mtime it was computed for (recording_fixity)."""
+    checked_at = checked_at or time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    get_cursor().execute(
+        'INSERT OR REPLACE INTO recording_fixity (path, sha256, checked_at, size_bytes, mtime_ns) VALUES (?, ?, ?, ?, ?)',
+        (basename, sha256, checked_at, st.st_size, st.st_mtime_ns),
+    )
+    get_conn().commit()
+
+
+_recording_digest_queue = queue.Queue()
+_recording_digest_thread = None
+_recording_digest_lock = threading.Lock()
+
+
+def _queue_recording_digest(path):
+    """Hash a closed segment and store it in recording_fixity on the background digest thread (never blocks the caller)."""
+    global _recording_digest_thread
+    with _recording_digest_lock:
+        if _recording_digest_thread is None or not _recording_digest_thread.is_alive():
+            _recording_digest_thread = threading.Thread(target=_recording_digest_loop, daemon=True, name='recording-digest')
+            _recording_digest_thread.start()
+    _recording_digest_queue.put(path)
+
+
+def _recording_digest_loop():
+    while True:
+        path = _recording_digest_queue.get()
+        try:
+            sha = _compute_recording_sha256(path)
+            if sha:
+                _store_recording_sha256(os.path.basename(path), sha, os.stat(path))
+        except Exception:
+            pass
+        finally:
+            _recording_digest_queue.task_done()
+
+
+def _recording_sha256(path):
+    """(sha256, source): the stored digest when the file's size/mtime are unchanged since it was hashed ('stored'),
+    else hash now and store it ('computed'). (None, None) on error."""
+    basename = os.path.basename(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None
+    try:
+        get_cursor().execute('SELECT sha256, size_bytes, mtime_ns FROM recording_fixity WHERE path = ?', (basename,))
+        row = get_cursor().fetchone()
+    except Exception:
+        row = None
+    if row and row[1] == st.st_size and row[2] == st.st_mtime_ns:
+        return row[0], 'stored'
+    sha = _compute_recording_sha256(path)
+    if sha and not row:
+        try:
+            _store_recording_sha256(basename, sha, st)
+        except Exception:
+            pass
+    return sha, 'computed'
+
+
+# MP4 playback cache: remuxed copies of recordings keyed by (name, size, mtime) in <recordings>/.mp4cache, LRU-bounded
+# by MP4_CACHE_MAX_MB. Segments are remuxed in the background when they close, so play/seek is a plain file serve.
+try:
+    MP4_CACHE_MAX_MB = max(0, min(1024 * 1024, int(os.environ.get('MP4_CACHE_MAX_MB', '2048'))))
+except (TypeError, ValueError):
+    MP4_CACHE_MAX_MB = 2048
+MP4_CACHE_PREFETCH = os.environ.get('MP4_CACHE_PREFETCH', '1').strip().lower() in ('1', 'true', 'yes')
+
+
+class _Mp4RemuxCache:
+    """Size-bounded LRU of ffmpeg -c copy remuxes. Entry file: <stem>.<size>.<mtime_ns>.mp4, so a rewritten source never hits a stale copy."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._prefetch_queue = queue.Queue(maxsize=256)
+        self._prefetch_thread = None
+        self.hits = 0
+        self.misses = 0
+        self.remuxes = 0
+        self.failures = 0
+        self.evictions = 0
+
+    def _dir(self):
+        d = os.path.join(_recordings_dir(), '.mp4cache')
+        os.makedirs(d, exist_ok=True)
+        return d
+
+    @staticmethod
+    def _entry_name(path):
+        st = os.stat(path)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return '%s.%d.%d.mp4' % (stem, st.st_size, st.st_mtime_ns)
+
+    def get(self, path):
+        """Cached MP4 for path if present (marks it most recently used), else None."""
+        try:
+            cached = os.path.join(self._dir(), self._entry_name(path))
+        except OSError:
+            return None
+        if os.path.isfile(cached):
+            try:
+                os.utime(cached)  # LRU order survives restarts (mtime = last use)
+            except OSError:
+                pass
+            return cached
+        return None
+
+    def ensure(self, path):
+        """Cached MP4 for path, remuxing now on a miss (one remux per entry even with concurrent callers). None if ffmpeg fails."""
+        cached = self.get(path)
+        if cached:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        return self._remux(path)
+
+    def prefetch(self, path):
+        """Queue a background remux (e.g. at segment close). Drops the request if the queue is full."""
+        if self.max_bytes <= 0 or not shutil.which('ffmpeg'):
+            return
+        with self._lock:
+            if self._prefetch_thread is None or not self._prefetch_thread.is_alive():
+                self._prefetch_thread = threading.Thread(target=self._prefetch_loop, daemon=True, name='mp4-prefetch')
+                self._prefetch_thread.start()
+        try:
+            self._prefetch_queue.put_nowait(path)
+        except queue.Full:
+            pass
+
+    def discard(self, basename):
+        """Remove every cached remux of a recording (e.g. when retention deletes it)."""
+        stem = os.path.splitext(basename)[0] + '.'
+        try:
+            for f in os.listdir(self._dir()):
+                if f.startswith(stem) and f.endswith('.mp4'):
+                    try:
+                        os.remove(os.path.join(self._dir(), f))
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+
+    def stats(self):
+        entries, total = self._entries()
+        return {
+            'entries': len(entries), 'bytes': total, 'max_bytes': self.max_bytes,
+            'hits': self.hits, 'misses': self.misses, 'remuxes': self.remuxes, 'failures': self.failures, 'evictions': self.evictions,
+        }
+
+    def _entries(self):
+        """[(mtime, size, path)] oldest first, and their total size."""
+        out = []
+        try:
+            d = self._dir()
+            for f in os.listdir(d):
+                if not f.endswith('.mp4'):
+                    continue
+                fp = os.path.join(d, f)
+                try:
+                    st = os.stat(fp)
+                except OSError:
+                    continue
+                out.append((st.st_mtime, st.st_size, fp))
+        except OSError:
+            pass
+        out.sort()
+        return out, sum(e[1] for e in out)
+
+    def _evict(self, keep):
+        entries, total = self._entries()
+        for _, size, fp in entries:
+            if total <= self.max_bytes:
+                break
+            if fp == keep:
+                continue
+            try:
+                os.remove(fp)
+                total -= size
+                self.evictions += 1
+            except OSError:
+                pass
+
+    def _remux(self, path):
+        import subprocess
+        if self.max_bytes <= 0:
+            return None
+        try:
+            name = self._entry_name(path)
+        except OSError:
+            return None
+        with self._lock:
+            key_lock = self._key_locks.setdefault(name, threading.Lock())
+        with key_lock:
+            cached = os.path.join(self._dir(), name)
+            if os.path.isfile(cached):
+                return cached
+            tmp = cached + '.part'
+            try:
+                subprocess.run(
+                    ['ffmpeg', '-y', '-i', path, '-c', 'copy', '-movflags', '+faststart', '-f', 'mp4', tmp],
+                    capture_output=True, timeout=300, check=True
+                )
+                os.replace(tmp, cached)
+            except (FileNotFoundError, subprocess.TimeoutExpired, subprocess.CalledProcessError, OSError):
+                self.failures += 1
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                return None
+            finally:
+                with self._lock:
+                    self._key_locks.pop(name, None)
+            self.remuxes += 1
+            self._evict(keep=cached)
+            return cached
+
+    def _prefetch_loop(self):
+        while True:
+            path = self._prefetch_queue.get()
+            try:
+                if os.path.isfile(path) and not self.get(path):
+                    self._remux(path)
+            except Exception:
+                pass
+
+
+_mp4_cache = _Mp4RemuxCache(MP4_CACHE_MAX_MB * 1024 * 1024)
+
+
 def _export_recording_file(path: str, as_mp4: bool):
-    """If as_mp4 True and ffmpeg available, convert AVI to MP4 and return (temp_path, download_name, mimetype, sha256). Else return (path, basename, mimetype, sha256). Caller must unlink temp_path if different from path."""
+    """If as_mp4 True and ffmpeg available, return the cached MP4 remux (or a temp remux when the cache is disabled) as (path, download_name, mimetype, sha256, temp_path). Else return (path, basename, mimetype, sha256, None). Caller must unlink temp_path when set."""
     import subprocess
     import tempfile
     basename = os.path.basename(path)
     if not as_mp4:
+        sha, _ = _recording_sha256(path)
+        if not sha:
+            return None, None, None, None, 'Could not compute hash'
+        return path, basename, 'video/x-msvideo', sha, None
+    mp4_name = basename.replace('.avi', '.mp4') if basename.endswith('.avi') else basename + '.mp4'
+    cached = _mp4_cache.ensure(path)
+    if cached:
         h = hashlib.sha256()
-        with open(path, 'rb') as f:
+        with open(cached, 'rb') as f:
             while True:
                 chunk = f.read(65536)
                 if not chunk:
                     break
                 h.update(chunk)
-        return path, basename, 'video/x-msvideo', h.hexdigest(), None
+        return cached, mp4_name, 'video/mp4', h.hexdigest(), None
     out_fd, out_path = tempfile.mkstemp(suffix='.mp4')
     os.close(out_fd)
     try:
@@ -4074,7 +6737,6 @@ def _export_recording_file(path: str, as_mp4: bool):
             if not chunk:
                 break
             h.update(chunk)
-    mp4_name = basename.replace('.avi', '.mp4') if basename.endswith('.avi') else basename + '.mp4'
     return out_path, mp4_name, 'video/mp4', h.hexdigest(), out_path
 
 
@@ -4142,24 +6804,17 @@ def recording_play(filename):
     from flask import send_file
     as_mp4 = request.args.get('format', '').lower() == 'mp4'
     if as_mp4:
-        result = _export_recording_file(path, as_mp4=True)
-        if result[0] is not None and result[1] is not None:
-            file_path, _, mimetype, _, temp_path = result
-            try:
-                return send_file(
-                    file_path,
-                    mimetype=mimetype or 'video/mp4',
-                    as_attachment=False,
-                    download_name=None,
-                    conditional=True,
-                    etag=True,
-                )
-            finally:
-                if temp_path and temp_path != path and os.path.isfile(temp_path):
-                    try:
-                        os.unlink(temp_path)
-                    except Exception:
-                        pass
+        # Range/seek requests hit the cached remux; only the first request for a recording (if not prefetched) runs ffmpeg
+        cached = _mp4_cache.ensure(path)
+        if cached:
+            return send_file(
+                cached,
+                mimetype='video/mp4',
+                as_attachment=False,
+                download_name=None,
+                conditional=True,
+                etag=True,
+            )
         # Fall back to AVI if MP4 conversion failed
     return send_file(
         path,
@@ -4181,16 +6836,25 @@ def recording_manifest(filename):
     path = os.path.join(_recordings_dir(), basename)
     if not os.path.isfile(path):
         return jsonify({'error': 'Not found'}), 404
-    current_sha256 = _compute_recording_sha256(path)
+    current_sha256, sha_source = _recording_sha256(path)
     if not current_sha256:
         return jsonify({'error': 'Could not compute hash'}), 500
+    camera_id = '0'
+    try:
+        get_cursor().execute('SELECT camera_id FROM recordings WHERE name = ?', (basename,))
+        row = get_cursor().fetchone()
+        if row and row[0]:
+            camera_id = row[0]
+    except Exception:
+        pass
     out = {
         'filename': basename,
         'size_bytes': os.stat(path).st_size,
         'created_utc': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(os.path.getmtime(path))),
         'sha256': current_sha256,
+        'sha256_source': sha_source,  # 'stored' = digest recorded at segment close / last fixity check, file size+mtime unchanged
         'system_id': os.environ.get('SYSTEM_ID') or platform.node() or 'surveillance',
-        'camera_id': '0',
+        'camera_id': camera_id,
         'image_type': 'primary',  # OSAC 2024-N-0011 / BEST_PATH Phase 3.7: stored recording = primary image
     }
     try:
@@ -4241,10 +6905,10 @@ _ptz_auto_follow_last_time = 0.0
 AUTO_PTZ_FOLLOW_COOLDOWN = 3.0  # seconds between auto-follow moves
 
 
-def _ptz_auto_follow_from_bbox(frame, results):
+def _ptz_auto_follow_from_bbox(frame, dets):
     """Auto PTZ: move camera to keep largest detected person near center. ONVIF only; rate-limited."""
     global _ptz_auto_follow_last_time
-    if _onvif_ptz is None or _onvif_profile_token is None or not results or not results[0].boxes:
+    if _onvif_ptz is None or _onvif_profile_token is None or dets is None or dets.primary is None:
         return
     if os.environ.get('AUTO_PTZ_FOLLOW', '').strip().lower() not in ('1', 'true', 'yes'):
         return
@@ -4252,20 +6916,7 @@ def _ptz_auto_follow_from_bbox(frame, results):
     if now - _ptz_auto_follow_last_time < AUTO_PTZ_FOLLOW_COOLDOWN:
         return
     h, w = frame.shape[:2]
-    names = results[0].names
-    boxes = results[0].boxes
-    best = None
-    best_area = 0
-    for i, cls in enumerate(boxes.cls):
-        if names.get(int(cls), '').lower() != 'person':
-            continue
-        xyxy = boxes.xyxy[i].cpu().numpy()
-        area = (xyxy[2] - xyxy[0]) * (xyxy[3] - xyxy[1])
-        if area > best_area:
-            best_area = area
-            best = xyxy
-    if best is None:
-        return
+    best = dets.xyxy[dets.primary]
     cx = (best[0] + best[2]) / 2
     cy = (best[1] + best[3]) / 2
     center_x, center_y = w / 2.0, h / 2.0
@@ -4395,8 +7046,8 @@ def get_data():
         params.append(event_type)
     allowed_sites = _get_user_allowed_site_ids()
     if allowed_sites is not None:
-        get_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
-        allowed_cameras = [r[0] for r in get_cursor().fetchall()]
+        _read_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
+        allowed_cameras = [r[0] for r in _read_cursor().fetchall()]
         if allowed_cameras:
             sql += ' AND camera_id IN (%s)' % ','.join('?' * len(allowed_cameras))
             params.extend(allowed_cameras)
@@ -4407,17 +7058,17 @@ def get_data():
         params.append(camera_id)
     # Prefer timestamp_utc for ordering when present (correct across date boundaries)
     try:
-        get_cursor().execute("SELECT 1 FROM ai_data WHERE timestamp_utc IS NOT NULL AND timestamp_utc != '' LIMIT 1")
-        if get_cursor().fetchone():
+        _read_cursor().execute("SELECT 1 FROM ai_data WHERE timestamp_utc IS NOT NULL AND timestamp_utc != '' LIMIT 1")
+        if _read_cursor().fetchone():
             sql += ' ORDER BY timestamp_utc DESC LIMIT ? OFFSET ?'
         else:
             sql += ' ORDER BY date DESC, time DESC LIMIT ? OFFSET ?'
     except Exception:
         sql += ' ORDER BY date DESC, time DESC LIMIT ? OFFSET ?'
     params.extend([limit, offset])
-    get_cursor().execute(sql, params)
-    rows = get_cursor().fetchall()
-    cols = [d[0] for d in get_cursor().description]
+    _read_cursor().execute(sql, params)
+    rows = _read_cursor().fetchall()
+    cols = [d[0] for d in _read_cursor().description]
     data = [dict(zip(cols, row)) for row in rows]
     etag = hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
     if request.headers.get('If-None-Match', '').strip('"') == etag:
@@ -4443,7 +7094,7 @@ def list_events():
     severity = request.args.get('severity')
     acknowledged = request.args.get('acknowledged')  # 'true' | 'false' | omit for all
     site_id = request.args.get('site_id')
-    sql = 'SELECT id, event_type, camera_id, site_id, timestamp, timestamp_utc, metadata, severity, acknowledged_by, acknowledged_at, integrity_hash FROM events WHERE 1=1'
+    sql = 'SELECT id, event_type, camera_id, site_id, timestamp, timestamp_utc, metadata, severity, acknowledged_by, acknowledged_at, integrity_hash, clip_path FROM events WHERE 1=1'
     params = []
     allowed_sites = _get_user_allowed_site_ids()
     if allowed_sites is not None:
@@ -4473,9 +7124,9 @@ def list_events():
         sql += ' AND acknowledged_at IS NULL'
     sql += ' ORDER BY timestamp_utc DESC, timestamp DESC LIMIT ? OFFSET ?'
     params.extend([limit, offset])
-    get_cursor().execute(sql, params)
-    rows = get_cursor().fetchall()
-    cols = ['id', 'event_type', 'camera_id', 'site_id', 'timestamp', 'timestamp_utc', 'metadata', 'severity', 'acknowledged_by', 'acknowledged_at', 'integrity_hash']
+    _read_cursor().execute(sql, params)
+    rows = _read_cursor().fetchall()
+    cols = ['id', 'event_type', 'camera_id', 'site_id', 'timestamp', 'timestamp_utc', 'metadata', 'severity', 'acknowledged_by', 'acknowledged_at', 'integrity_hash', 'clip_path']
     data = [dict(zip(cols, row)) for row in rows]
     etag = hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
     if request.headers.get('If-None-Match', '').strip('"') == etag:
@@ -4498,15 +7149,32 @@ def create_event():
     meta_str = json.dumps(metadata) if metadata is not None else None
     ev_ts_utc = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
     ev_hash = _event_integrity_hash(ev_ts_utc, event_type, camera_id, site_id, meta_str, severity)
-    get_cursor().execute(
+    event_id = _db_writer.execute(
         '''INSERT INTO events (event_type, camera_id, site_id, timestamp, timestamp_utc, metadata, severity, integrity_hash)
            VALUES (?, ?, ?, datetime("now"), ?, ?, ?, ?)''',
-        (event_type, camera_id, site_id, ev_ts_utc, meta_str, severity, ev_hash)
+        (event_type, camera_id, site_id, ev_ts_utc, meta_str, severity, ev_hash),
+        wait=True,
     )
-    get_conn().commit()
     _broadcast_event({'type': 'new_event'})
     _trigger_alert(event_type, severity, meta_str)
-    return jsonify({'success': True, 'id': get_cursor().lastrowid})
+    return jsonify({'success': True, 'id': event_id})
+
+
+@app.route('/events/<int:event_id>/clip')
+@require_role('viewer', 'operator', 'admin')
+def event_clip(event_id):
+    """Serve the pre/post-roll clip linked to an event (video/x-msvideo, MJPG). 404 until the post-roll has been written."""
+    get_cursor().execute('SELECT site_id, clip_path FROM events WHERE id = ?', (event_id,))
+    row = get_cursor().fetchone()
+    allowed_sites = _get_user_allowed_site_ids()
+    if not row or (allowed_sites is not None and row[0] not in allowed_sites):
+        return jsonify({'error': 'Event not found'}), 404
+    name = _safe_clip_basename(row[1])
+    path = os.path.join(_event_clips_dir(), name) if name else None
+    if not path or not os.path.isfile(path):
+        return jsonify({'error': 'No clip for this event'}), 404
+    from flask import send_file
+    return send_file(path, mimetype='video/x-msvideo', as_attachment=False, conditional=True, etag=True)
 
 
 @app.route('/events/<int:event_id>/acknowledge', methods=['POST'])
@@ -4531,144 +7199,119 @@ def acknowledge_event(event_id):
 
 
 # ---------- API v1 (enterprise / scale) ----------
+def _bucket_hours_arg():
+    """bucket_hours query arg (1-24, default 1) for the rollup-backed analytics endpoints."""
+    try:
+        return max(1, min(24, int(request.args.get('bucket_hours', '1'))))
+    except (TypeError, ValueError):
+        return 1
+
+
+# Start hour ('00'-'23') of the bucket_hours-wide bucket an hourly rollup row falls in; bind bucket_hours twice.
+_ROLLUP_BUCKET_SQL = "printf('%02d', (CAST(hour AS INTEGER) / ?) * ?)"
+
+
 @app.route('/api/v1/analytics/aggregates')
 def api_v1_analytics_aggregates():
-    """Time-series aggregates by camera and event type for dashboards/heatmaps. Bucket by hour."""
+    """Time-series aggregates by camera and event type for dashboards/heatmaps, from the ai_data_hourly rollup re-bucketed
+    to bucket_hours (1-24)."""
     date_from = request.args.get('date_from') or time.strftime('%Y-%m-%d', time.gmtime(time.time() - 7 * 86400))
     date_to = request.args.get('date_to') or time.strftime('%Y-%m-%d')
-    try:
-        bucket_hours = max(1, min(24, int(request.args.get('bucket_hours', '1'))))
-    except (TypeError, ValueError):
-        bucket_hours = 1
+    bucket_hours = _bucket_hours_arg()
     camera_id = request.args.get('camera_id')
     site_id = request.args.get('site_id')
-    sql = """SELECT date, strftime('%H', time) AS hour, event, camera_id, COUNT(*) AS cnt, SUM(crowd_count) AS total_crowd
-             FROM ai_data WHERE date >= ? AND date <= ?"""
-    params = [date_from, date_to]
+    sql = """SELECT date, %s AS bucket, NULLIF(event, ''), NULLIF(camera_id, ''), SUM(cnt), SUM(total_crowd)
+             FROM ai_data_hourly WHERE date >= ? AND date <= ?""" % _ROLLUP_BUCKET_SQL
+    params = [bucket_hours, bucket_hours, date_from, date_to]
     if camera_id:
         sql += ' AND camera_id = ?'
         params.append(camera_id)
-    sql += " GROUP BY date, hour, event, camera_id ORDER BY date, hour"
+    sql += ' GROUP BY date, bucket, event, camera_id ORDER BY date, bucket'
     try:
-        get_cursor().execute(sql, params)
-        rows = get_cursor().fetchall()
+        _read_cursor().execute(sql, params)
+        rows = _read_cursor().fetchall()
     except sqlite3.OperationalError:
-        try:
-            get_cursor().execute("""SELECT date, strftime('%H', time) AS hour, event, COUNT(*) AS cnt, SUM(crowd_count) AS total_crowd
-                              FROM ai_data WHERE date >= ? AND date <= ? GROUP BY date, hour, event ORDER BY date, hour""",
-                           (date_from, date_to))
-            rows = [(r[0], r[1], r[2], '0', r[3], r[4]) for r in get_cursor().fetchall()]
-        except Exception:
-            return jsonify({'aggregates': [], 'bucket_hours': bucket_hours}), 200
+        return jsonify({'aggregates': [], 'bucket_hours': bucket_hours}), 200
     cols = ['date', 'hour', 'event', 'camera_id', 'count', 'total_crowd']
     aggregates = [dict(zip(cols, row)) for row in rows]
     allowed_sites = _get_user_allowed_site_ids()
     if allowed_sites is not None:
-        get_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
-        allowed_cameras = {r[0] for r in get_cursor().fetchall()}
+        _read_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
+        allowed_cameras = {r[0] for r in _read_cursor().fetchall()}
         aggregates = [a for a in aggregates if a.get('camera_id') in allowed_cameras]
     elif site_id:
-        get_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id = ?', (site_id,))
-        allowed_cameras = {r[0] for r in get_cursor().fetchall()}
+        _read_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id = ?', (site_id,))
+        allowed_cameras = {r[0] for r in _read_cursor().fetchall()}
         aggregates = [a for a in aggregates if a.get('camera_id') in allowed_cameras]
     return jsonify({'aggregates': aggregates, 'bucket_hours': bucket_hours})
 
 
+def _fts_match_query(q):
+    """FTS5 MATCH expression for free text: each whitespace-separated term becomes a quoted phrase whose last token is a
+    prefix ("red jack" finds "red jacket", "00:1a" finds MAC 00:1A:...); terms are ANDed. None when q has no tokens."""
+    terms = []
+    for term in q.split():
+        tokens = re.findall(r'\w+', term)
+        if tokens:
+            terms.append('"%s"*' % ' '.join(tokens))
+    return ' '.join(terms) or None
+
+
+def _search_filters(alias, date_col, date_from, date_to, camera_id, event_col, event_type, site_ids=None, camera_ids=None):
+    """AND-clause and params for search filters on the source table alias."""
+    sql, params = '', []
+    for cond, value in ((date_col + ' >= ?', date_from), (date_col + ' <= ?', date_to),
+                        ('%s.camera_id = ?' % alias, camera_id), ('%s.%s = ?' % (alias, event_col), event_type)):
+        if value:
+            sql += ' AND ' + cond
+            params.append(value)
+    for col, allowed in (('site_id', site_ids), ('camera_id', camera_ids)):
+        if allowed is None:
+            continue
+        if not allowed:
+            sql += ' AND 1=0'
+        else:
+            sql += ' AND %s.%s IN (%s)' % (alias, col, ','.join('?' * len(allowed)))
+            params.extend(allowed)
+    return sql, params
+
+
 def _search_impl(q: str, limit: int, date_from=None, date_to=None, camera_id=None, event_type=None):
-    """Shared search logic for GET and POST /api/v1/search. RBAC applied inside."""
-    like = f'%{q}%'
+    """Shared search logic for GET and POST /api/v1/search. RBAC applied inside. Uses the FTS5 indexes (BM25-ranked,
+    prefix terms; filters joined on rowid) when present, else LIKE scans ordered by recency."""
+    cur = _read_cursor()
     allowed_sites = _get_user_allowed_site_ids()
-    events_sql = """SELECT id, event_type, camera_id, site_id, timestamp, metadata, severity
-                    FROM events WHERE event_type LIKE ? OR metadata LIKE ?"""
-    params_ev = [like, like]
-    if date_from:
-        events_sql += ' AND date(timestamp) >= ?'
-        params_ev.append(date_from)
-    if date_to:
-        events_sql += ' AND date(timestamp) <= ?'
-        params_ev.append(date_to)
-    if event_type:
-        events_sql += ' AND event_type = ?'
-        params_ev.append(event_type)
-    if camera_id:
-        events_sql += ' AND camera_id = ?'
-        params_ev.append(camera_id)
-    if allowed_sites is not None:
-        events_sql += ' AND site_id IN (%s)' % ','.join('?' * len(allowed_sites))
-        params_ev.extend(allowed_sites)
-    events_sql += ' ORDER BY timestamp DESC LIMIT ?'
-    params_ev.append(limit)
-    get_cursor().execute(events_sql, params_ev)
-    ev_cols = ['id', 'event_type', 'camera_id', 'site_id', 'timestamp', 'metadata', 'severity']
-    events = [dict(zip(ev_cols, row)) for row in get_cursor().fetchall()]
     allowed_cameras = None
     if allowed_sites is not None:
-        get_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
-        allowed_cameras = {r[0] for r in get_cursor().fetchall()}
-    try:
-        ad_sql = """SELECT * FROM ai_data WHERE object LIKE ? OR event LIKE ? OR scene LIKE ? OR license_plate LIKE ?
-                    OR COALESCE(suspicious_behavior,'') LIKE ? OR COALESCE(predicted_intent,'') LIKE ?
-                    OR COALESCE(stress_level,'') LIKE ? OR COALESCE(hair_color,'') LIKE ? OR COALESCE(build,'') LIKE ?
-                    OR COALESCE(perceived_gender,'') LIKE ? OR COALESCE(perceived_age_range,'') LIKE ?
-                    OR COALESCE(perceived_age,'') LIKE ? OR COALESCE(perceived_ethnicity,'') LIKE ?
-                    OR COALESCE(clothing_description,'') LIKE ? OR COALESCE(gait_notes,'') LIKE ?
-                    OR COALESCE(intoxication_indicator,'') LIKE ? OR COALESCE(micro_expression,'') LIKE ?
-                    OR COALESCE(attention_region,'') LIKE ? OR COALESCE(illumination_band,'') LIKE ? OR COALESCE(period_of_day_utc,'') LIKE ?
-                    OR CAST(centroid_nx AS TEXT) LIKE ? OR CAST(centroid_ny AS TEXT) LIKE ?
-                    OR CAST(world_x AS TEXT) LIKE ? OR CAST(world_y AS TEXT) LIKE ?
-                    OR COALESCE(audio_event,'') LIKE ? OR COALESCE(audio_transcription,'') LIKE ?
-                    OR COALESCE(audio_sentiment,'') LIKE ? OR COALESCE(audio_emotion,'') LIKE ?
-                    OR COALESCE(audio_stress_level,'') LIKE ? OR COALESCE(audio_keywords,'') LIKE ?
-                    OR COALESCE(device_mac,'') LIKE ? OR COALESCE(device_oui_vendor,'') LIKE ?
-                    OR COALESCE(device_probe_ssids,'') LIKE ?
-                    OR CAST(detection_confidence AS TEXT) LIKE ?"""
-        ad_params = [like] * 34
-        if date_from:
-            ad_sql += ' AND date >= ?'
-            ad_params.append(date_from)
-        if date_to:
-            ad_sql += ' AND date <= ?'
-            ad_params.append(date_to)
-        if camera_id:
-            ad_sql += ' AND camera_id = ?'
-            ad_params.append(camera_id)
-        if event_type:
-            ad_sql += ' AND event = ?'
-            ad_params.append(event_type)
-        if allowed_cameras is not None:
-            if not allowed_cameras:
-                ad_sql += ' AND 1=0'
-            else:
-                ad_sql += ' AND camera_id IN (%s)' % ','.join('?' * len(allowed_cameras))
-                ad_params.extend(allowed_cameras)
-        ad_sql += ' ORDER BY date DESC, time DESC LIMIT ?'
-        ad_params.append(limit)
-        get_cursor().execute(ad_sql, ad_params)
-        ad_cols = [d[0] for d in get_cursor().description]
-        ai_data = [dict(zip(ad_cols, row)) for row in get_cursor().fetchall()]
-    except sqlite3.OperationalError:
-        ad_sql = """SELECT date, time, object, event, scene, license_plate, crowd_count, camera_id
-                    FROM ai_data WHERE object LIKE ? OR event LIKE ? OR scene LIKE ? OR license_plate LIKE ?"""
-        ad_params = [like, like, like, like]
-        if date_from:
-            ad_sql += ' AND date >= ?'
-            ad_params.append(date_from)
-        if date_to:
-            ad_sql += ' AND date <= ?'
-            ad_params.append(date_to)
-        if camera_id:
-            ad_sql += ' AND camera_id = ?'
-            ad_params.append(camera_id)
-        if allowed_cameras is not None and allowed_cameras:
-            ad_sql += ' AND camera_id IN (%s)' % ','.join('?' * len(allowed_cameras))
-            ad_params.extend(allowed_cameras)
-        ad_sql += ' ORDER BY date DESC, time DESC LIMIT ?'
-        ad_params.append(limit)
-        get_cursor().execute(ad_sql, ad_params)
-        ad_cols = [d[0] for d in get_cursor().description]
-        ai_data = [dict(zip(ad_cols, row)) for row in get_cursor().fetchall()]
-        if allowed_cameras is not None:
-            ai_data = [a for a in ai_data if a.get('camera_id', '0') in allowed_cameras]
+        cur.execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
+        allowed_cameras = sorted({r[0] for r in cur.fetchall()})
+    ev_cols = ['id', 'event_type', 'camera_id', 'site_id', 'timestamp', 'metadata', 'severity']
+    ev_filter, ev_params = _search_filters('e', 'date(e.timestamp)', date_from, date_to, camera_id, 'event_type', event_type,
+                                           site_ids=allowed_sites)
+    ad_filter, ad_params = _search_filters('a', 'a.date', date_from, date_to, camera_id, 'event', event_type,
+                                           camera_ids=allowed_cameras)
+    if _search_fts_available(cur):
+        match = _fts_match_query(q)
+        if not match:
+            return {'events': [], 'ai_data': []}
+        cur.execute('SELECT %s FROM events_fts JOIN events e ON e.id = events_fts.rowid WHERE events_fts MATCH ?%s '
+                    'ORDER BY events_fts.rank LIMIT ?' % (', '.join('e.' + col for col in ev_cols), ev_filter),
+                    [match] + ev_params + [limit])
+        events = [dict(zip(ev_cols, row)) for row in cur.fetchall()]
+        cur.execute('SELECT a.* FROM ai_data_fts JOIN ai_data a ON a.rowid = ai_data_fts.rowid WHERE ai_data_fts MATCH ?%s '
+                    'ORDER BY ai_data_fts.rank LIMIT ?' % ad_filter, [match] + ad_params + [limit])
+        ad_cols = [d[0] for d in cur.description]
+        ai_data = [dict(zip(ad_cols, row)) for row in cur.fetchall()]
+        return {'events': events, 'ai_data': ai_data}
+    like = f'%{q}%'
+    cur.execute('SELECT %s FROM events e WHERE (e.event_type LIKE ? OR e.metadata LIKE ?)%s ORDER BY e.timestamp DESC LIMIT ?'
+                % (', '.join('e.' + col for col in ev_cols), ev_filter), [like, like] + ev_params + [limit])
+    events = [dict(zip(ev_cols, row)) for row in cur.fetchall()]
+    cur.execute('SELECT a.* FROM ai_data a WHERE (%s)%s ORDER BY a.date DESC, a.time DESC LIMIT ?'
+                % (' OR '.join("COALESCE(a.%s, '') LIKE ?" % col for col in _AI_DATA_FTS_COLUMNS), ad_filter),
+                [like] * len(_AI_DATA_FTS_COLUMNS) + ad_params + [limit])
+    ad_cols = [d[0] for d in cur.description]
+    ai_data = [dict(zip(ad_cols, row)) for row in cur.fetchall()]
     return {'events': events, 'ai_data': ai_data}
 
 
@@ -4706,23 +7349,23 @@ def api_v1_search():
             if isinstance(event_ids, list) and event_ids:
                 event_ids = event_ids[:limit]
                 placeholders = ','.join('?' * len(event_ids))
-                get_cursor().execute(
+                _read_cursor().execute(
                     f'SELECT id, event_type, camera_id, site_id, timestamp, metadata, severity FROM events WHERE id IN ({placeholders}) ORDER BY timestamp DESC',
                     event_ids,
                 )
                 ev_cols = ['id', 'event_type', 'camera_id', 'site_id', 'timestamp', 'metadata', 'severity']
-                events = [dict(zip(ev_cols, row)) for row in get_cursor().fetchall()]
+                events = [dict(zip(ev_cols, row)) for row in _read_cursor().fetchall()]
             else:
                 events = []
             if isinstance(ai_data_rowids, list) and ai_data_rowids:
                 ai_data_rowids = ai_data_rowids[:limit]
                 placeholders = ','.join('?' * len(ai_data_rowids))
-                get_cursor().execute(
+                _read_cursor().execute(
                     f'SELECT * FROM ai_data WHERE rowid IN ({placeholders}) ORDER BY date DESC, time DESC',
                     ai_data_rowids,
                 )
-                ad_cols = [d[0] for d in get_cursor().description]
-                ai_data = [dict(zip(ad_cols, row)) for row in get_cursor().fetchall()]
+                ad_cols = [d[0] for d in _read_cursor().description]
+                ai_data = [dict(zip(ad_cols, row)) for row in _read_cursor().fetchall()]
             else:
                 ai_data = []
             if events or ai_data:
@@ -4919,26 +7562,23 @@ def api_v1_incident_bundle():
     rec_dir = _recordings_dir()
     recordings_in_range = []
     try:
-        for f in os.listdir(rec_dir):
-            if not (f.startswith('recording_') and f.endswith('.avi')):
-                continue
-            path = os.path.join(rec_dir, f)
-            try:
-                mtime = os.path.getmtime(path)
-                dt = time.gmtime(mtime)
-                file_date = time.strftime('%Y-%m-%d', dt)
-                if date_from <= file_date <= date_to:
-                    size = os.path.getsize(path)
-                    item = {'name': f, 'size_bytes': size, 'created_utc': time.strftime('%Y-%m-%dT%H:%M:%SZ', dt)}
-                    sha = _compute_recording_sha256(path)
-                    if sha:
-                        item['sha256_verified_at_export'] = sha
-                        item['export_utc'] = export_utc
-                    recordings_in_range.append(item)
-            except Exception:
-                pass
+        # Legacy recording_<ts>.avi segments carry no camera: a camera-filtered bundle keeps them rather than losing evidence
+        segments = _recordings_in_range(date_from + 'T00:00:00Z', date_to + 'T23:59:59Z', camera_id, newest_first=False,
+                                        include_unattributed=True)
     except Exception:
-        pass
+        segments = []
+    for seg in segments:
+        path = os.path.join(rec_dir, seg['name'])
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            continue
+        item = {'name': seg['name'], 'camera_id': seg['camera_id'], 'size_bytes': size, 'created_utc': seg['start_utc'], 'end_utc': seg['end_utc']}
+        sha, _ = _recording_sha256(path)
+        if sha:
+            item['sha256_verified_at_export'] = sha
+            item['export_utc'] = export_utc
+        recordings_in_range.append(item)
     recordings_in_range.sort(key=lambda x: x.get('created_utc', ''))
     preservation_checklist = {
         'description': 'NIST IR 8387 / SWGDE: verify each item hash at export; retain this manifest for chain of custody.',
@@ -4967,6 +7607,8 @@ def api_v1_incident_bundle():
         'retention_days': retention_days,
         'camera_id_filter': camera_id,
         'recordings': recordings_in_range,
+        'camera_id_filter_note': ('Recordings with camera_id null predate per-camera segment names; their camera is unknown, so they '
+                                  'are included for every camera filter.') if camera_id and any(r['camera_id'] is None for r in recordings_in_range) else None,
         'preservation_checklist': preservation_checklist,
         'collection_checklist': collection_checklist,
         'ai_data_export_url': f'/export_data?date_from={date_from}&date_to={date_to}',
@@ -4980,23 +7622,24 @@ def api_v1_incident_bundle():
 @app.route('/api/v1/analytics/heatmap')
 @require_role('viewer', 'operator', 'admin')
 def api_v1_analytics_heatmap():
-    """Heatmap data: event counts by date, hour bucket, and event type. Query: date_from, date_to, site_id, bucket_hours (default 1)."""
+    """Heatmap data: event counts by date, hour bucket, and event type, from the events_hourly rollup.
+    Query: date_from, date_to, site_id, bucket_hours (default 1)."""
     date_from = request.args.get('date_from') or time.strftime('%Y-%m-%d', time.gmtime(time.time() - 7 * 86400))
     date_to = request.args.get('date_to') or time.strftime('%Y-%m-%d')
-    bucket_hours = max(1, min(int(request.args.get('bucket_hours', 1)), 24))
+    bucket_hours = _bucket_hours_arg()
     allowed_sites = _get_user_allowed_site_ids()
     sql = """
-        SELECT date(timestamp) AS d, strftime('%H', timestamp) AS h, event_type, camera_id, COUNT(*) AS cnt
-        FROM events
-        WHERE date(timestamp) >= ? AND date(timestamp) <= ?
-    """
-    params = [date_from, date_to]
+        SELECT date, %s AS bucket, NULLIF(event_type, ''), NULLIF(camera_id, ''), SUM(cnt)
+        FROM events_hourly
+        WHERE date >= ? AND date <= ?
+    """ % _ROLLUP_BUCKET_SQL
+    params = [bucket_hours, bucket_hours, date_from, date_to]
     if allowed_sites is not None:
         sql += ' AND site_id IN (%s)' % ','.join('?' * len(allowed_sites))
         params.extend(allowed_sites)
-    sql += " GROUP BY d, h, event_type, camera_id ORDER BY d, h"
-    get_cursor().execute(sql, params)
-    rows = get_cursor().fetchall()
+    sql += " GROUP BY date, bucket, event_type, camera_id ORDER BY date, bucket"
+    _read_cursor().execute(sql, params)
+    rows = _read_cursor().fetchall()
     buckets = []
     for r in rows:
         buckets.append({'date': r[0], 'hour': r[1], 'event_type': r[2], 'camera_id': r[3], 'count': r[4]})
@@ -5028,8 +7671,8 @@ def api_v1_analytics_spatial_heatmap():
         sql += ' AND camera_id = ?'
         params.append(camera_id)
     if allowed_sites is not None:
-        get_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
-        allowed_cameras = {r[0] for r in get_cursor().fetchall()}
+        _read_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
+        allowed_cameras = {r[0] for r in _read_cursor().fetchall()}
         if not allowed_cameras:
             return jsonify({
                 'grid_rows': grid_size, 'grid_cols': grid_size, 'cells': [], 'date_from': date_from, 'date_to': date_to,
@@ -5038,8 +7681,8 @@ def api_v1_analytics_spatial_heatmap():
         placeholders = ','.join('?' * len(allowed_cameras))
         sql += ' AND camera_id IN (%s)' % placeholders
         params.extend(allowed_cameras)
-    get_cursor().execute(sql, params)
-    rows = get_cursor().fetchall()
+    _read_cursor().execute(sql, params)
+    rows = _read_cursor().fetchall()
     grid = {}
     for (nx, ny) in rows:
         if nx is None or ny is None:
@@ -5086,8 +7729,8 @@ def api_v1_analytics_world_heatmap():
         sql += ' AND camera_id = ?'
         params.append(camera_id)
     if allowed_sites is not None:
-        get_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
-        allowed_cameras = {r[0] for r in get_cursor().fetchall()}
+        _read_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
+        allowed_cameras = {r[0] for r in _read_cursor().fetchall()}
         if not allowed_cameras:
             return jsonify({
                 'grid_rows': grid_size, 'grid_cols': grid_size, 'cells': [], 'date_from': date_from, 'date_to': date_to,
@@ -5096,8 +7739,8 @@ def api_v1_analytics_world_heatmap():
         placeholders = ','.join('?' * len(allowed_cameras))
         sql += ' AND camera_id IN (%s)' % placeholders
         params.extend(allowed_cameras)
-    get_cursor().execute(sql, params)
-    rows = get_cursor().fetchall()
+    _read_cursor().execute(sql, params)
+    rows = _read_cursor().fetchall()
     grid = {}
     for (wx, wy) in rows:
         if wx is None or wy is None:
@@ -5122,11 +7765,13 @@ def api_v1_analytics_world_heatmap():
 @app.route('/api/v1/analytics/zone_dwell')
 @require_role('viewer', 'operator', 'admin')
 def api_v1_analytics_zone_dwell():
-    """Zone dwell heatmap: person-seconds per zone per hour bucket from ai_data.zone_presence. Query: date_from, date_to, camera_id, zone_index (optional)."""
+    """Zone dwell heatmap: person-seconds per zone per hour bucket from the zone_hourly rollup of ai_data.zone_presence.
+    Query: date_from, date_to, camera_id, zone_index (optional), bucket_hours (default 1)."""
     date_from = request.args.get('date_from') or time.strftime('%Y-%m-%d', time.gmtime(time.time() - 7 * 86400))
     date_to = request.args.get('date_to') or time.strftime('%Y-%m-%d')
     camera_id = request.args.get('camera_id')
     zone_index_param = request.args.get('zone_index')
+    bucket_hours = _bucket_hours_arg()
     try:
         interval_sec = ANALYZE_INTERVAL_SECONDS
     except NameError:
@@ -5142,36 +7787,36 @@ def api_v1_analytics_zone_dwell():
         num_zones = len(_analytics_config.get('loiter_zones', []))
         zone_indices = list(range(num_zones))
     buckets = []
-    try:
-        for zi in zone_indices:
-            sql = """
-                SELECT date, strftime('%H', time) AS hour, camera_id, COUNT(*) AS frame_count
-                FROM ai_data
-                WHERE date >= ? AND date <= ?
-                AND (',' || COALESCE(zone_presence,'') || ',') LIKE ?
-            """
-            params = [date_from, date_to, '%,' + str(zi) + ',%']
-            if camera_id:
-                sql += ' AND camera_id = ?'
-                params.append(camera_id)
-            sql += ' GROUP BY date, hour, camera_id ORDER BY date, hour'
-            get_cursor().execute(sql, params)
-            for row in get_cursor().fetchall():
+    if zone_indices:
+        sql = """
+            SELECT zone_index, date, %s AS bucket, NULLIF(camera_id, ''), SUM(frame_count)
+            FROM zone_hourly
+            WHERE date >= ? AND date <= ? AND zone_index IN (%s)
+        """ % (_ROLLUP_BUCKET_SQL, ','.join('?' * len(zone_indices)))
+        params = [bucket_hours, bucket_hours, date_from, date_to] + zone_indices
+        if camera_id:
+            sql += ' AND camera_id = ?'
+            params.append(camera_id)
+        sql += ' GROUP BY zone_index, date, bucket, camera_id ORDER BY zone_index, date, bucket'
+        try:
+            _read_cursor().execute(sql, params)
+            for row in _read_cursor().fetchall():
                 buckets.append({
-                    'date': row[0],
-                    'hour_bucket': row[1],
-                    'camera_id': row[2],
-                    'zone_index': zi,
-                    'frame_count': row[3],
-                    'person_seconds': row[3] * interval_sec,
+                    'date': row[1],
+                    'hour_bucket': row[2],
+                    'camera_id': row[3],
+                    'zone_index': row[0],
+                    'frame_count': row[4],
+                    'person_seconds': row[4] * interval_sec,
                 })
-    except sqlite3.OperationalError:
-        pass
+        except sqlite3.OperationalError:
+            pass
     if allowed_sites is not None:
-        get_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
-        allowed_cameras = {r[0] for r in get_cursor().fetchall()}
+        _read_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
+        allowed_cameras = {r[0] for r in _read_cursor().fetchall()}
         buckets = [b for b in buckets if b.get('camera_id') in allowed_cameras]
-    return jsonify({'zone_dwell': buckets, 'date_from': date_from, 'date_to': date_to, 'interval_seconds': interval_sec})
+    return jsonify({'zone_dwell': buckets, 'date_from': date_from, 'date_to': date_to, 'interval_seconds': interval_sec,
+                    'bucket_hours': bucket_hours})
 
 
 @app.route('/api/v1/analytics/vehicle_activity')
@@ -5198,14 +7843,14 @@ def api_v1_analytics_vehicle_activity():
         params.append('%' + plate_filter + '%')
     sql += ' ORDER BY date, time'
     try:
-        get_cursor().execute(sql, params)
-        rows = get_cursor().fetchall()
+        _read_cursor().execute(sql, params)
+        rows = _read_cursor().fetchall()
     except sqlite3.OperationalError:
         rows = []
     sightings = [{'date': r[0], 'time': r[1], 'timestamp_utc': r[2], 'camera_id': r[3], 'license_plate': r[4]} for r in rows]
     if allowed_sites is not None:
-        get_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
-        allowed_cameras = {r[0] for r in get_cursor().fetchall()}
+        _read_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
+        allowed_cameras = {r[0] for r in _read_cursor().fetchall()}
         sightings = [s for s in sightings if s.get('camera_id') in allowed_cameras]
     # Per-plate summary: plate -> { count, cameras: set, first_seen, last_seen }
     by_plate = {}
@@ -5237,7 +7882,8 @@ def api_v1_watchlist_list():
 @app.route('/api/v1/watchlist', methods=['POST'])
 @require_role('admin')
 def api_v1_watchlist_add():
-    """Add a face to the watchlist. JSON: {"name": "Alice", "image_base64": "..."} or multipart file with "image" and "name". Requires DeepFace; edge-only."""
+    """Add a face to the watchlist. JSON: {"name": "Alice", "image_base64": "..."} or multipart file with "image" and "name". Requires DeepFace; edge-only.
+    The face is cropped and aligned by the face stage (_face_context) when available, as for live probes."""
     name = None
     img_b64 = None
     if request.is_json:
@@ -5267,7 +7913,8 @@ def api_v1_watchlist_add():
             return jsonify({'error': 'invalid image'}), 400
     except Exception as e:
         return jsonify({'error': 'invalid image or base64: %s' % str(e)}), 400
-    emb = _get_face_embedding(img)
+    # Enrol through the same face stage as live matching (YuNet aligned crop) so gallery and probe embeddings agree
+    emb = _watchlist_face_embedding(img, None, _face_context(img, None))
     if emb is None:
         return jsonify({'error': 'no face detected in image; add a clear face photo'}), 400
     blob = emb.tobytes()
@@ -5278,6 +7925,7 @@ def api_v1_watchlist_add():
         row_id = get_cursor().lastrowid
     except sqlite3.OperationalError as e:
         return jsonify({'error': 'database error: %s' % str(e)}), 500
+    _watchlist_gallery.invalidate()
     return jsonify({'id': row_id, 'name': name, 'created_at': created_at}), 201
 
 
@@ -5292,6 +7940,7 @@ def api_v1_watchlist_delete(wid):
             return jsonify({'error': 'not found'}), 404
     except sqlite3.OperationalError as e:
         return jsonify({'error': str(e)}), 500
+    _watchlist_gallery.invalidate()
     return jsonify({'success': True})
 
 
@@ -5411,8 +8060,8 @@ def export_data():
         retention_days = 0
     allowed_sites = _get_user_allowed_site_ids()
     if allowed_sites is not None:
-        get_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
-        allowed_cameras = [r[0] for r in get_cursor().fetchall()]
+        _read_cursor().execute('SELECT camera_id FROM camera_positions WHERE site_id IN (%s)' % ','.join('?' * len(allowed_sites)), allowed_sites)
+        allowed_cameras = [r[0] for r in _read_cursor().fetchall()]
         if allowed_cameras:
             if date_from or date_to:
                 q = 'SELECT * FROM ai_data WHERE camera_id IN (%s)' % ','.join('?' * len(allowed_cameras))
@@ -5423,12 +8072,12 @@ def export_data():
                 if date_to:
                     q += ' AND date <= ?'
                     params.append(date_to)
-                get_cursor().execute(q, params)
+                _read_cursor().execute(q, params)
             else:
-                get_cursor().execute('SELECT * FROM ai_data WHERE camera_id IN (%s)' % ','.join('?' * len(allowed_cameras)), allowed_cameras)
+                _read_cursor().execute('SELECT * FROM ai_data WHERE camera_id IN (%s)' % ','.join('?' * len(allowed_cameras)), allowed_cameras)
         else:
-            get_cursor().execute('SELECT * FROM ai_data WHERE 1=0')
-        rows = get_cursor().fetchall()
+            _read_cursor().execute('SELECT * FROM ai_data WHERE 1=0')
+        rows = _read_cursor().fetchall()
     else:
         if date_from or date_to:
             q = 'SELECT * FROM ai_data WHERE 1=1'
@@ -5439,11 +8088,11 @@ def export_data():
             if date_to:
                 q += ' AND date <= ?'
                 params.append(date_to)
-            get_cursor().execute(q, params)
+            _read_cursor().execute(q, params)
         else:
-            get_cursor().execute('SELECT * FROM ai_data')
-        rows = get_cursor().fetchall()
-    col_names = [d[0] for d in get_cursor().description]
+            _read_cursor().execute('SELECT * FROM ai_data')
+        rows = _read_cursor().fetchall()
+    col_names = [d[0] for d in _read_cursor().description]
     # Use canonical export column order so CSV matches standard schema header
     export_cols = [c for c in AI_DATA_EXPORT_COLUMNS if c in col_names]
     if not export_cols:
@@ -5549,12 +8198,12 @@ def export_audit_log():
         system_id = 'surveillance'
     limit = _api_limit(10000, 50000)
     try:
-        get_cursor().execute('SELECT id, user_id, action, resource, timestamp, details, integrity_hash FROM audit_log ORDER BY id ASC LIMIT ?', (limit,))
-        rows = get_cursor().fetchall()
+        _read_cursor().execute('SELECT id, user_id, action, resource, timestamp, details, integrity_hash FROM audit_log ORDER BY id ASC LIMIT ?', (limit,))
+        rows = _read_cursor().fetchall()
         headers = 'id,user_id,action,resource,timestamp,details,integrity_hash\n'
     except sqlite3.OperationalError:
-        get_cursor().execute('SELECT id, user_id, action, resource, timestamp, details FROM audit_log ORDER BY id ASC LIMIT ?', (limit,))
-        rows = get_cursor().fetchall()
+        _read_cursor().execute('SELECT id, user_id, action, resource, timestamp, details FROM audit_log ORDER BY id ASC LIMIT ?', (limit,))
+        rows = _read_cursor().fetchall()
         headers = 'id,user_id,action,resource,timestamp,details\n'
     def _csv_cell(c):
         s = '' if c is None else str(c)
@@ -5951,6 +8600,21 @@ if sock is not None:
                 _ws_clients.remove(ws)
 
 
+RETENTION_DELETE_CHUNK = 5000
+
+
+def _retention_delete(table, key, where, params):
+    """Delete matching rows through _db_writer in RETENTION_DELETE_CHUNK-row transactions, so the per-row FTS and rollup
+    triggers never hold the write lock for one long retention transaction. Returns rows deleted."""
+    sql = 'DELETE FROM %s WHERE %s IN (SELECT %s FROM %s WHERE %s LIMIT %d)' % (table, key, key, table, where, RETENTION_DELETE_CHUNK)
+    total = 0
+    while True:
+        n = _db_writer.call(lambda cur: cur.execute(sql, params).rowcount, wait=True, timeout=600.0)
+        total += n
+        if n < RETENTION_DELETE_CHUNK:
+            return total
+
+
 def retention_job():
     """Delete old ai_data, events, and recording files. Legal hold excludes held resources. Audit log has separate AUDIT_RETENTION_DAYS (AU-9)."""
     retention_days = int(os.environ.get('RETENTION_DAYS', '0'))
@@ -5961,12 +8625,24 @@ def retention_job():
             _log_structured('retention_run', retention_days=retention_days, audit_retention_days=audit_retention_days)
             if retention_days > 0:
                 cutoff = time.strftime('%Y-%m-%d', time.gmtime(time.time() - retention_days * 86400))
-                get_cursor().execute('DELETE FROM ai_data WHERE date < ?', (cutoff,))
-                get_cursor().execute(
-                    "DELETE FROM events WHERE date(timestamp) < ? AND CAST(id AS TEXT) NOT IN (SELECT resource_id FROM legal_hold WHERE resource_type = 'event')",
+                _retention_delete('ai_data', 'rowid', 'date < ?', (cutoff,))
+                try:
+                    get_cursor().execute(
+                        "SELECT clip_path FROM events WHERE date(timestamp) < ? AND clip_path IS NOT NULL AND CAST(id AS TEXT) NOT IN (SELECT resource_id FROM legal_hold WHERE resource_type = 'event')",
+                        (cutoff,)
+                    )
+                    for (clip_name,) in get_cursor().fetchall():
+                        if _safe_clip_basename(clip_name):
+                            clip_fp = os.path.join(_event_clips_dir(), clip_name)
+                            if os.path.isfile(clip_fp):
+                                os.remove(clip_fp)
+                except Exception:
+                    pass
+                _retention_delete(
+                    'events', 'id',
+                    "date(timestamp) < ? AND CAST(id AS TEXT) NOT IN (SELECT resource_id FROM legal_hold WHERE resource_type = 'event')",
                     (cutoff,)
                 )
-                get_conn().commit()
                 rec_dir = _recordings_dir()
                 try:
                     get_cursor().execute("SELECT resource_id FROM legal_hold WHERE resource_type = 'recording'")
@@ -5974,66 +8650,163 @@ def retention_job():
                 except Exception:
                     held_recordings = set()
                 try:
-                    for f in os.listdir(rec_dir):
-                        if f.startswith('recording_') and f.endswith('.avi') and f not in held_recordings:
-                            try:
-                                fp = os.path.join(rec_dir, f)
-                                if os.path.getmtime(fp) < time.time() - retention_days * 86400:
-                                    os.remove(fp)
-                                    get_cursor().execute('DELETE FROM recording_fixity WHERE path = ?', (f,))
-                            except Exception:
-                                pass
-                    get_conn().commit()
+                    cutoff_utc = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() - retention_days * 86400))
+                    get_cursor().execute('SELECT name FROM recordings WHERE end_utc IS NOT NULL AND end_utc < ?', (cutoff_utc,))
+                    for (f,) in get_cursor().fetchall():
+                        if f in held_recordings:
+                            continue
+                        try:
+                            fp = os.path.join(rec_dir, f)
+                            if os.path.isfile(fp):
+                                os.remove(fp)
+                            _mp4_cache.discard(f)
+                            _db_writer.execute('DELETE FROM recording_fixity WHERE path = ?', (f,))
+                            _db_writer.execute('DELETE FROM recordings WHERE name = ?', (f,))
+                        except Exception:
+                            pass
                 except Exception:
                     pass
             if audit_retention_days > 0:
                 cutoff_audit = time.strftime('%Y-%m-%d', time.gmtime(time.time() - audit_retention_days * 86400))
-                get_cursor().execute('DELETE FROM audit_log WHERE date(timestamp) < ?', (cutoff_audit,))
-                get_conn().commit()
+                _db_writer.execute('DELETE FROM audit_log WHERE date(timestamp) < ?', (cutoff_audit,), wait=True, timeout=600.0)
         except Exception:
             pass
 
 
+try:
+    FIXITY_WORKERS = max(1, min(8, int(os.environ.get('FIXITY_WORKERS', '2'))))
+except (TypeError, ValueError):
+    FIXITY_WORKERS = 2
+try:
+    FIXITY_MAX_MBPS = max(0.0, float(os.environ.get('FIXITY_MAX_MBPS', '50')))
+except (TypeError, ValueError):
+    FIXITY_MAX_MBPS = 50.0
+try:
+    FIXITY_FULL_VERIFY_DAYS = max(0, int(os.environ.get('FIXITY_FULL_VERIFY_DAYS', '30')))
+except (TypeError, ValueError):
+    FIXITY_FULL_VERIFY_DAYS = 30
+
+
+def _fixity_check_recording(name, rec_dir, reverify_before, max_bytes_per_sec):
+    """Verify one recording. Returns 'skipped' (size/mtime unchanged and verified recently), 'ok', 'mismatch' or None (missing/error)."""
+    path = os.path.join(rec_dir, name)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    cur = get_cursor()
+    cur.execute('SELECT sha256, checked_at, size_bytes, mtime_ns FROM recording_fixity WHERE path = ?', (name,))
+    row = cur.fetchone()
+    if row and row[2] == st.st_size and row[3] == st.st_mtime_ns and (row[1] or '') >= reverify_before:
+        return 'skipped'
+    current = _compute_recording_sha256(path, max_bytes_per_sec)
+    if not current:
+        return None
+    result = 'ok'
+    if row and row[0] != current:
+        result = 'mismatch'
+        _log_structured('fixity_mismatch', path=name, stored_sha256=row[0][:16] + '...', current_sha256=current[:16] + '...')
+    _store_recording_sha256(name, current, st)
+    return result
+
+
+def _fixity_run():
+    """One verification pass over closed segments: FIXITY_WORKERS threads sharing a FIXITY_MAX_MBPS read budget. Returns counts."""
+    rec_dir = _recordings_dir()
+    get_cursor().execute('SELECT name FROM recordings WHERE end_utc IS NOT NULL')  # closed segments only
+    names = queue.Queue()
+    for (f,) in get_cursor().fetchall():
+        names.put(f)
+    # Unchanged files are re-hashed only once their last verification is older than FIXITY_FULL_VERIFY_DAYS (bit-rot check)
+    reverify_before = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() - FIXITY_FULL_VERIFY_DAYS * 86400)) if FIXITY_FULL_VERIFY_DAYS else '9999'
+    per_worker_rate = (FIXITY_MAX_MBPS * 1024 * 1024 / FIXITY_WORKERS) if FIXITY_MAX_MBPS > 0 else None
+    counts = Counter()
+    counts_lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                try:
+                    name = names.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    result = _fixity_check_recording(name, rec_dir, reverify_before, per_worker_rate)
+                except Exception:
+                    result = None
+                with counts_lock:
+                    counts[result or 'error'] += 1
+        finally:
+            _close_thread_db()
+
+    threads = [threading.Thread(target=worker, daemon=True, name='fixity-%d' % i) for i in range(FIXITY_WORKERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return dict(counts)
+
+
 def fixity_job():
-    """OSAC/SWGDE fixity: compute SHA-256 for each recording, compare to stored value; alert on mismatch. Run when ENABLE_RECORDING_FIXITY=1."""
+    """OSAC/SWGDE fixity: verify recording SHA-256 against the digest stored at segment close; alert on mismatch. Run when ENABLE_RECORDING_FIXITY=1."""
     while True:
         time.sleep(6 * 3600)
         if os.environ.get('ENABLE_RECORDING_FIXITY', '').strip().lower() not in ('1', 'true', 'yes'):
             continue
         try:
-            rec_dir = _recordings_dir()
-            checked_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
-            for f in os.listdir(rec_dir):
-                if not (f.startswith('recording_') and f.endswith('.avi')):
-                    continue
-                path = os.path.join(rec_dir, f)
-                if not os.path.isfile(path):
-                    continue
-                current = _compute_recording_sha256(path)
-                if not current:
-                    continue
-                cur = get_cursor()
-                cur.execute('SELECT sha256 FROM recording_fixity WHERE path = ?', (f,))
-                row = cur.fetchone()
-                if row:
-                    stored = row[0]
-                    if stored != current:
-                        _log_structured('fixity_mismatch', path=f, stored_sha256=stored[:16] + '...', current_sha256=current[:16] + '...')
-                cur.execute('INSERT OR REPLACE INTO recording_fixity (path, sha256, checked_at) VALUES (?, ?, ?)', (f, current, checked_at))
-            get_conn().commit()
+            _log_structured('fixity_run', **_fixity_run())
         except Exception:
             pass
 
 
+def _rollup_reconcile_settings():
+    try:
+        interval = max(60, min(86400, int(os.environ.get('ROLLUP_RECONCILE_INTERVAL_SECONDS', '3600'))))
+    except (TypeError, ValueError):
+        interval = 3600
+    try:
+        days = max(1, min(365, int(os.environ.get('ROLLUP_RECONCILE_DAYS', '2'))))
+    except (TypeError, ValueError):
+        days = 2
+    return interval, days
+
+
+def rollup_reconcile_job():
+    """First finish any pending day-by-day rollup backfill (_rollup_backfill_step), then recompute the last
+    ROLLUP_RECONCILE_DAYS of hourly rollups from raw rows every ROLLUP_RECONCILE_INTERVAL_SECONDS, on the writer thread so
+    it never interleaves with trigger deltas. Repairs drift from writes that bypassed triggers."""
+    while True:
+        try:
+            day = _db_writer.call(_rollup_backfill_step, wait=True, timeout=600.0)
+        except Exception as e:
+            print('[rollup_backfill]', e, flush=True)
+            day = None
+        if day is None:
+            break
+        time.sleep(0.05)  # let pipeline writes in between days
+    while True:
+        interval, days = _rollup_reconcile_settings()
+        time.sleep(interval)
+        try:
+            date_from = time.strftime('%Y-%m-%d', time.gmtime(time.time() - (days - 1) * 86400))
+            t0 = time.time()
+            rows = _db_writer.call(lambda cur: _rebuild_rollups(cur, date_from), wait=True, timeout=600.0)
+            _log_structured('rollup_reconcile', date_from=date_from, rollup_rows=rows, duration_ms=int(1000 * (time.time() - t0)))
+        except Exception as e:
+            print('[rollup_reconcile]', e, flush=True)
+
+
 if __name__ == '__main__':
     if os.environ.get('FLASK_SECRET_KEY') in (None, '', 'dev-secret-change-in-production'):
         import sys
         print('WARNING: Using default FLASK_SECRET_KEY. Set FLASK_SECRET_KEY in production.', file=sys.stderr)
     threading.Thread(target=analyze_frame, daemon=True).start()
+    threading.Thread(target=_sync_recordings_catalog, daemon=True).start()
     if os.environ.get('RETENTION_DAYS') or os.environ.get('AUDIT_RETENTION_DAYS'):
         threading.Thread(target=retention_job, daemon=True).start()
     if os.environ.get('ENABLE_RECORDING_FIXITY', '').strip().lower() in ('1', 'true', 'yes'):
         threading.Thread(target=fixity_job, daemon=True).start()
+    threading.Thread(target=rollup_reconcile_job, daemon=True).start()
     if _redis_sub is not None:
         threading.Thread(target=_redis_subscriber, daemon=True).start()
     port = int(os.environ.get('PORT', 5000))
@@ -58,6 +58,7 @@ export type EventRow = {
   acknowledged_by: string | null;
   acknowledged_at: string | null;
   integrity_hash?: string | null;
+  clip_path?: string | null;
 };
 
 export type Site = { id: string; name: string; map_url: string | null; timezone: string | null };
@@ -379,7 +380,17 @@ export async function resetServerData(): Promise<{ success: boolean; error?: str
   return data as { success: boolean };
 }
 
-export type RecordingEntry = { name: string; size_bytes: number; created_utc: string };
+export type RecordingEntry = {
+  name: string;
+  size_bytes: number;
+  created_utc: string;
+  camera_id?: string | null;
+  start_utc?: string;
+  end_utc?: string | null;
+  frame_count?: number | null;
+  codec?: string | null;
+  fps?: number | null;
+};
 export type RecordingsResponse = { recordings: RecordingEntry[]; forbidden?: boolean };
 export async function fetchRecordings(): Promise<RecordingsResponse> {
   const r = await get(`${API_BASE}/recordings`);
@@ -83,14 +83,29 @@ if not REID_AVAILABLE:
 
 # Default preprocessing for ReID: resize to 256x128 (person aspect), normalize
 REID_INPUT_SIZE = (256, 128)
+# Crops per forward pass in compute_embeddings (reid.max_batch in vigil_upgrade config)
+DEFAULT_MAX_BATCH = 16
+_TRANSFORM: Any = None
+
+
+def _get_transform() -> Any:
+    """torchvision preprocessing pipeline, built once."""
+    global _TRANSFORM
+    if _TRANSFORM is None:
+        from torchvision import transforms
+        _TRANSFORM = transforms.Compose([
+            transforms.ToPILImage(),
+            transforms.Resize(REID_INPUT_SIZE),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+        ])
+    return _TRANSFORM
 
 
 def _preprocess_crop(crop: np.ndarray) -> "torch.Tensor | None":
-    """Convert BGR/RGB numpy crop to tensor for ReID model."""
+    """Convert BGR/RGB numpy crop to a (3, H, W) tensor for the ReID model (CPU; batched by compute_embeddings)."""
     if not TORCH_AVAILABLE or _REID_MODEL is None:
         return None
-    import torch
-    from torchvision import transforms
     if crop is None or crop.size == 0:
         return None
     try:
@@ -100,40 +115,47 @@ def _preprocess_crop(crop: np.ndarray) -> "torch.Tensor | None":
         h, w = crop.shape[:2]
         if h < 10 or w < 10:
             return None
-        transform = transforms.Compose([
-            transforms.ToPILImage(),
-            transforms.Resize(REID_INPUT_SIZE),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-        ])
-        x = transform(crop).unsqueeze(0).to(DEVICE)
-        return x
+        return _get_transform()(np.ascontiguousarray(crop))
     except Exception:
         return None
 
 
+def compute_embeddings(crops: list[np.ndarray | None], max_batch: int = DEFAULT_MAX_BATCH) -> list[np.ndarray | None]:
+    """
+    Batched compute_embedding: every usable crop is preprocessed and embedded in
+    forward passes of up to max_batch crops. Returns one entry per crop (None for
+    unusable crops), L2-normalised float32 vectors of shape (dim,).
+    """
+    if _REID_MODEL is None:
+        # Stub: return zero vectors so callers don't break
+        return [np.zeros(_REID_DIM or 128, dtype=np.float32) for _ in crops]
+    out: list[np.ndarray | None] = [None] * len(crops)
+    tensors = [(i, _preprocess_crop(c)) for i, c in enumerate(crops)]
+    tensors = [(i, x) for i, x in tensors if x is not None]
+    step = max(1, int(max_batch))
+    for start in range(0, len(tensors), step):
+        chunk = tensors[start:start + step]
+        batch = torch.stack([x for _, x in chunk]).to(DEVICE)
+        with torch.inference_mode():
+            feats = _REID_MODEL(batch)
+        # OSNet / ResNet may return tuple (logits, features) or single tensor
+        if isinstance(feats, (list, tuple)):
+            feats = feats[-1]
+        vecs = feats.reshape(len(chunk), -1).float().cpu().numpy()
+        # L2 normalize for cosine similarity
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs = np.where(norms > 1e-6, vecs / np.maximum(norms, 1e-6), vecs).astype(np.float32)
+        for (i, _), vec in zip(chunk, vecs):
+            out[i] = vec
+    return out
+
+
 def compute_embedding(crop: np.ndarray) -> np.ndarray | None:
     """
     Compute ReID embedding from a person crop (numpy array, HWC BGR/RGB).
     Returns vector of shape (dim,) or None if unavailable.
     """
-    if _REID_MODEL is None:
-        # Stub: return zero vector so callers don't break
-        return np.zeros(_REID_DIM or 128, dtype=np.float32)
-    x = _preprocess_crop(crop)
-    if x is None:
-        return None
-    with torch.no_grad():
-        out = _REID_MODEL(x)
-    # OSNet / ResNet may return tuple (logits, features) or single tensor
-    if isinstance(out, (list, tuple)):
-        out = out[-1]
-    vec = out.cpu().numpy().flatten()
-    # L2 normalize for cosine similarity
-    norm = np.linalg.norm(vec)
-    if norm > 1e-6:
-        vec = vec / norm
-    return vec.astype(np.float32)
+    return compute_embeddings([crop])[0]
 
 
 def embedding_to_blob(vec: np.ndarray) -> bytes:
@@ -185,6 +207,34 @@ def find_best_match(
     return best_id, best_sim
 
 
+def find_best_matches(
+    embeddings: list[np.ndarray | None],
+    stored: list[tuple[int, int | None, bytes, int]],
+    threshold: float = 0.85,
+) -> list[tuple[int | None, float]]:
+    """
+    Batched find_best_match: stored blobs are decoded once and scored against all
+    embeddings in one matrix product. Returns one (id or None, similarity) per embedding.
+    """
+    out: list[tuple[int | None, float]] = [(None, 0.0)] * len(embeddings)
+    for dim in {int(np.asarray(e).size) for e in embeddings if e is not None}:
+        rows = [(eid, person_id, blob) for eid, person_id, blob, d in stored if d == dim]
+        which = [i for i, e in enumerate(embeddings) if e is not None and np.asarray(e).size == dim]
+        if not rows or not dim:
+            continue
+        ref = np.stack([np.frombuffer(blob, dtype=np.float32) for _, _, blob in rows])
+        q = np.stack([np.asarray(embeddings[i], dtype=np.float32).ravel() for i in which])
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        sims = np.clip((q / np.maximum(norms, 1e-6)) @ ref.T, -1.0, 1.0)
+        best = np.argmax(sims, axis=1)
+        for row, i in enumerate(which):
+            sim = float(sims[row, best[row]])
+            if norms[row, 0] >= 1e-6 and sim >= threshold and sim > 0:
+                eid, person_id, _ = rows[best[row]]
+                out[i] = (person_id if person_id is not None else eid, sim)
+    return out
+
+
 def get_embedding_dim() -> int:
     """Return current ReID embedding dimension."""
     return _REID_DIM or 128
@@ -0,0 +1,316 @@
+"""
+Nearest-neighbour index over stored ReID person embeddings.
+
+Replaces the per-frame "load every embedding blob and score it in Python" path:
+embeddings are L2-normalised once and kept in memory, so a match is one
+inner-product search (inner product = cosine similarity).
+
+Backends:
+  - hnsw:  approximate (HNSW graph via hnswlib); knobs M, ef_construction, ef_search.
+  - numpy: exact scan over a preallocated float32 matrix (no extra dependency).
+"auto" picks hnsw when hnswlib is installed, else numpy.
+
+The index is updated incrementally (add) and snapshotted to disk (save/load);
+sync() appends rows inserted into the embeddings table since it last ran (its
+cursor is saved with the snapshot).
+
+Benchmark: python -m proactive.reid_index --sizes 10000,100000,1000000
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+import numpy as np
+
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    hnswlib = None
+    HNSWLIB_AVAILABLE = False
+
+DEFAULT_INDEX_CONFIG: dict[str, Any] = {
+    "backend": "auto",        # auto | hnsw | numpy
+    "hnsw_m": 16,             # graph degree: higher = better recall, more memory
+    "ef_construction": 200,   # build-time beam width: higher = better graph, slower inserts
+    "ef_search": 64,          # query beam width: higher = better recall, slower matches
+    "snapshot_every": 1000,   # save after this many incremental adds (0 = only on explicit save)
+    "sync_interval_sec": 5.0, # how often match_person re-reads new rows written by other processes
+    "path": "",               # snapshot base path; default <database>.reid_index
+}
+
+
+def index_config(config: dict[str, Any] | None) -> dict[str, Any]:
+    """Index knobs from config['reid']['index'] over DEFAULT_INDEX_CONFIG."""
+    cfg = dict(DEFAULT_INDEX_CONFIG)
+    cfg.update(((config or {}).get("reid") or {}).get("index") or {})
+    return cfg
+
+
+def _normalise(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Row-normalised float32 copy and a mask of rows with non-zero norm."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1)
+    ok = norms > 1e-6
+    out = np.zeros_like(vectors)
+    out[ok] = vectors[ok] / norms[ok, None]
+    return out, ok
+
+
+class ReidIndex:
+    """In-memory embedding index keyed by embedding id, remembering each id's person_id."""
+
+    def __init__(
+        self,
+        dim: int,
+        backend: str = "auto",
+        hnsw_m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        capacity: int = 1024,
+        **_: Any,
+    ):
+        if backend == "auto":
+            backend = "hnsw" if HNSWLIB_AVAILABLE else "numpy"
+        if backend == "hnsw" and not HNSWLIB_AVAILABLE:
+            raise ImportError("hnswlib is not installed (pip install hnswlib) — use backend 'numpy'")
+        if backend not in ("hnsw", "numpy"):
+            raise ValueError(f"unknown ReID index backend: {backend}")
+        self.dim = int(dim)
+        self.backend = backend
+        self.ef_search = int(ef_search)
+        self.last_id = 0  # sync cursor: highest embeddings row id read by sync(); add() leaves it alone
+        self._lock = threading.RLock()
+        self._ids = np.zeros((capacity,), dtype=np.int64)
+        self._person_ids = np.full((capacity,), -1, dtype=np.int64)  # -1 = no person_id
+        self._count = 0
+        self._pos: dict[int, int] = {}  # embedding id -> row
+        if backend == "hnsw":
+            self._hnsw = hnswlib.Index(space="ip", dim=self.dim)
+            self._hnsw.init_index(max_elements=capacity, ef_construction=int(ef_construction), M=int(hnsw_m))
+            self._hnsw.set_ef(self.ef_search)
+            self._vectors = None
+        else:
+            self._hnsw = None
+            self._vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _reserve(self, n: int) -> None:
+        cap = len(self._ids)
+        if n <= cap:
+            return
+        new_cap = max(n, cap * 2)
+        self._ids = np.resize(self._ids, new_cap)
+        self._person_ids = np.concatenate([self._person_ids[:cap], np.full((new_cap - cap,), -1, dtype=np.int64)])
+        if self._hnsw is not None:
+            self._hnsw.resize_index(new_cap)
+        else:
+            grown = np.zeros((new_cap, self.dim), dtype=np.float32)
+            grown[: self._count] = self._vectors[: self._count]
+            self._vectors = grown
+
+    def add(self, ids, vectors, person_ids=None) -> int:
+        """Add embeddings (ids (N,), vectors (N, dim)); zero vectors, wrong dims and known ids are skipped. Returns count added."""
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if vectors.shape[1] != self.dim or not len(ids):
+            return 0
+        pids = np.full(len(ids), -1, dtype=np.int64) if person_ids is None else np.asarray(
+            [-1 if p is None else int(p) for p in np.atleast_1d(person_ids)], dtype=np.int64)
+        vectors, ok = _normalise(vectors)
+        with self._lock:
+            ok &= np.array([int(i) not in self._pos for i in ids], dtype=bool)
+            ids, vectors, pids = ids[ok], vectors[ok], pids[ok]
+            if not len(ids):
+                return 0
+            start = self._count
+            self._reserve(start + len(ids))
+            rows = np.arange(start, start + len(ids))
+            self._ids[rows] = ids
+            self._person_ids[rows] = pids
+            if self._hnsw is not None:
+                self._hnsw.add_items(vectors, rows)
+            else:
+                self._vectors[rows] = vectors
+            self._pos.update(zip(ids.tolist(), rows.tolist()))
+            self._count += len(ids)
+            return len(ids)
+
+    def search(self, vectors, k: int = 1) -> list[list[tuple[int, int | None, float]]]:
+        """Top-k (embedding_id, person_id, cosine similarity) per query vector (1-D or (B, dim)), best first."""
+        queries, ok = _normalise(vectors)
+        with self._lock:
+            n = self._count
+            if not n or queries.shape[1] != self.dim:
+                return [[] for _ in range(len(queries))]
+            k = max(1, min(int(k), n))
+            if self._hnsw is not None:
+                self._hnsw.set_ef(max(self.ef_search, k))
+                rows, dist = self._hnsw.knn_query(queries, k=k)
+                sims = 1.0 - dist
+            else:
+                all_sims = queries @ self._vectors[:n].T
+                rows = np.argpartition(-all_sims, k - 1, axis=1)[:, :k]
+                sims = np.take_along_axis(all_sims, rows, axis=1)
+                order = np.argsort(-sims, axis=1)
+                rows, sims = np.take_along_axis(rows, order, axis=1), np.take_along_axis(sims, order, axis=1)
+            ids, pids = self._ids[rows], self._person_ids[rows]
+        out = []
+        for b in range(len(queries)):
+            if not ok[b]:
+                out.append([])
+                continue
+            out.append([(int(ids[b, j]), None if pids[b, j] < 0 else int(pids[b, j]), float(np.clip(sims[b, j], -1.0, 1.0)))
+                        for j in range(k)])
+        return out
+
+    def best_match(self, embedding: np.ndarray, threshold: float = 0.85) -> tuple[int | None, float]:
+        """Same contract as reid.find_best_match: (person_id or embedding id, similarity) if >= threshold, else (None, 0.0)."""
+        if embedding is None or np.asarray(embedding).size == 0:
+            return None, 0.0
+        return self.best_matches([embedding], threshold)[0]
+
+    def best_matches(self, embeddings: list[np.ndarray | None], threshold: float = 0.85) -> list[tuple[int | None, float]]:
+        """Batched best_match: one search for all embeddings (None entries give (None, 0.0))."""
+        out: list[tuple[int | None, float]] = [(None, 0.0)] * len(embeddings)
+        which = [i for i, e in enumerate(embeddings) if e is not None and np.asarray(e).size == self.dim]
+        if not which:
+            return out
+        for i, hits in zip(which, self.search(np.stack([np.asarray(embeddings[i], dtype=np.float32).ravel() for i in which]), k=1)):
+            if hits and hits[0][2] >= threshold:
+                eid, pid, sim = hits[0]
+                out[i] = ((pid if pid is not None else eid), sim)
+        return out
+
+    def sync(self, conn: sqlite3.Connection) -> int:
+        """Add embeddings rows with id > last_id (written since the snapshot or by another process). Returns count added.
+        Only sync() advances last_id, so rows another process wrote below an id added locally are still picked up."""
+        try:
+            rows = conn.execute(
+                "SELECT id, person_id, embedding_blob FROM embeddings WHERE id > ? AND embedding_dim = ? ORDER BY id",
+                (self.last_id, self.dim),
+            ).fetchall()
+        except sqlite3.Error:
+            return 0
+        if not rows:
+            return 0
+        vectors = np.stack([np.frombuffer(r[2], dtype=np.float32) for r in rows])
+        added = self.add([r[0] for r in rows], vectors, [r[1] for r in rows])
+        self.last_id = max(self.last_id, int(rows[-1][0]))
+        return added
+
+    def save(self, path: str) -> None:
+        """Snapshot to <path>.npz (+ <path>.hnsw for the HNSW graph). Written to temp files, then renamed."""
+        with self._lock:
+            n = self._count
+            meta = {
+                "dim": np.int64(self.dim),
+                "backend": np.array(self.backend),
+                "last_id": np.int64(self.last_id),
+                "ids": self._ids[:n],
+                "person_ids": self._person_ids[:n],
+            }
+            if self._hnsw is None:
+                meta["vectors"] = self._vectors[:n]
+            else:
+                self._hnsw.save_index(path + ".hnsw.tmp")
+            with open(path + ".npz.tmp", "wb") as f:
+                np.savez(f, **meta)
+        if self._hnsw is not None:
+            os.replace(path + ".hnsw.tmp", path + ".hnsw")
+        os.replace(path + ".npz.tmp", path + ".npz")
+
+    @classmethod
+    def load(cls, path: str, **knobs: Any) -> "ReidIndex | None":
+        """Load a snapshot written by save(); None if missing, unreadable or its backend is unavailable."""
+        try:
+            with np.load(path + ".npz") as meta:
+                dim, backend = int(meta["dim"]), str(meta["backend"])
+                ids, pids = meta["ids"], meta["person_ids"]
+                vectors = meta["vectors"] if "vectors" in meta.files else None
+                last_id = int(meta["last_id"])
+            knobs = {**knobs, "backend": backend}
+            index = cls(dim, capacity=max(1024, len(ids)), **knobs)
+            if backend == "hnsw":
+                index._hnsw.load_index(path + ".hnsw", max_elements=max(1024, len(ids)))
+                index._hnsw.set_ef(index.ef_search)
+            else:
+                index._vectors[: len(ids)] = vectors
+            index._ids[: len(ids)] = ids
+            index._person_ids[: len(ids)] = pids
+            index._pos = {int(i): r for r, i in enumerate(ids.tolist())}
+            index._count = len(ids)
+            index.last_id = last_id
+            return index
+        except (OSError, KeyError, ValueError, ImportError, RuntimeError):
+            return None
+
+
+def benchmark(sizes=(10_000, 100_000, 1_000_000), dim: int = 512, queries: int = 200, k: int = 1, **knobs: Any) -> list[dict[str, Any]]:
+    """
+    Match latency vs index size on random unit vectors. For each size: build time,
+    p50/p95 single-query latency (ms) and recall@k against an exact scan.
+    """
+    rng = np.random.default_rng(0)
+    results = []
+    for size in sizes:
+        index = ReidIndex(dim, capacity=size, **knobs)
+        t0 = time.perf_counter()
+        for start in range(0, size, 50_000):
+            n = min(50_000, size - start)
+            index.add(np.arange(start + 1, start + n + 1), rng.standard_normal((n, dim), dtype=np.float32))
+        build_s = time.perf_counter() - t0
+        # Queries near stored vectors, so there is a true nearest neighbour to find
+        probe_rows = rng.integers(0, size, queries)
+        base = index._vectors[probe_rows] if index._vectors is not None else np.stack(index._hnsw.get_items(probe_rows))
+        probes = base + 0.05 * rng.standard_normal(base.shape, dtype=np.float32)
+        lat = []
+        hits = []
+        for q in probes:
+            t = time.perf_counter()
+            hits.append(index.search(q, k=k)[0])
+            lat.append((time.perf_counter() - t) * 1000)
+        if index.backend == "numpy":
+            recall = 1.0
+        else:
+            qn, _ = _normalise(probes)
+            exact = []
+            for start in range(0, size, 50_000):  # exact top-1 by streaming the stored vectors
+                chunk = np.stack(index._hnsw.get_items(np.arange(start, min(size, start + 50_000))))
+                s = qn @ chunk.T
+                exact.append((s.max(axis=1), s.argmax(axis=1) + start))
+            best = np.argmax(np.stack([e[0] for e in exact]), axis=0)
+            exact_rows = np.stack([e[1] for e in exact])[best, np.arange(len(probes))]
+            recall = float(np.mean([int(index._ids[r]) in {h[0] for h in hs} for r, hs in zip(exact_rows, hits)]))
+        results.append({
+            "size": size,
+            "backend": index.backend,
+            "build_s": round(build_s, 2),
+            "p50_ms": round(float(np.percentile(lat, 50)), 3),
+            "p95_ms": round(float(np.percentile(lat, 95)), 3),
+            "recall_at_k": round(recall, 4),
+        })
+        del index
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="ReID index match-latency benchmark")
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    ap.add_argument("--dim", type=int, default=512)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--backend", default="auto")
+    ap.add_argument("--ef-search", type=int, default=DEFAULT_INDEX_CONFIG["ef_search"])
+    ap.add_argument("--hnsw-m", type=int, default=DEFAULT_INDEX_CONFIG["hnsw_m"])
+    args = ap.parse_args()
+    print(f"{'size':>9} {'backend':>7} {'build_s':>8} {'p50_ms':>8} {'p95_ms':>8} {'recall':>7}")
+    for row in benchmark([int(s) for s in args.sizes.split(",")], dim=args.dim, queries=args.queries,
+                         backend=args.backend, ef_search=args.ef_search, hnsw_m=args.hnsw_m):
+        print(f"{row['size']:>9} {row['backend']:>7} {row['build_s']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['recall_at_k']:>7}")
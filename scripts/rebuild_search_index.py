@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Backfill / rebuild the FTS5 search indexes (ai_data_fts, events_fts) behind /api/v1/search.
+
+New rows are indexed by triggers. Run this once after upgrading a database too large for the
+startup migration to backfill inline, or to repair the index after restoring a backup.
+Uses the same database as the app (DATA_DIR/surveillance.db or ./surveillance.db).
+
+Usage:
+    python scripts/rebuild_search_index.py
+"""
+import os
+import sys
+import time
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_root)
+env_path = os.path.join(repo_root, '.env')
+if os.path.isfile(env_path):
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(env_path)
+    except ImportError:
+        pass
+
+
+def main():
+    import sqlite3
+    os.environ.setdefault('APP_NO_DEVICES', '1')  # database helpers only: do not open cameras, ONVIF, Redis or GPIO
+    import app
+
+    path = app._db_path()
+    app._ensure_schema(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA busy_timeout=30000')
+        t0 = time.perf_counter()
+        if not app._rebuild_search_index(conn):
+            print('FTS5 is not available in this SQLite build; search uses LIKE scans.', file=sys.stderr)
+            return 1
+        ai_rows = conn.execute('SELECT COUNT(*) FROM ai_data').fetchone()[0]
+        ev_rows = conn.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+    finally:
+        conn.close()
+    print('Indexed %d ai_data rows and %d events in %.1fs (%s)' % (ai_rows, ev_rows, time.perf_counter() - t0, path))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
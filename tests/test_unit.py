@@ -4,6 +4,7 @@ Run from repo root with venv: python -m pytest tests/ -v   or   python -m unitte
 """
 import os
 import sys
+import time
 import unittest
 
 # Ensure repo root on path and load .env
@@ -125,5 +126,1075 @@ class TestPointSideOfLine(unittest.TestCase):
         self.assertEqual(self._point_side_of_line(0.5, 0, line), 0)      # on line
 
 
+
+class TestFrameRing(unittest.TestCase):
+    """Tests for the per-camera capture ring (_FrameRing)."""
+
+    def setUp(self):
+        from app import _FrameRing
+        self._ring = _FrameRing(3)
+
+    def test_latest_empty(self):
+        self.assertIsNone(self._ring.latest())
+        self.assertIsNone(self._ring.wait_next(0, timeout=0.01))
+
+    def test_publish_and_skip_to_latest(self):
+        for i in range(5):
+            self._ring.publish('f%d' % i, ts=float(i))
+        seq, ts, frame = self._ring.wait_next(0, timeout=0.01)
+        self.assertEqual((seq, ts, frame), (5, 4.0, 'f4'))
+        self.assertIsNone(self._ring.wait_next(5, timeout=0.01))
+
+    def test_since_returns_buffered_frames_in_order(self):
+        for i in range(5):
+            self._ring.publish('f%d' % i, ts=float(i))
+        self.assertEqual([f[2] for f in self._ring.since(3)], ['f3', 'f4'])
+        self.assertEqual(len(self._ring.since(0)), 3)  # bounded by maxlen
+
+    def test_fps(self):
+        for i in range(11):
+            self._ring.publish(i, ts=i * 0.1)
+        self.assertAlmostEqual(self._ring.fps(), 10.0, places=1)
+
+
+
+class TestMjpegBroadcaster(unittest.TestCase):
+    """Encode-once MJPEG: subscribers of a tier share the same bytes object."""
+
+    def test_shared_bytes_and_stats(self):
+        import numpy as np
+        from app import _FrameRing, _MjpegBroadcaster
+        ring = _FrameRing(4)
+        b = _MjpegBroadcaster('test', ring)
+        b.subscribe('default')
+        b.subscribe('default')
+        ring.publish(np.zeros((48, 64, 3), dtype=np.uint8))
+        first = b.wait_next('default', 0, timeout=2.0)
+        second = b.wait_next('default', 0, timeout=2.0)
+        self.assertIsNotNone(first)
+        self.assertIs(first[1], second[1])
+        self.assertTrue(first[1].startswith(b'\xff\xd8'))
+        self.assertIsNone(b.wait_next('low', 0, timeout=0.05))  # no low-tier subscribers: not encoded
+        self.assertEqual(b.stats()['subscribers']['default'], 2)
+        b.unsubscribe('default')
+        self.assertEqual(b.stats()['subscribers']['default'], 1)
+
+
+
+class TestPerCameraMotionState(unittest.TestCase):
+    """detect_motion keeps its previous frame per camera, so cameras do not difference against each other."""
+
+    def test_states_are_independent(self):
+        import numpy as np
+        from app import _CameraAnalyticsState, detect_motion
+        dark = np.zeros((120, 160, 3), dtype=np.uint8)
+        bright = np.full((120, 160, 3), 255, dtype=np.uint8)
+        a, b = _CameraAnalyticsState('a'), _CameraAnalyticsState('b')
+        self.assertFalse(detect_motion(dark, a))
+        self.assertFalse(detect_motion(bright, b))  # first frame for b: no baseline yet
+        self.assertFalse(detect_motion(dark, a))
+        self.assertTrue(detect_motion(dark, b))
+
+    def test_motion_gate_downscaled(self):
+        import numpy as np
+        from app import _CameraAnalyticsState, _detect_motion_gate
+        st = _CameraAnalyticsState('gate')
+        still = np.zeros((720, 1280, 3), dtype=np.uint8)
+        moved = still.copy()
+        moved[200:400, 300:500] = 255  # 40k px change at full res, well above MOTION_THRESHOLD
+        self.assertFalse(_detect_motion_gate(still, st))
+        self.assertFalse(_detect_motion_gate(still, st))
+        self.assertTrue(_detect_motion_gate(moved, st))
+        self.assertEqual(st.prev_motion_gray.shape[1], 320)
+
+
+
+class TestYoloBatcher(unittest.TestCase):
+    """Cross-camera batched inference: concurrent callers share one predict() and get their own result back."""
+
+    def test_batches_and_routes_results(self):
+        import threading
+        from unittest import mock
+        import app as _app
+
+        class _FakeModel:
+            def __init__(self):
+                self.calls = []
+
+            def predict(self, frames, **kwargs):
+                self.calls.append(len(frames))
+                return ['res-%s' % f for f in frames]
+
+        fake = _FakeModel()
+        batcher = _app._YoloBatcher(max_batch=4, max_wait=0.2)
+        out = {}
+        with mock.patch.object(_app, 'yolo_model', fake):
+            threads = [threading.Thread(target=lambda i=i: out.__setitem__(i, batcher.predict(i))) for i in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(5)
+        self.assertEqual(out, {i: ['res-%d' % i] for i in range(4)})
+        self.assertLess(len(fake.calls), 4)
+        stats = batcher.stats()
+        self.assertEqual(stats['frames'], 4)
+        self.assertGreater(stats['max_batch_size_seen'], 1)
+
+
+
+class TestDetections(unittest.TestCase):
+    """Per-frame _Detections: one NumPy conversion, person mask/primary index, vectorised class/confidence filter."""
+
+    def test_primary_person_and_filter(self):
+        import numpy as np
+        from unittest import mock
+        import app as _app
+        names = {0: 'person', 2: 'car', 56: 'chair'}
+        xyxy = [[0, 0, 10, 10], [0, 0, 40, 80], [5, 5, 50, 30], [0, 0, 5, 5]]
+        dets = _app._Detections(xyxy, [0.9, 0.6, 0.8, 0.4], [0, 0, 2, 56], names)
+        self.assertEqual(dets.primary, 1)
+        self.assertEqual(dets.first_person(), 0)
+        self.assertEqual(int(dets.person.sum()), 2)
+        self.assertEqual(dets.indices_of(_app.VEHICLE_CLASSES), [2])
+        frame = np.zeros((100, 100, 3), dtype=np.uint8)
+        self.assertEqual(_app._get_person_centroids(frame, dets), [(5.0, 5.0), (20.0, 40.0)])
+        self.assertEqual(_app._get_primary_centroid_normalized(frame, dets), (0.2, 0.4))
+        with mock.patch.object(_app, '_yolo_ignore_classes', {'chair'}), \
+                mock.patch.object(_app, '_yolo_class_conf', {'person': 0.7}), \
+                mock.patch.object(_app, '_yolo_conf', 0.25):
+            kept = _app._filter_yolo_results(dets)
+        self.assertEqual(kept.labels, ['person', 'car'])
+        self.assertEqual(kept.primary, 0)
+        empty = _app._Detections.from_results(None)
+        self.assertEqual(len(empty), 0)
+        self.assertIsNone(empty.primary)
+        self.assertEqual(len(_app._filter_yolo_results(empty)), 0)
+
+
+class TestPerceptionStage(unittest.TestCase):
+    """Stateless perception stage, in-thread and through the ANALYZE_MODE=process shared-memory pool."""
+
+    def test_extended_attributes_split(self):
+        import numpy as np
+        import app as _app
+        frame = np.full((200, 200, 3), 60, dtype=np.uint8)
+        dets = _app._Detections([[50, 20, 90, 180]], [0.8], [0], {0: 'person'})
+        combined = _app._extract_frame_attributes(frame, dets)
+        combined.update(_app._extract_behavior_attributes('Standing', 'Angry', 'Loitering Detected'))
+        self.assertEqual(combined['illumination_band'], 'dark')
+        self.assertEqual(combined['suspicious_behavior'], 'loitering')
+        self.assertEqual(combined['threat_score'], 60)
+        self.assertEqual(combined['detection_confidence'], 0.8)
+
+    def test_process_pool_round_trip(self):
+        import numpy as np
+        import app as _app
+        pool = _app._AnalysisProcessPool(processes=1, slots_per_worker=1, slot_bytes=64, timeout=60)
+        try:
+            frame = np.full((120, 160, 3), 200, dtype=np.uint8)
+            out = pool.perceive(frame, extended=True, minimal=False)  # slot grows to fit the frame
+            expected = _app._perceive_frame(frame, extended=True, minimal=False)
+            self.assertEqual(out['scene'], expected['scene'])
+            self.assertEqual(out['attributes']['illumination_band'], 'bright')
+            self.assertIsInstance(out['dets'], _app._Detections)
+            self.assertEqual(pool.stats()['completed'], 1)
+        finally:
+            pool.close()
+
+    def test_hung_worker_is_replaced_on_timeout(self):
+        import numpy as np
+        from unittest import mock
+        import app as _app
+
+        def hung_spawn(pool, wi):  # a worker that is alive but never answers
+            proc = pool._ctx.Process(target=time.sleep, args=(60,), daemon=True)
+            proc.start()
+            return [proc, pool._ctx.Queue(), {}]
+
+        with mock.patch.object(_app._AnalysisProcessPool, '_spawn', hung_spawn):
+            pool = _app._AnalysisProcessPool(processes=1, slots_per_worker=1, slot_bytes=64, timeout=0.5)
+            try:
+                frame = np.zeros((4, 4, 3), dtype=np.uint8)
+                for _ in range(2):  # the only slot comes back each time instead of being held by the hung worker
+                    with self.assertRaisesRegex(RuntimeError, 'timed out'):
+                        pool.perceive(frame)
+                stats = pool.stats()
+                self.assertEqual((stats['restarts'], stats['in_flight'], stats['failed']), (2, 0, 2))
+            finally:
+                pool.close()
+
+
+class TestPoseContext(unittest.TestCase):
+    """Pose stage: one MediaPipe call per person crop, person-down evaluated for every person."""
+
+    def test_one_pass_per_person_and_multi_person_down(self):
+        import numpy as np
+        from types import SimpleNamespace
+        from unittest import mock
+        import app as _app
+
+        def landmarks(lying):
+            lm = [SimpleNamespace(x=0.5, y=0.5, visibility=1.0) for _ in range(33)]
+            if lying:  # shoulders and hips level: horizontal torso
+                lm[11], lm[12], lm[23], lm[24] = (SimpleNamespace(x=x, y=0.5, visibility=1.0) for x in (0.2, 0.25, 0.7, 0.75))
+                lm[25] = lm[26] = SimpleNamespace(x=0.9, y=0.7, visibility=1.0)
+            else:  # shoulders above hips above knees
+                for i, y in ((11, 0.2), (12, 0.2), (23, 0.5), (24, 0.5), (25, 0.75), (26, 0.75)):
+                    lm[i] = SimpleNamespace(x=0.5, y=y, visibility=1.0)
+            return SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=lm))
+
+        calls = []
+
+        def process(rgb):
+            calls.append(rgb.shape)
+            return landmarks(lying=rgb.shape[1] > rgb.shape[0])
+
+        frame = np.zeros((300, 400, 3), dtype=np.uint8)
+        dets = _app._Detections([[20, 20, 100, 260], [120, 180, 390, 290], [380, 0, 390, 10]], [0.9, 0.8, 0.7], [0, 0, 0], {0: 'person'})
+        with mock.patch.object(_app, 'MEDIAPIPE_AVAILABLE', True), mock.patch.object(_app, 'mp_pose', object()), \
+                mock.patch.object(_app, '_mp_pose_process', side_effect=process):
+            ctx = _app._pose_context(frame, dets)
+            self.assertEqual(len(calls), 2)  # tiny third person skipped, no full-frame retry
+            self.assertEqual(ctx['primary']['index'], 1)  # largest person (lying) is primary
+            self.assertEqual([p['down'] for p in ctx['persons']], [True, False])
+            self.assertEqual(ctx['persons'][1]['label'], 'Standing')
+            out = _app._perceive_frame(frame, minimal=True, predict=lambda f: None)
+        self.assertEqual(out['pose_persons'], 1)  # no detections: a single full-frame pass
+
+
+class TestFaceStage(unittest.TestCase):
+    """Shared face stage: eye-levelled crops, and face models skipped when the detector finds no face."""
+
+    def test_aligned_crop_levels_eyes(self):
+        import numpy as np
+        import app as _app
+        frame = np.zeros((200, 200, 3), dtype=np.uint8)
+        frame[80:90, 60:70] = 255   # right eye (image left)
+        frame[110:120, 130:140] = 255  # left eye, lower: face tilted
+        face = {'bbox': (50, 50, 150, 150), 'score': 0.9,
+                'landmarks': np.array([[65, 85], [135, 115], [100, 100], [80, 130], [120, 140]], dtype=np.float32)}
+        crop = _app._aligned_face_crop(frame, face, margin=0.1)
+        self.assertEqual(crop.shape[:2], (120, 120))
+        ys, xs = np.nonzero(crop[..., 0] > 128)
+        left, right = ys[xs < 60], ys[xs >= 60]
+        self.assertLess(abs(float(left.mean()) - float(right.mean())), 3.0)
+
+    def test_no_face_skips_face_models(self):
+        import numpy as np
+        from unittest import mock
+        import app as _app
+        frame = np.full((120, 160, 3), 90, dtype=np.uint8)
+        dets = _app._Detections([[20, 10, 100, 110]], [0.9], [0], {0: 'person'})
+        with mock.patch.object(_app, '_detect_faces', return_value=[]):
+            ctx = _app._face_context(frame, dets)
+        self.assertEqual(ctx, {'count': 0, 'bbox': None, 'score': None, 'crop': None})
+        with mock.patch.object(_app, '_get_face_embedding') as emb:
+            self.assertEqual(_app._get_dominant_emotion(frame, dets, ctx), 'Neutral')
+            self.assertIsNone(_app._watchlist_face_embedding(frame, dets, ctx))
+            emb.assert_not_called()
+        face = {'bbox': (40.0, 20.0, 80.0, 60.0), 'score': 0.95,
+                'landmarks': np.array([[50, 35], [70, 35], [60, 45], [52, 52], [68, 52]], dtype=np.float32)}
+        with mock.patch.object(_app, '_detect_faces', return_value=[face]):
+            ctx = _app._face_context(frame, dets)
+        self.assertEqual((ctx['count'], ctx['bbox']), (1, (40, 20, 80, 60)))
+        self.assertEqual(ctx['crop'].shape[:2], (60, 60))
+
+    def test_yunet_download_is_verified(self):
+        import hashlib
+        import io
+        import shutil
+        import tempfile
+        import urllib.request
+        from unittest import mock
+        import app as _app
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        payload = b'yunet-model-bytes'
+        env = {'YUNET_MODEL_PATH': '', 'YUNET_MODEL_URL': 'https://example.invalid/pinned/yunet.onnx',
+               'YUNET_MODEL_SHA256': hashlib.sha256(b'other').hexdigest()}
+        for expect_ok in (False, True):
+            with mock.patch.dict(os.environ, env), mock.patch.object(_app, '__file__', os.path.join(tmp, 'app.py')), \
+                    mock.patch.object(_app, '_yunet_model_resolved', None), \
+                    mock.patch.object(urllib.request, 'urlopen', return_value=io.BytesIO(payload)):
+                path = _app._yunet_model_path()
+            self.assertEqual(path is not None, expect_ok)
+            self.assertEqual(sorted(os.listdir(os.path.join(tmp, 'models'))), ['face_detection_yunet_2023mar.onnx'] if expect_ok else [])
+            env['YUNET_MODEL_SHA256'] = hashlib.sha256(payload).hexdigest()
+        with mock.patch.dict(os.environ, {'YUNET_MODEL_URL': '', 'YUNET_MODEL_SHA256': ''}), \
+                mock.patch.object(_app, '_yunet_model_resolved', None), mock.patch.object(_app, '__file__', os.path.join(tmp, 'x', 'app.py')), \
+                mock.patch.object(urllib.request, 'urlopen', return_value=io.BytesIO(payload)) as urlopen:
+            self.assertIsNone(_app._yunet_model_path())  # defaults apply: opencv_zoo URL, digest mismatch rejected
+        self.assertEqual(urlopen.call_args[0][0], _app._YUNET_MODEL_URL)
+
+    def test_watchlist_enrolment_uses_aligned_face_crop(self):
+        import base64
+        import cv2
+        import numpy as np
+        from unittest import mock
+        import app as _app
+        frame = np.full((120, 160, 3), 90, dtype=np.uint8)
+        body = {'name': 'alice', 'image_base64': base64.b64encode(cv2.imencode('.png', frame)[1].tobytes()).decode('ascii')}
+        face = {'bbox': (40.0, 20.0, 80.0, 60.0), 'score': 0.95,
+                'landmarks': np.array([[50, 35], [70, 35], [60, 45], [52, 52], [68, 52]], dtype=np.float32)}
+        for faces in ([], [face]):
+            with _app.app.test_request_context('/api/v1/watchlist', method='POST', json=body), \
+                    mock.patch.object(_app, '_detect_faces', return_value=faces), \
+                    mock.patch.object(_app, '_get_face_embedding', return_value=None) as emb:
+                res = _app.api_v1_watchlist_add.__wrapped__()
+            self.assertEqual(res[1], 400)
+        args, kwargs = emb.call_args
+        self.assertEqual(args[0].shape[:2], (60, 60))
+        self.assertEqual(kwargs, {'aligned': True})
+
+
+class TestTrackAttributeCache(unittest.TestCase):
+    """Per-track attribute cache: refresh policies decide which groups perception may skip; skipped groups are refilled."""
+
+    def test_refresh_policies_and_fill(self):
+        import numpy as np
+        from unittest import mock
+        import app as _app
+        cache = _app._TrackAttributeCache('0')
+        dets = _app._Detections([[10, 10, 60, 150]], [0.9], [0], {0: 'person'}, ids=[7])
+        attrs = {'hair_color': 'black', 'build': 'slim', 'perceived_gender': 'Woman', 'perceived_age': 30}
+        cache.resolve({'dets': dets, 'emotion': 'Happy', 'attributes': dict(attrs), 'computed': ['appearance', 'demographics', 'emotion', 'identity']}, now=100.0)
+        cache.store_identity(7, {'individual': 'Stranger', 'face_match_confidence': 0.3}, now=100.0)
+        with mock.patch.dict(_app._ATTRIBUTE_REFRESH_SECONDS, {'appearance': 15.0, 'demographics': 0.0, 'emotion': 3.0}):
+            self.assertEqual(cache.fresh_groups(7, now=101.0), {'appearance', 'demographics', 'emotion'})
+            self.assertEqual(cache.fresh_groups(7, now=110.0), {'appearance', 'demographics'})
+            self.assertEqual(cache.fresh_groups(7, now=1000.0), {'demographics'})
+        self.assertEqual(cache.fresh_groups(8), frozenset())
+        perception = {'dets': dets, 'emotion': 'Unknown', 'attributes': {'hair_color': None, 'perceived_gender': None},
+                      'skipped': ['demographics', 'emotion'], 'computed': ['appearance']}
+        cache.resolve(perception, now=102.0)
+        self.assertEqual((perception['emotion'], perception['attributes']['perceived_gender']), ('Happy', 'Woman'))
+        self.assertIsNone(perception['identity'])
+        self.assertEqual(cache.stats()['hits'], {'demographics': 1, 'emotion': 1})
+        cache.store_identity(7, {'individual': 'alice', 'face_match_confidence': 0.9}, now=103.0)
+        self.assertIn('identity', cache.fresh_groups(7, now=103.0))
+        _app._watchlist_gallery.invalidate()  # watchlist add/delete: the cached match may name a removed face
+        self.assertNotIn('identity', cache.fresh_groups(7, now=103.0))
+        perception = {'dets': dets, 'emotion': 'Happy', 'attributes': {}, 'skipped': ['identity'], 'computed': []}
+        cache.resolve(perception, now=104.0)
+        self.assertIsNone(perception['identity'])
+        untracked = _app._Detections([[10, 10, 60, 150]], [0.9], [0], {0: 'person'})
+        cache.resolve({'dets': untracked, 'emotion': 'Sad', 'attributes': {}, 'computed': ['emotion']}, now=500.0)
+        self.assertEqual(cache.stats()['untracked_frames'], 1)
+        self.assertEqual(cache.stats()['tracks'], 0)  # track 7 expired (ATTRIBUTE_CACHE_TTL_SECONDS)
+        frame = np.full((200, 200, 3), 60, dtype=np.uint8)
+        skipped = _app._extract_frame_attributes(frame, dets, skip=('appearance',))
+        self.assertNotIn('hair_color', skipped)
+        self.assertEqual(skipped['detection_confidence'], 0.9)
+
+    def test_tracker_config_across_ultralytics_versions(self):
+        import sys
+        import types
+        from unittest import mock
+        import app as _app
+
+        class Tracker:
+            def __init__(self, args, frame_rate):
+                self.args = args
+
+        def fake_ultralytics(**utils_attrs):
+            utils = types.SimpleNamespace(IterableSimpleNamespace=types.SimpleNamespace, **utils_attrs)
+            return {'ultralytics': types.ModuleType('ultralytics'), 'ultralytics.utils': utils,
+                    'ultralytics.utils.checks': types.SimpleNamespace(check_yaml=lambda name: name),
+                    'ultralytics.trackers': types.ModuleType('ultralytics.trackers'),
+                    'ultralytics.trackers.bot_sort': types.SimpleNamespace(BOTSORT=Tracker),
+                    'ultralytics.trackers.byte_tracker': types.SimpleNamespace(BYTETracker=Tracker)}
+
+        cfg = {'tracker_type': 'bytetrack', 'track_buffer': 30}
+        current = fake_ultralytics(YAML=types.SimpleNamespace(load=lambda path: dict(cfg)))  # yaml_load removed
+        legacy = fake_ultralytics(yaml_load=lambda path: dict(cfg))
+        for modules in (current, legacy):
+            with mock.patch.dict(sys.modules, modules):
+                self.assertEqual(_app._new_object_tracker().args.track_buffer, 30)
+        with mock.patch.dict(sys.modules, fake_ultralytics()), self.assertLogs('app', 'WARNING'):
+            self.assertIsNone(_app._new_object_tracker())
+
+
+class TestLprOcrPool(unittest.TestCase):
+    """Async LPR: every vehicle is queued without blocking and a plate is only reported after the track's reads agree."""
+
+    def test_votes_per_vehicle_track(self):
+        import numpy as np
+        import threading
+        import app as _app
+        reads = {(0, 0): iter(['ABC123', 'A8C123', 'ABC123']), (255, 255): iter(['', '', ''])}
+        gate = threading.Event()
+
+        def read(roi):
+            gate.wait(5)
+            return next(reads[(int(roi[0, 0, 0]), int(roi[0, 0, 1]))])
+
+        pool = _app._LprOcrPool(workers=1, queue_size=8, votes=3, min_agreement=2, read=read)
+        frame = np.zeros((100, 200, 3), dtype=np.uint8)
+        frame[:, 100:] = 255
+        dets = _app._Detections([[0, 0, 90, 90], [110, 0, 200, 60], [0, 0, 5, 5]], [0.9, 0.8, 0.9], [2, 7, 0],
+                                {0: 'person', 2: 'car', 7: 'truck'}, ids=[3, 4, 5])
+        for _ in range(4):
+            self.assertEqual(pool.submit('0', frame, dets), 'N/A')  # returns immediately while OCR is held
+        self.assertEqual(pool.stats()['submitted'], 6)  # 3 reads per vehicle track, person ignored
+        gate.set()
+        deadline = time.time() + 5
+        while pool.stats()['ocr_runs'] < 6 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(pool.submit('0', frame, dets), 'ABC123')
+        self.assertEqual(pool.stats()['plates_decided'], 1)
+        self.assertEqual(pool.stats()['submitted'], 7)  # decided car stops; undecided truck keeps reading
+
+    def test_sliding_window_and_untracked_cells(self):
+        import numpy as np
+        import app as _app
+        reads = iter(['', 'XX', 'YY', 'ABC1', 'ABC1', 'DEF2', 'DEF2'])
+        results = []
+
+        def read(roi):
+            results.append(next(reads))
+            return results[-1]
+
+        pool = _app._LprOcrPool(workers=1, queue_size=8, votes=3, min_agreement=2, read=read)
+        frame = np.zeros((100, 200, 3), dtype=np.uint8)
+        car = _app._Detections([[0, 0, 90, 90]], [0.9], [2], {2: 'car'})  # no tracker: grid-cell key
+        empty = _app._Detections(np.zeros((0, 4)), [], [], {2: 'car'})
+
+        def settle(n):
+            deadline = time.time() + 5
+            while pool.stats()['ocr_runs'] < n and time.time() < deadline:
+                time.sleep(0.01)
+
+        for n in range(1, 6):  # one read in flight at a time; blurry early reads age out of the 3-read window
+            pool.submit('0', frame, car)
+            settle(n)
+        self.assertEqual(pool.submit('0', frame, car), 'ABC1')
+        self.assertEqual(pool.stats()['plates_decided'], 1)
+        pool.submit('0', frame, empty)  # cell left empty for a frame: car A has gone
+        settle(6)
+        self.assertEqual(pool.submit('0', frame, car), 'N/A')  # car B in the same cell does not inherit ABC1
+
+    def test_unreadable_plate_backs_off(self):
+        import numpy as np
+        import app as _app
+        pool = _app._LprOcrPool(workers=1, queue_size=8, votes=2, min_agreement=2, read=lambda roi: '')
+        frame = np.zeros((100, 200, 3), dtype=np.uint8)
+        car = _app._Detections([[0, 0, 90, 90]], [0.9], [2], {2: 'car'}, ids=[9])
+        for n in range(1, 9):
+            pool.submit('0', frame, car)
+            deadline = time.time() + 5
+            while pool.stats()['ocr_runs'] < min(n, 4) and time.time() < deadline:
+                time.sleep(0.01)
+        # 2 windows of 2 reads run freely; the 4th read starts the back-off (1s), so the next frames queue nothing
+        self.assertEqual(pool.stats()['submitted'], 4)
+
+
+class TestWatchlistGallery(unittest.TestCase):
+    """In-memory watchlist gallery: batched top-k cosine matching, DB read only on load/invalidate."""
+
+    def test_topk_matches_and_invalidate(self):
+        import numpy as np
+        import app as _app
+        gallery = _app._WatchlistGallery()
+        tag = 'gallery_test_%d' % int(time.time() * 1000)
+        refs = {tag + '_a': [1, 0, 0, 0], tag + '_b': [0, 2, 0, 0], tag + '_c': [1, 1, 0, 0]}
+        cur = _app.get_cursor()
+        try:
+            for name, vec in refs.items():
+                cur.execute('INSERT INTO watchlist_faces (name, embedding, created_at) VALUES (?, ?, ?)',
+                            (name, np.asarray(vec, dtype=np.float32).tobytes(), '2024-01-01T00:00:00Z'))
+            _app.get_conn().commit()
+            probes = np.asarray([[3, 0, 0, 0], [0, 1, 0.1, 0]], dtype=np.float32)
+            top = gallery.match(probes, k=2)
+            self.assertEqual([n for n, _ in top[0]], [tag + '_a', tag + '_c'])
+            self.assertAlmostEqual(top[0][0][1], 1.0, places=5)
+            self.assertAlmostEqual(top[0][1][1], (1 + 2 ** -0.5) / 2, places=5)
+            self.assertEqual(top[1][0][0], tag + '_b')
+            self.assertEqual(gallery.match(np.ones(3, dtype=np.float32)), [[]])  # other embedding dimension
+            cur.execute('DELETE FROM watchlist_faces WHERE name = ?', (tag + '_a',))
+            _app.get_conn().commit()
+            self.assertEqual(gallery.match(probes[0])[0][0][0], tag + '_a')  # cached until invalidated
+            gallery.invalidate()
+            self.assertEqual(gallery.match(probes[0])[0][0][0], tag + '_c')
+            self.assertEqual(gallery.stats()['loads'], 2)
+        finally:
+            cur.execute('DELETE FROM watchlist_faces WHERE name LIKE ?', (tag + '%',))
+            _app.get_conn().commit()
+
+
+class TestReidIndex(unittest.TestCase):
+    """ReID index: same answers as find_best_match, incremental sync from the embeddings table, snapshot round trip."""
+
+    def test_matches_sync_and_snapshot(self):
+        import sqlite3
+        import tempfile
+        import numpy as np
+        from proactive.reid import find_best_match
+        from proactive.reid_index import ReidIndex
+        rng = np.random.default_rng(1)
+        vecs = rng.standard_normal((50, 16)).astype(np.float32)
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE embeddings (id INTEGER PRIMARY KEY, person_id INTEGER, event_id INTEGER, embedding_blob BLOB, embedding_dim INTEGER)')
+        norm = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+        rows = [(i + 1, (i % 5) or None, None, norm[i].tobytes(), 16) for i in range(40)]
+        conn.executemany('INSERT INTO embeddings VALUES (?, ?, ?, ?, ?)', rows)
+        index = ReidIndex(16, backend='numpy', capacity=8)
+        self.assertEqual(index.sync(conn), 40)
+        stored = [(r[0], r[1], r[3], r[4]) for r in rows]
+        for probe in vecs[:5] + 0.1 * rng.standard_normal((5, 16)).astype(np.float32):
+            self.assertEqual(index.best_match(probe, 0.5)[0], find_best_match(probe, stored, 0.5)[0])
+        self.assertEqual(index.best_match(np.zeros(16, dtype=np.float32)), (None, 0.0))
+        conn.execute('INSERT INTO embeddings VALUES (41, 7, NULL, ?, 16)', (norm[45].tobytes(),))
+        self.assertEqual(index.sync(conn), 1)
+        self.assertEqual(index.best_match(vecs[45], 0.9)[0], 7)
+        path = os.path.join(tempfile.mkdtemp(), 'reid_index')
+        index.save(path)
+        loaded = ReidIndex.load(path)
+        self.assertEqual((len(loaded), loaded.last_id), (41, 41))
+        self.assertEqual(loaded.search(vecs[:3], k=2), index.search(vecs[:3], k=2))
+        self.assertIsNone(ReidIndex.load(path + '_missing'))
+        # A local add above rows another process has written must not move the sync cursor past them
+        index = ReidIndex(16, backend='numpy')
+        conn.execute('DELETE FROM embeddings WHERE id > 1')
+        index.add([2], norm[1:2], [3])
+        self.assertEqual((index.sync(conn), index.last_id), (1, 1))
+        self.assertEqual(index.best_match(vecs[0], 0.9)[0], rows[0][1] or 1)
+
+    def test_batched_matching_agrees_with_single(self):
+        import numpy as np
+        from proactive.reid import find_best_match, find_best_matches
+        from proactive.reid_index import ReidIndex
+        rng = np.random.default_rng(2)
+        refs = rng.standard_normal((30, 8)).astype(np.float32)
+        refs /= np.linalg.norm(refs, axis=1, keepdims=True)
+        stored = [(i + 1, (i % 3) or None, refs[i].tobytes(), 8) for i in range(30)]
+        probes = [refs[4] + 0.05, None, rng.standard_normal(8).astype(np.float32), np.zeros(8, dtype=np.float32), refs[9]]
+        single = [find_best_match(p, stored, 0.8) if p is not None else (None, 0.0) for p in probes]
+        batched = find_best_matches(probes, stored, 0.8)
+        self.assertEqual([m[0] for m in batched], [m[0] for m in single])
+        index = ReidIndex(8, backend='numpy')
+        index.add([r[0] for r in stored], refs, [r[1] for r in stored])
+        self.assertEqual([m[0] for m in index.best_matches(probes, 0.8)], [m[0] for m in single])
+
+
+class TestOnnxYoloPostprocess(unittest.TestCase):
+    """ONNX backend post-processing and PyTorch box-agreement check (no onnxruntime needed)."""
+
+    def test_decode_nms_and_agreement(self):
+        import numpy as np
+        from vigil_upgrade.models import box_agreement, decode_yolo_output, letterbox
+        # (4+nc, N) head, nc=2: two overlapping class-0 boxes (NMS keeps the stronger), one class-1 box, one below conf
+        pred = np.array([
+            [50, 52, 200, 10],
+            [50, 50, 200, 10],
+            [20, 20, 40, 4],
+            [40, 40, 40, 4],
+            [0.9, 0.8, 0.0, 0.1],
+            [0.0, 0.0, 0.7, 0.05],
+        ], dtype=np.float32)
+        xyxy, conf, cls = decode_yolo_output(pred, conf=0.25, iou=0.45)
+        self.assertEqual(cls.tolist(), [0, 1])
+        np.testing.assert_allclose(xyxy[0], [40, 30, 60, 70])
+        # NMS-free (N, 6) head
+        end2end = np.array([[1, 2, 3, 4, 0.9, 2], [0, 0, 1, 1, 0.1, 0]], dtype=np.float32)
+        xyxy, conf, cls = decode_yolo_output(end2end, conf=0.25)
+        self.assertEqual(cls.tolist(), [2])
+        img, gain, pad = letterbox(np.zeros((240, 320, 3), dtype=np.uint8), 640)
+        self.assertEqual(img.shape, (640, 640, 3))
+        self.assertEqual((gain, pad), (2.0, (0.0, 80.0)))
+        ref = [(np.array([[0, 0, 10, 10], [20, 20, 30, 30]]), np.array([0, 2]))]
+        cand = [(np.array([[1, 0, 10, 10], [20, 20, 30, 30]]), np.array([0, 0]))]
+        agreement = box_agreement(ref, cand)
+        self.assertEqual((agreement['recall'], agreement['precision']), (0.5, 0.5))
+        self.assertEqual(box_agreement(ref, ref)['f1'], 1.0)
+
+    def test_track_builds_tracker_once(self):
+        import numpy as np
+        from unittest import mock
+        from vigil_upgrade import models
+        model = object.__new__(models.OnnxYolo)  # no onnxruntime session needed: predict is stubbed
+        model._trackers = {}
+        empty = models.OnnxResult(models.OnnxBoxes(np.zeros((0, 4)), np.zeros((0,)), np.zeros((0,))), {}, (10, 10))
+        tracker = mock.Mock(**{'update.return_value': np.zeros((0, 8))})
+        with mock.patch.object(models, 'new_tracker', return_value=tracker) as build, \
+                mock.patch.object(models.OnnxYolo, 'predict', side_effect=lambda frames, **kw: [empty for _ in frames]):
+            for _ in range(2):
+                res = model.track(np.zeros((10, 10, 3), dtype=np.uint8), tracker='botsort.yaml')
+        build.assert_called_once_with('botsort.yaml', frame_rate=30)
+        self.assertEqual(len(res[0].boxes.xyxy), 0)
+
+    def test_model_version_records_backend(self):
+        from unittest import mock
+        import app as _app
+        with mock.patch.dict(os.environ, {'YOLO_MODEL': 'yolov8s.pt'}):
+            for info, expected in (({'backend': 'ultralytics'}, 'yolov8s.pt'),
+                                   ({'backend': 'onnxruntime', 'int8': True}, 'yolov8s.pt (onnxruntime int8)'),
+                                   ({'backend': 'onnxruntime', 'int8': False}, 'yolov8s.pt (onnxruntime fp32)'),
+                                   ({'backend': 'onnxruntime', 'int8': True, 'fallback': 'ultralytics'}, 'yolov8s.pt')):
+                with mock.patch.object(_app, '_yolo_backend_info', info):
+                    self.assertEqual(_app._yolo_model_version(), expected)
+
+
+class TestRecordingWriter(unittest.TestCase):
+    """Per-camera recording writer: one file per camera, independent of stream viewers."""
+
+    def test_safe_recording_basename(self):
+        from app import _safe_recording_basename
+        self.assertEqual(_safe_recording_basename('recording_1700000000.avi'), 'recording_1700000000.avi')
+        self.assertEqual(_safe_recording_basename('recording_2_1700000000.avi'), 'recording_2_1700000000.avi')
+        self.assertIsNone(_safe_recording_basename('recording_../x_1.avi'))
+        self.assertIsNone(_safe_recording_basename('other.avi'))
+
+    def test_writes_queued_frames_to_camera_file(self):
+        import tempfile
+        import time
+        import numpy as np
+        from unittest import mock
+        import app as _app
+        tmp = tempfile.mkdtemp()
+        with mock.patch.object(_app, '_recordings_dir', lambda: tmp):
+            w = _app._RecordingWriter('cam-7', queue_size=16)
+            for i in range(5):
+                w.offer(np.full((240, 320, 3), i * 40, dtype=np.uint8), time.time())
+            w.stop()
+            w.join(10)
+        stats = w.stats()
+        self.assertEqual(stats['frames_written'], 5)
+        self.assertTrue(stats['file'].startswith('recording_cam-7_'))
+        self.assertTrue(os.path.isfile(os.path.join(tmp, stats['file'])))
+
+    def test_segments_are_catalogued(self):
+        import tempfile
+        import time
+        import numpy as np
+        from unittest import mock
+        import app as _app
+        tmp = tempfile.mkdtemp()
+        cam = 'seg-%d' % int(time.time() * 1000)
+        with mock.patch.object(_app, '_recordings_dir', lambda: tmp):
+            w = _app._RecordingWriter(cam, queue_size=16, segment_seconds=0.2)
+            for i in range(4):
+                w.offer(np.full((240, 320, 3), i * 40, dtype=np.uint8), time.time())
+                time.sleep(0.25)
+            w.stop()
+            w.join(10)
+        try:
+            rows = _app._recordings_in_range(camera_id=cam, newest_first=False)
+            self.assertGreaterEqual(len(rows), 2)
+            self.assertEqual(sum(r['frame_count'] for r in rows), 4)
+            self.assertTrue(all(r['end_utc'] and r['codec'] == 'XVID' for r in rows))
+            self.assertEqual(_app._recordings_in_range('2000-01-01T00:00:00Z', '2000-01-02T00:00:00Z', cam), [])
+            legacy = 'recording_%s.avi' % cam.split('-')[1]  # pre-segment name: no camera in the catalog
+            _app.get_cursor().execute("INSERT INTO recordings (name, camera_id, start_utc, end_utc) VALUES (?, NULL, '2000-01-01T10:00:00Z', "
+                                      "'2000-01-01T11:00:00Z')", (legacy,))
+            self.assertEqual(_app._recordings_in_range('2000-01-01T00:00:00Z', '2000-01-02T00:00:00Z', cam), [])
+            self.assertEqual([r['name'] for r in _app._recordings_in_range('2000-01-01T00:00:00Z', '2000-01-02T00:00:00Z', cam,
+                                                                            include_unattributed=True)], [legacy])
+        finally:
+            _app.get_cursor().execute("DELETE FROM recordings WHERE camera_id = ? OR name = ?", (cam, 'recording_%s.avi' % cam.split('-')[1]))
+            _app.get_conn().commit()
+
+
+
+class TestEventClipBuffer(unittest.TestCase):
+    """Pre-event buffer trims by age and memory, and writes pre-roll clips linked to the event row."""
+
+    def test_trim_and_write_clip(self):
+        import tempfile
+        import time
+        import cv2
+        import numpy as np
+        from unittest import mock
+        import app as _app
+        ok, jpeg = cv2.imencode('.jpg', np.zeros((120, 160, 3), dtype=np.uint8))
+        jpeg = jpeg.tobytes()
+        tmp = tempfile.mkdtemp()
+        cur = _app.get_cursor()
+        cur.execute("INSERT INTO events (event_type, camera_id, timestamp) VALUES ('fall', 'clip-test', datetime('now'))")
+        _app.get_conn().commit()
+        event_id = cur.lastrowid
+        try:
+            with mock.patch.object(_app, '_recordings_dir', lambda: tmp):
+                buf = _app._ClipBuffer('clip-test', _app._FrameRing(2), pre_seconds=2, post_seconds=0, fps=10, max_bytes=len(jpeg) * 4)
+                now = time.time()
+                buf.add(now - 10, jpeg)  # older than pre_seconds: trimmed
+                for i in range(6):
+                    buf.add(now - 0.5 + i * 0.1, jpeg)
+                stats = buf.stats()
+                self.assertLessEqual(stats['buffered_bytes'], len(jpeg) * 4)
+                buf.request_clip(event_id, ts=now + 0.1)
+                for _ in range(50):
+                    if buf.clips_written:
+                        break
+                    time.sleep(0.1)
+                buf.stop()
+                self.assertEqual(buf.clips_written, 1)
+                self.assertTrue(os.path.isfile(os.path.join(tmp, 'clips', 'clip_%d.avi' % event_id)))
+            cur.execute('SELECT clip_path FROM events WHERE id = ?', (event_id,))
+            self.assertEqual(cur.fetchone()[0], 'clip_%d.avi' % event_id)
+        finally:
+            cur.execute('DELETE FROM events WHERE id = ?', (event_id,))
+            _app.get_conn().commit()
+
+
+
+class TestMp4RemuxCache(unittest.TestCase):
+    """MP4 playback cache: keyed by (name, size, mtime), LRU-evicted to max_bytes."""
+
+    def test_key_hit_and_eviction(self):
+        import tempfile
+        import time
+        from unittest import mock
+        import app as _app
+        tmp = tempfile.mkdtemp()
+        src = os.path.join(tmp, 'recording_1_1700000000.avi')
+        with open(src, 'wb') as f:
+            f.write(b'avi')
+        with mock.patch.object(_app, '_recordings_dir', lambda: tmp):
+            cache = _app._Mp4RemuxCache(max_bytes=10)
+            entry = os.path.join(cache._dir(), cache._entry_name(src))
+            with open(entry, 'wb') as f:
+                f.write(b'mp4')
+            self.assertEqual(cache.ensure(src), entry)
+            self.assertEqual(cache.hits, 1)
+            with open(src, 'ab') as f:
+                f.write(b'more')  # source changed: old remux no longer matches
+            self.assertIsNone(cache.get(src))
+            old = os.path.join(cache._dir(), 'recording_0_1.1.1.mp4')
+            with open(old, 'wb') as f:
+                f.write(b'x' * 8)
+            os.utime(old, (time.time() - 100, time.time() - 100))
+            cache._evict(keep=entry)
+            self.assertFalse(os.path.exists(old))
+            self.assertTrue(os.path.exists(entry))
+            cache.discard('recording_1_1700000000.avi')
+            self.assertFalse(os.path.exists(entry))
+
+
+class TestRecordingSha256(unittest.TestCase):
+    """Recording digests: reused while size/mtime are unchanged, recomputed (and flagged by fixity) when the file changes."""
+
+    def test_segment_digest_does_not_block_writer(self):
+        import tempfile
+        import threading
+        import numpy as np
+        from unittest import mock
+        import app as _app
+        tmp = tempfile.mkdtemp()
+        gate = threading.Event()
+        real = _app._compute_recording_sha256
+
+        def slow(path, *a, **k):
+            gate.wait(10)
+            return real(path)
+
+        cam = 'dig-%d' % int(time.time() * 1000)
+        with mock.patch.object(_app, '_recordings_dir', lambda: tmp), mock.patch.object(_app, '_compute_recording_sha256', slow):
+            w = _app._RecordingWriter(cam, queue_size=16)
+            w.offer(np.zeros((240, 320, 3), dtype=np.uint8), time.time())
+            w.stop()
+            w.join(5)
+            self.assertFalse(w._thread.is_alive())  # closed while the digest is still held
+            name = w.stats()['file']
+            gate.set()
+            _app._recording_digest_queue.join()
+        self.assertEqual(_app._recording_sha256(os.path.join(tmp, name))[1], 'stored')
+
+    def test_stored_digest_reused_until_file_changes(self):
+        import hashlib
+        import tempfile
+        from unittest import mock
+        import app as _app
+        tmp = tempfile.mkdtemp()
+        name = 'recording_9_%d.avi' % int(time.time() * 1000)
+        path = os.path.join(tmp, name)
+        with open(path, 'wb') as f:
+            f.write(b'segment')
+        _app._store_recording_sha256(name, hashlib.sha256(b'segment').hexdigest(), os.stat(path))
+        self.assertEqual(_app._recording_sha256(path), (hashlib.sha256(b'segment').hexdigest(), 'stored'))
+        with open(path, 'ab') as f:
+            f.write(b'tampered')
+        sha, source = _app._recording_sha256(path)
+        self.assertEqual((sha, source), (hashlib.sha256(b'segmenttampered').hexdigest(), 'computed'))
+        with mock.patch.object(_app, '_log_structured') as log:
+            self.assertEqual(_app._fixity_check_recording(name, tmp, '9999', None), 'mismatch')
+            log.assert_called_once()
+        self.assertEqual(_app._fixity_check_recording(name, tmp, '', None), 'skipped')
+
+
+
+class TestDbWriter(unittest.TestCase):
+    """Single SQLite writer: queued intents are group-committed in order, a failing intent does not drop its group."""
+
+    def test_group_commit_and_failure_isolation(self):
+        import sqlite3
+        import app as _app
+        w = _app._DbWriter(max_batch=100, max_latency=0.05, queue_size=1000)
+        w.call(lambda cur: cur.execute('CREATE TEMP TABLE writer_probe (v INTEGER)'), wait=True)
+        committed = []
+        w.executemany('INSERT INTO writer_probe (v) VALUES (?)', [(i,) for i in range(10)])
+        w.executemany('INSERT INTO writer_probe (v) VALUES (?)', [(i,) for i in range(10, 20)])
+        w.execute('INSERT INTO writer_probe_missing (v) VALUES (?)', (1,))
+        w.execute('INSERT INTO writer_probe (v) VALUES (?)', (20,), on_commit=committed.append)
+        row_id = w.execute('INSERT INTO writer_probe (v) VALUES (?)', (21,), wait=True)
+        self.assertEqual(row_id, 22)
+        self.assertEqual(committed, [21])
+        count = w.call(lambda cur: cur.execute('SELECT COUNT(*) FROM writer_probe').fetchone()[0], wait=True)
+        self.assertEqual(count, 22)
+        with self.assertRaises(sqlite3.OperationalError):
+            w.execute('INSERT INTO writer_probe_missing (v) VALUES (?)', (1,), wait=True)
+        self.assertTrue(w.flush())
+        stats = w.stats()
+        self.assertEqual(stats['failed'], 2)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['rows'], 27)
+        self.assertLess(stats['commits'], stats['intents'])
+
+    def test_locked_database_is_retried_not_dropped(self):
+        import sqlite3
+        import tempfile
+        from unittest import mock
+        import app as _app
+        tmp = tempfile.mkdtemp()
+        with mock.patch.dict(os.environ, {'DATA_DIR': tmp}):
+            w = _app._DbWriter(max_batch=100, max_latency=0.01, queue_size=100)
+            w.call(lambda cur: cur.execute('PRAGMA busy_timeout=20'), wait=True)
+            holder = sqlite3.connect(_app._db_path(), isolation_level=None)
+            holder.execute('BEGIN IMMEDIATE')
+            w.executemany("INSERT INTO sites (id, name) VALUES (?, 'x')", [('locked-probe',)])
+            time.sleep(0.4)
+            holder.execute('COMMIT')
+            self.assertTrue(w.flush())
+            self.assertEqual(holder.execute("SELECT COUNT(*) FROM sites WHERE id = 'locked-probe'").fetchone()[0], 1)
+            holder.close()
+            stats = w.stats()
+            self.assertEqual(stats['failed'], 0)
+            self.assertGreater(stats['lock_retries'], 0)
+
+    def test_lock_that_never_clears_fails_the_intents(self):
+        import sqlite3
+        import tempfile
+        from unittest import mock
+        import app as _app
+        tmp = tempfile.mkdtemp()
+        with mock.patch.dict(os.environ, {'DATA_DIR': tmp}):
+            w = _app._DbWriter(max_batch=100, max_latency=0.01, queue_size=100, lock_retry_seconds=0.3)
+            w.call(lambda cur: cur.execute('PRAGMA busy_timeout=20'), wait=True)
+            holder = sqlite3.connect(_app._db_path(), isolation_level=None)
+            holder.execute('BEGIN IMMEDIATE')
+            t0 = time.time()
+            with self.assertRaises(sqlite3.OperationalError):
+                w.execute("INSERT INTO sites (id, name) VALUES ('never-probe', 'x')", wait=True, timeout=10)
+            self.assertLess(time.time() - t0, 5)
+            holder.execute('ROLLBACK')
+            holder.close()
+            self.assertEqual(w.stats()['failed'], 1)
+            self.assertIsNotNone(w.execute("INSERT INTO sites (id, name) VALUES ('never-probe', 'x')", wait=True))  # writer recovers
+
+    def test_connection_failure_raises_to_waiters(self):
+        from unittest import mock
+        import app as _app
+        w = _app._DbWriter(max_batch=100, max_latency=0.01, queue_size=100)
+        with mock.patch.object(_app, 'get_conn', side_effect=OSError('disk gone')):
+            with self.assertRaises(OSError):
+                w.execute("INSERT INTO sites (id, name) VALUES ('no-conn', 'x')", wait=True, timeout=5)
+
+
+
+class TestSchemaMigrations(unittest.TestCase):
+    """user_version migrations: a fresh or unversioned database is migrated once, later runs are no-ops."""
+
+    def test_fresh_and_legacy_databases(self):
+        import sqlite3
+        import tempfile
+        import app as _app
+        tmp = tempfile.mkdtemp()
+        fresh = sqlite3.connect(os.path.join(tmp, 'fresh.db'))
+        self.assertEqual(_app._migrate_schema(fresh), [v for v, _ in _app._SCHEMA_MIGRATIONS])
+        self.assertEqual(fresh.execute('PRAGMA user_version').fetchone()[0], _app.SCHEMA_VERSION)
+        self.assertEqual(_app._migrate_schema(fresh), [])
+        fresh.close()
+        legacy = sqlite3.connect(os.path.join(tmp, 'legacy.db'))
+        legacy.execute('CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, event_type TEXT NOT NULL, camera_id TEXT, timestamp TEXT NOT NULL, metadata TEXT)')
+        legacy.execute("INSERT INTO events (event_type, timestamp) VALUES ('motion', '2024-01-01 00:00:00')")
+        legacy.commit()
+        _app._migrate_schema(legacy)
+        cols = {r[1] for r in legacy.execute('PRAGMA table_info(events)')}
+        self.assertTrue({'site_id', 'timestamp_utc', 'integrity_hash', 'clip_path'} <= cols)
+        self.assertEqual(legacy.execute('SELECT COUNT(*) FROM events').fetchone()[0], 1)
+        self.assertEqual(legacy.execute('PRAGMA user_version').fetchone()[0], _app.SCHEMA_VERSION)
+        legacy.close()
+
+
+
+class TestReadPool(unittest.TestCase):
+    """Read-only pool: request-scoped leases are read-only, returned at teardown and reused; exhaustion times out."""
+
+    def test_request_lease_is_read_only_and_reused(self):
+        import sqlite3
+        import app as _app
+        before = _app._read_pool.stats()
+        with _app.app.test_request_context('/get_data'):
+            cur = _app._read_cursor()
+            self.assertIs(cur, _app._read_cursor())
+            cur.execute('SELECT COUNT(*) FROM events')
+            cur.fetchone()
+            with self.assertRaises(sqlite3.OperationalError):
+                cur.execute("INSERT INTO sites (id, name) VALUES ('read-pool-probe', 'x')")
+        with _app.app.test_request_context('/events'):
+            _app._read_cursor().execute('SELECT 1')
+        after = _app._read_pool.stats()
+        self.assertEqual(after['in_use'], 0)
+        self.assertEqual(after['acquired'] - before['acquired'], 2)
+        self.assertGreaterEqual(after['reused'] - before['reused'], 1)
+
+    def test_exhausted_pool_times_out(self):
+        import app as _app
+        pool = _app._ReadPool(size=1, timeout=0.05, mmap_mb=0, cache_mb=1)
+        conn = pool.acquire()
+        with self.assertRaises(TimeoutError):
+            pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        stats = pool.stats()
+        self.assertEqual((stats['open'], stats['waited'], stats['timeouts'], stats['reused']), (1, 1, 1, 1))
+
+
+
+class TestSearchFts(unittest.TestCase):
+    """FTS5 search: trigger-maintained indexes, prefix terms, BM25 order and filters joined on rowid."""
+
+    def test_search_uses_fts_index(self):
+        import sqlite3
+        import tempfile
+        from unittest import mock
+        import app as _app
+        tmp = tempfile.mkdtemp()
+        with mock.patch.dict(os.environ, {'DATA_DIR': tmp}):
+            path = _app._db_path()
+            _app._ensure_schema(path)
+            conn = sqlite3.connect(path)
+            if not _app._search_fts_available(conn):
+                self.skipTest('SQLite built without FTS5')
+            rows = [
+                ('2024-05-01', '10:00:00', 'person', 'Motion Detected', 'red jacket, jeans', '0'),
+                ('2024-05-02', '11:00:00', 'person', 'Motion Detected', 'red jacket, red cap', '1'),
+                ('2024-05-03', '12:00:00', 'car', 'Motion Detected', 'blue coat', '0'),
+            ]
+            conn.executemany('INSERT INTO ai_data (date, time, object, event, clothing_description, camera_id) VALUES (?, ?, ?, ?, ?, ?)', rows)
+            conn.execute("INSERT INTO events (event_type, camera_id, timestamp, metadata) VALUES ('loitering', '0', '2024-05-01 10:00:00', '{\"zone\": \"loading dock\"}')")
+            conn.commit()
+            self.assertEqual(_app._fts_match_query('red jack'), '"red"* "jack"*')
+            self.assertEqual(_app._fts_match_query('00:1a'), '"00 1a"*')
+            with _app.app.test_request_context('/api/v1/search'):
+                res = _app._search_impl('red jack', 10)
+                self.assertEqual([r['camera_id'] for r in res['ai_data']], ['1', '0'])  # two "red" tokens rank first
+                self.assertEqual(len(_app._search_impl('red jack', 10, camera_id='0')['ai_data']), 1)
+                self.assertEqual(len(_app._search_impl('red', 10, date_from='2024-05-02')['ai_data']), 1)
+                self.assertEqual([e['event_type'] for e in _app._search_impl('load', 10)['events']], ['loitering'])
+            conn.execute("DELETE FROM ai_data WHERE camera_id = '1'")
+            conn.execute("UPDATE ai_data SET clothing_description = 'green hoodie' WHERE date = '2024-05-03'")
+            conn.commit()
+            with _app.app.test_request_context('/api/v1/search'):
+                self.assertEqual(len(_app._search_impl('red', 10)['ai_data']), 1)
+                self.assertEqual([r['object'] for r in _app._search_impl('hood', 10)['ai_data']], ['car'])
+            self.assertTrue(_app._rebuild_search_index(conn))
+            conn.close()
+
+    def test_backfill_threshold_is_per_table(self):
+        import sqlite3
+        import tempfile
+        from unittest import mock
+        import app as _app
+        conn = sqlite3.connect(os.path.join(tempfile.mkdtemp(), 'v1.db'))
+        _app._schema_v1(conn)
+        conn.executemany("INSERT INTO ai_data (date, time, camera_id, perceived_age) VALUES ('2024-05-01', '10:00:00', '0', ?)",
+                         [(34,), (51,), (62,)])
+        conn.execute("INSERT INTO events (event_type, camera_id, timestamp) VALUES ('loitering', '0', '2024-05-01 10:00:00')")
+        conn.execute('PRAGMA user_version = 1')
+        conn.commit()
+        with mock.patch.object(_app, '_INLINE_BACKFILL_ROWS', 2):
+            _app._migrate_schema(conn)
+        if not _app._search_fts_available(conn):
+            self.skipTest('SQLite built without FTS5')
+        match = "SELECT COUNT(*) FROM %s WHERE %s MATCH ?"
+        self.assertEqual(conn.execute(match % ('events_fts', 'events_fts'), ('loitering',)).fetchone()[0], 1)  # small table: inline
+        self.assertEqual(conn.execute(match % ('ai_data_fts', 'ai_data_fts'), ('perceived_age:34',)).fetchone()[0], 0)  # left to the script
+        self.assertTrue(_app._rebuild_search_index(conn))
+        self.assertEqual(conn.execute(match % ('ai_data_fts', 'ai_data_fts'), ('perceived_age:34',)).fetchone()[0], 1)
+        conn.close()
+
+
+
+class TestHourlyRollups(unittest.TestCase):
+    """Hourly rollups: trigger deltas on insert/delete, re-bucketing in the endpoints, reconcile repairs drift."""
+
+    def test_rollups_follow_writes_and_rebucket(self):
+        import sqlite3
+        import tempfile
+        from unittest import mock
+        import app as _app
+        tmp = tempfile.mkdtemp()
+        with mock.patch.dict(os.environ, {'DATA_DIR': tmp}):
+            path = _app._db_path()
+            _app._ensure_schema(path)
+            conn = sqlite3.connect(path)
+            conn.executemany(
+                'INSERT INTO ai_data (date, time, camera_id, event, crowd_count, zone_presence) VALUES (?, ?, ?, ?, ?, ?)',
+                [('2024-05-01', '01:10:00', '0', 'Motion Detected', 2, '0,2'),
+                 ('2024-05-01', '02:20:00', '0', 'Motion Detected', 1, '2'),
+                 ('2024-05-01', '05:00:00', '1', 'Loitering', None, '')])
+            conn.execute("INSERT INTO events (event_type, camera_id, timestamp) VALUES ('motion', '0', '2024-05-01 01:30:00')")
+            conn.commit()
+            self.assertEqual(conn.execute('SELECT SUM(cnt), SUM(total_crowd) FROM ai_data_hourly').fetchone(), (3, 3))
+            self.assertEqual(conn.execute('SELECT SUM(frame_count) FROM zone_hourly WHERE zone_index = 2').fetchone()[0], 2)
+            self.assertEqual(conn.execute('SELECT cnt FROM events_hourly').fetchall(), [(1,)])
+            client = _app.app.test_client()
+            res = client.get('/api/v1/analytics/aggregates?date_from=2024-05-01&date_to=2024-05-01&bucket_hours=4').get_json()
+            self.assertEqual(res['bucket_hours'], 4)
+            self.assertEqual([(a['hour'], a['camera_id'], a['count'], a['total_crowd']) for a in res['aggregates']],
+                             [('00', '0', 2, 3), ('04', '1', 1, 0)])
+            with _app.app.test_request_context('/api/v1/analytics/zone_dwell?date_from=2024-05-01&date_to=2024-05-01&zone_index=2&bucket_hours=24'):
+                dwell = _app.api_v1_analytics_zone_dwell.__wrapped__().get_json()['zone_dwell']
+            self.assertEqual([(d['hour_bucket'], d['zone_index'], d['frame_count']) for d in dwell], [('00', 2, 2)])
+            conn.execute("DELETE FROM ai_data WHERE camera_id = '1'")
+            conn.commit()
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM ai_data_hourly WHERE camera_id = '1'").fetchone()[0], 0)
+            conn.execute("UPDATE ai_data_hourly SET cnt = 99")  # drift, e.g. from a write that bypassed the triggers
+            conn.commit()
+            _app._rebuild_rollups(conn, '2024-05-01')
+            conn.commit()
+            self.assertEqual(conn.execute('SELECT SUM(cnt) FROM ai_data_hourly').fetchone()[0], 2)
+            conn.close()
+
+    def test_large_database_is_backfilled_day_by_day(self):
+        import sqlite3
+        import tempfile
+        from unittest import mock
+        import app as _app
+        conn = sqlite3.connect(os.path.join(tempfile.mkdtemp(), 'big.db'))
+        _app._migrate_schema(conn)
+        conn.executemany('INSERT INTO ai_data (date, time, camera_id, event) VALUES (?, ?, ?, ?)',
+                         [('2024-05-0%d' % d, '10:00:00', '0', 'Motion Detected') for d in (1, 1, 2, 3)])
+        conn.execute("INSERT INTO events (event_type, camera_id, timestamp) VALUES ('motion', '0', '2024-04-30 09:00:00')")
+        for name in _app._ROLLUPS:
+            conn.execute('DELETE FROM %s' % name)
+        with mock.patch.object(_app, '_INLINE_BACKFILL_ROWS', 1):
+            _app._schema_v3(conn)  # too large for the inline build: only marks the backfill
+        conn.commit()
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM ai_data_hourly').fetchone()[0], 0)
+        days = []
+        while True:
+            day = _app._rollup_backfill_step(conn)
+            conn.commit()
+            if day is None:
+                break
+            days.append(day)
+        self.assertEqual(days, ['2024-05-03', '2024-05-02', '2024-05-01', '2024-04-30'])
+        self.assertEqual(conn.execute('SELECT SUM(cnt) FROM ai_data_hourly').fetchone()[0], 4)
+        self.assertEqual(conn.execute('SELECT SUM(cnt) FROM events_hourly').fetchone()[0], 1)
+        self.assertIsNone(conn.execute('SELECT value FROM rollup_state').fetchone())
+        conn.close()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -45,11 +45,15 @@ def run_pipeline(
     try:
         from vigil_upgrade.models import load_yolo, get_model_version
         from vigil_upgrade.db_storage import get_connection, init_schema, insert_detection, store_embedding
-        from vigil_upgrade.tracker_reid import run_track, process_frame_reid, embedding_to_blob, get_embedding_dim
+        from vigil_upgrade.tracker_reid import (
+            run_track, process_frame_reid, embedding_to_blob, get_embedding_dim, index_embedding, save_reid_index,
+        )
     except ImportError:
         from .models import load_yolo, get_model_version
         from .db_storage import get_connection, init_schema, insert_detection, store_embedding
-        from .tracker_reid import run_track, process_frame_reid, embedding_to_blob, get_embedding_dim
+        from .tracker_reid import (
+            run_track, process_frame_reid, embedding_to_blob, get_embedding_dim, index_embedding, save_reid_index,
+        )
 
     model = load_yolo(config=config)
     if model is None:
@@ -99,12 +103,14 @@ def run_pipeline(
                 emb = ro.get("embedding")
                 if emb is not None:
                     blob = embedding_to_blob(emb)
-                    store_embedding(conn, blob, dim, person_id=ro.get("person_id"))
+                    eid = store_embedding(conn, blob, dim, person_id=ro.get("person_id"))
+                    index_embedding(conn, eid, emb, person_id=ro.get("person_id"), config=config)
             frame_count += 1
             if frame_count % 100 == 0:
                 fps = frame_count / (time.perf_counter() - t0)
                 print(f"Frames: {frame_count} FPS: {fps:.1f}")
         cap.release()
+        save_reid_index(conn)
     print("Pipeline done.")
 
 
@@ -15,6 +15,8 @@ import os
 from pathlib import Path
 from typing import Any
 
+import numpy as np
+
 # Fallback order: try latest first, then older (so we get best available)
 MODEL_PRIORITY = (
     "yolo26n.pt",   # Edge-first, NMS-free (Ultralytics 2026)
@@ -50,15 +52,19 @@ def load_yolo(
     use_onnx: bool = False,
     imgsz: int = 640,
     device: str | None = None,
+    backend: str | None = None,
 ) -> Any:
     """
     Load YOLO model for detection/tracking.
 
     model_name: e.g. "yolov8n.pt", "yolo11n.pt", "yolo26n.pt". If None, uses
                 config["model"]["name"] or tries MODEL_PRIORITY in order.
-    config: optional; may contain model.name, model.use_onnx, model.imgsz.
-    use_onnx: if True, look for exported .onnx next to .pt or in config path.
-    Returns: Ultralytics YOLO instance (or None if import failed).
+    config: optional; may contain model.name, model.use_onnx, model.imgsz, model.backend and the
+            onnxruntime keys (int8, intra_op_threads, onnx_cache_dir, calibration_clip, min_agreement).
+    use_onnx: if True, use exported .onnx next to .pt or in config path; exported and cached on first use.
+    backend: "ultralytics" (default) or "onnxruntime" (OnnxYolo on CPU; falls back to Ultralytics if unavailable
+             or if it disagrees with the PyTorch model on the calibration clip).
+    Returns: Ultralytics YOLO or OnnxYolo instance (or None if import failed).
     """
     try:
         from ultralytics import YOLO
@@ -71,6 +77,21 @@ def load_yolo(
     use_onnx = use_onnx or model_cfg.get("use_onnx", False)
     imgsz = model_cfg.get("imgsz", imgsz)
     device = device or _device()
+    backend = (backend or model_cfg.get("backend") or "ultralytics").strip().lower()
+
+    if backend == "onnxruntime" and name and name.lower() != "auto" and name.endswith(".pt"):
+        model, _info = load_onnx_backend(
+            name,
+            imgsz=imgsz,
+            int8=bool(model_cfg.get("int8", False)),
+            intra_op_threads=int(model_cfg.get("intra_op_threads", 0) or 0),
+            cache_dir=model_cfg.get("onnx_cache_dir") or None,
+            calibration_clip=model_cfg.get("calibration_clip") or None,
+            min_agreement=float(model_cfg.get("min_agreement", 0.9)),
+            conf=float(model_cfg.get("conf", 0.25)),
+        )
+        if model is not None:
+            return model
 
     # Resolve model path: try priority list if name is "auto" or empty
     if not name or name.lower() == "auto":
@@ -91,6 +112,13 @@ def load_yolo(
             name = str(onnx_path)
         elif model_cfg.get("onnx_path"):
             name = model_cfg["onnx_path"]
+        else:
+            name = export_onnx_cached(name, imgsz=imgsz, cache_dir=model_cfg.get("onnx_cache_dir") or None) or name
+    if name.endswith(".onnx"):
+        try:
+            return YOLO(name, task="detect")  # exported graphs run on ONNX Runtime; .to(device) does not apply
+        except Exception:
+            pass
 
     try:
         model = YOLO(name)
@@ -123,6 +151,355 @@ def get_model_version(model: Any) -> str:
     return "yolo"
 
 
+# ---- ONNX Runtime CPU backend (cached export, optional INT8, box-agreement check) ----
+
+def onnx_cache_paths(pt_path: str, imgsz: int = 640, cache_dir: str | None = None) -> tuple[Path, Path]:
+    """(fp32, int8) cache paths for a .pt: <cache_dir>/<stem>.<imgsz>.onnx and .int8.onnx (cache_dir default: next to the .pt)."""
+    pt = Path(pt_path)
+    base = Path(cache_dir) if cache_dir else (pt.parent if str(pt.parent) else Path("."))
+    return base / f"{pt.stem}.{int(imgsz)}.onnx", base / f"{pt.stem}.{int(imgsz)}.int8.onnx"
+
+
+def _is_fresh(path: Path, source: Path) -> bool:
+    """Cached artifact exists and is not older than its source (source missing, e.g. hub-downloaded name: exists is enough)."""
+    if not path.is_file():
+        return False
+    try:
+        return not source.is_file() or path.stat().st_mtime >= source.stat().st_mtime
+    except OSError:
+        return False
+
+
+def export_onnx_cached(pt_path: str, imgsz: int = 640, cache_dir: str | None = None, int8: bool = False) -> str | None:
+    """
+    Export a .pt to ONNX once and reuse it on later starts (re-exported when the .pt is newer).
+    int8: also write a dynamically-quantized INT8 copy (onnxruntime.quantization) and return that path.
+    Returns the path to load, or None when export/quantization is unavailable.
+    """
+    fp32, q8 = onnx_cache_paths(pt_path, imgsz, cache_dir)
+    source = Path(pt_path)
+    if not _is_fresh(fp32, source):
+        try:
+            from ultralytics import YOLO
+            fp32.parent.mkdir(parents=True, exist_ok=True)
+            # dynamic=True keeps the batch axis free so batched predict() works on the exported graph
+            exported = YOLO(pt_path).export(format="onnx", imgsz=int(imgsz), dynamic=True, simplify=True)
+            os.replace(str(exported), str(fp32))
+        except Exception:
+            return None
+    if not int8:
+        return str(fp32)
+    if not _is_fresh(q8, fp32):
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            tmp = q8.with_suffix(".tmp")
+            quantize_dynamic(str(fp32), str(tmp), weight_type=QuantType.QUInt8)
+            os.replace(str(tmp), str(q8))
+        except Exception:
+            return None
+    return str(q8)
+
+
+def letterbox(frame: np.ndarray, imgsz: int = 640) -> tuple[np.ndarray, float, tuple[float, float]]:
+    """Resize keeping aspect ratio and pad to imgsz x imgsz (value 114, as Ultralytics). Returns (img, gain, (pad_x, pad_y))."""
+    import cv2
+    h, w = frame.shape[:2]
+    gain = min(imgsz / h, imgsz / w)
+    nw, nh = int(round(w * gain)), int(round(h * gain))
+    pad_x, pad_y = (imgsz - nw) / 2, (imgsz - nh) / 2
+    img = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR) if (nw, nh) != (w, h) else frame
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    img = cv2.copyMakeBorder(img, top, imgsz - nh - top, left, imgsz - nw - left, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return img, gain, (pad_x, pad_y)
+
+
+def decode_yolo_output(
+    pred: np.ndarray,
+    conf: float = 0.25,
+    iou: float = 0.45,
+    max_det: int = 300,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    One image's raw ONNX output -> (xyxy, conf, cls) in letterboxed pixels.
+    Handles (4+nc, N) YOLOv8/11 heads (class-aware NMS applied here) and NMS-free (N, 6) x1,y1,x2,y2,score,cls heads (YOLOv10/26).
+    """
+    import cv2
+    pred = np.asarray(pred, dtype=np.float32)
+    if pred.ndim == 2 and pred.shape[1] == 6 and pred.shape[0] != 6:
+        keep = pred[:, 4] >= conf
+        pred = pred[keep][:max_det]
+        return pred[:, :4], pred[:, 4], pred[:, 5].astype(np.int64)
+    pred = pred.T  # Ultralytics exports channels-first: (4+nc, N) -> (N, 4+nc)
+    scores_all = pred[:, 4:]
+    cls = scores_all.argmax(axis=1)
+    scores = scores_all[np.arange(len(cls)), cls]
+    keep = scores >= conf
+    boxes, scores, cls = pred[keep, :4], scores[keep], cls[keep]
+    if not len(scores):
+        return np.zeros((0, 4), dtype=np.float32), scores, cls.astype(np.int64)
+    xyxy = np.empty_like(boxes)
+    xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+    xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+    xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+    xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+    # Class-aware NMS via per-class offsets (same trick as Ultralytics non_max_suppression)
+    offset = cls[:, None].astype(np.float32) * 7680.0
+    shifted = xyxy + offset
+    rects = np.concatenate((shifted[:, :2], shifted[:, 2:] - shifted[:, :2]), axis=1)
+    idx = cv2.dnn.NMSBoxes(rects.tolist(), scores.tolist(), conf, iou)
+    idx = np.asarray(idx, dtype=np.int64).reshape(-1)
+    idx = idx[np.argsort(-scores[idx])][:max_det]
+    return xyxy[idx], scores[idx], cls[idx].astype(np.int64)
+
+
+class OnnxBoxes:
+    """Minimal Ultralytics Boxes stand-in backed by NumPy (xyxy, conf, cls; id when tracked)."""
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray, ids: np.ndarray | None = None):
+        self.xyxy = xyxy.astype(np.float32)
+        self.conf = conf.astype(np.float32)
+        self.cls = cls.astype(np.float32)
+        self.id = ids
+        self.is_track = ids is not None
+
+    @property
+    def xywh(self) -> np.ndarray:
+        xy = (self.xyxy[:, :2] + self.xyxy[:, 2:]) / 2
+        return np.concatenate((xy, self.xyxy[:, 2:] - self.xyxy[:, :2]), axis=1)
+
+    def __len__(self) -> int:
+        return len(self.cls)
+
+    def __getitem__(self, idx):
+        return OnnxBoxes(self.xyxy[idx], self.conf[idx], self.cls[idx], None if self.id is None else self.id[idx])
+
+
+class OnnxResult:
+    """Per-image result exposing .boxes, .names and .orig_shape like Ultralytics Results."""
+
+    def __init__(self, boxes: OnnxBoxes, names: dict[int, str], orig_shape: tuple[int, int]):
+        self.boxes = boxes
+        self.names = names
+        self.orig_shape = orig_shape
+
+
+def new_tracker(tracker: str = "bytetrack.yaml", frame_rate: int = 30) -> Any:
+    """
+    Ultralytics BYTETracker/BOTSORT from a tracker yaml (raises ImportError without ultralytics).
+    Reads the yaml with YAML.load on current ultralytics, yaml_load on releases before the YAML class.
+    """
+    from ultralytics.trackers.bot_sort import BOTSORT
+    from ultralytics.trackers.byte_tracker import BYTETracker
+    from ultralytics.utils import IterableSimpleNamespace
+    from ultralytics.utils.checks import check_yaml
+    try:
+        from ultralytics.utils import YAML
+        load = YAML.load
+    except ImportError:
+        from ultralytics.utils import yaml_load as load
+    cfg = IterableSimpleNamespace(**load(check_yaml(tracker)))
+    return (BOTSORT if cfg.tracker_type == "botsort" else BYTETracker)(args=cfg, frame_rate=frame_rate)
+
+
+class OnnxYolo:
+    """
+    YOLO detector on ONNX Runtime CPU with a fixed intra-op thread count.
+    predict() mirrors the Ultralytics call used in this repo (frame or list of frames, imgsz, conf, iou, verbose) and returns
+    a list of OnnxResult; track() adds ByteTrack/BoT-SORT IDs via Ultralytics' trackers when that package is installed.
+    """
+
+    def __init__(self, path: str, names: dict[int, str] | None = None, imgsz: int = 640, intra_op_threads: int = 0):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            opts.intra_op_num_threads = int(intra_op_threads)
+        opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.ckpt_path = path
+        self.imgsz = int(imgsz)
+        self.intra_op_threads = int(intra_op_threads)
+        self.names = names or self._names_from_metadata()
+        self._trackers: dict[str, Any] = {}
+
+    def _names_from_metadata(self) -> dict[int, str]:
+        """Class names that Ultralytics writes into the exported graph's metadata."""
+        try:
+            import ast
+            raw = self.session.get_modelmeta().custom_metadata_map.get("names")
+            return {int(k): str(v) for k, v in ast.literal_eval(raw).items()} if raw else {}
+        except Exception:
+            return {}
+
+    def predict(self, source, imgsz: int | None = None, conf: float = 0.25, iou: float = 0.45, max_det: int = 300, verbose: bool = False, **_: Any) -> list[OnnxResult]:
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        if not frames:
+            return []
+        size = int(imgsz or self.imgsz)
+        batch, metas = [], []
+        for frame in frames:
+            img, gain, pad = letterbox(frame, size)
+            batch.append(img[:, :, ::-1].transpose(2, 0, 1))  # BGR HWC -> RGB CHW
+            metas.append((gain, pad, frame.shape[:2]))
+        x = np.ascontiguousarray(np.stack(batch), dtype=np.float32) / 255.0
+        out = self.session.run(None, {self.input_name: x})[0]
+        results = []
+        for pred, (gain, (pad_x, pad_y), (h, w)) in zip(out, metas):
+            xyxy, scores, cls = decode_yolo_output(pred, conf=conf, iou=iou, max_det=max_det)
+            if len(xyxy):
+                xyxy = (xyxy - np.array([pad_x, pad_y, pad_x, pad_y], dtype=np.float32)) / gain
+                xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+                xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+            results.append(OnnxResult(OnnxBoxes(xyxy, scores, cls), self.names, (h, w)))
+        return results
+
+    def __call__(self, source, **kwargs: Any) -> list[OnnxResult]:
+        return self.predict(source, **kwargs)
+
+    def track(self, source, persist: bool = True, tracker: str = "bytetrack.yaml", **kwargs: Any) -> list[OnnxResult]:
+        """Detect, then assign track IDs with Ultralytics' BYTETracker/BOTSORT via new_tracker (ImportError without ultralytics)."""
+        if not persist or tracker not in self._trackers:
+            self._trackers[tracker] = new_tracker(tracker, frame_rate=30)
+        trk = self._trackers[tracker]
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        results = self.predict(frames, **kwargs)
+        for frame, res in zip(frames, results):
+            tracks = trk.update(res.boxes, frame)  # rows: x1, y1, x2, y2, track_id, score, cls, det_idx
+            if len(tracks):
+                res.boxes = OnnxBoxes(tracks[:, :4], tracks[:, 5], tracks[:, 6], tracks[:, 4].astype(np.int64))
+            else:
+                res.boxes = OnnxBoxes(np.zeros((0, 4)), np.zeros((0,)), np.zeros((0,)), np.zeros((0,), dtype=np.int64))
+        return results
+
+
+def _box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of (N,4) and (M,4) xyxy boxes."""
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def box_agreement(reference: list[tuple[np.ndarray, np.ndarray]], candidate: list[tuple[np.ndarray, np.ndarray]], iou: float = 0.5) -> dict[str, float]:
+    """
+    Compare per-frame (xyxy, cls) detections of a candidate backend against a reference.
+    Greedy same-class matching at IoU >= iou. Returns recall, precision, f1 and mean IoU of matched pairs.
+    """
+    matched = ref_total = cand_total = 0
+    ious: list[float] = []
+    for (ra, rc), (ca, cc) in zip(reference, candidate):
+        ref_total += len(ra)
+        cand_total += len(ca)
+        m = _box_iou(np.asarray(ra, dtype=np.float32).reshape(-1, 4), np.asarray(ca, dtype=np.float32).reshape(-1, 4))
+        if m.size:
+            m = np.where(np.asarray(rc).reshape(-1, 1) == np.asarray(cc).reshape(1, -1), m, 0.0)
+        while m.size and m.max() >= iou:
+            i, j = np.unravel_index(int(m.argmax()), m.shape)
+            ious.append(float(m[i, j]))
+            matched += 1
+            m[i, :] = 0.0
+            m[:, j] = 0.0
+    recall = matched / ref_total if ref_total else 1.0
+    precision = matched / cand_total if cand_total else 1.0
+    f1 = 2 * recall * precision / (recall + precision) if (recall + precision) else 0.0
+    return {
+        "recall": round(recall, 4),
+        "precision": round(precision, 4),
+        "f1": round(f1, 4),
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else 0.0,
+        "reference_boxes": ref_total,
+        "candidate_boxes": cand_total,
+    }
+
+
+def read_calibration_frames(path: str, max_frames: int = 32) -> list[np.ndarray]:
+    """Up to max_frames frames spread evenly over a calibration clip (empty list when unreadable)."""
+    try:
+        import cv2
+    except ImportError:
+        return []
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return []
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    step = max(1, total // max_frames) if total > 0 else 1
+    frames: list[np.ndarray] = []
+    i = 0
+    while len(frames) < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if i % step == 0:
+            frames.append(frame)
+        i += 1
+    cap.release()
+    return frames
+
+
+def validate_against_torch(pt_path: str, onnx_model: OnnxYolo, frames: list[np.ndarray], imgsz: int = 640, conf: float = 0.25) -> dict[str, float] | None:
+    """Run the PyTorch model and the ONNX model on the same frames and return box_agreement() (None if torch model unavailable)."""
+    if not frames:
+        return None
+    try:
+        from ultralytics import YOLO
+        ref_model = YOLO(pt_path)
+        ref = []
+        for r in ref_model.predict(frames, imgsz=imgsz, conf=conf, verbose=False):
+            ref.append((r.boxes.xyxy.cpu().numpy(), r.boxes.cls.cpu().numpy()))
+    except Exception:
+        return None
+    cand = [(r.boxes.xyxy, r.boxes.cls) for r in onnx_model.predict(frames, imgsz=imgsz, conf=conf)]
+    return box_agreement(ref, cand)
+
+
+def load_onnx_backend(
+    pt_path: str,
+    imgsz: int = 640,
+    int8: bool = False,
+    intra_op_threads: int = 0,
+    cache_dir: str | None = None,
+    calibration_clip: str | None = None,
+    min_agreement: float = 0.9,
+    conf: float = 0.25,
+) -> tuple[OnnxYolo | None, dict[str, Any]]:
+    """
+    Export (cached) and open a .pt as an OnnxYolo on CPU. With int8, the quantized graph is tried first.
+    With calibration_clip, each candidate must reach f1 >= min_agreement against the PyTorch model or the next one is tried
+    (INT8 -> FP32 -> None, caller keeps PyTorch). Returns (model or None, info dict for status endpoints).
+    """
+    info: dict[str, Any] = {"backend": "onnxruntime", "int8": False, "intra_op_threads": intra_op_threads, "path": None, "agreement": None}
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        info["error"] = "onnxruntime not installed"
+        return None, info
+    frames = read_calibration_frames(calibration_clip) if calibration_clip else []
+    candidates = [True, False] if int8 else [False]
+    for quantized in candidates:
+        path = export_onnx_cached(pt_path, imgsz=imgsz, cache_dir=cache_dir, int8=quantized)
+        if not path:
+            info["error"] = "export failed" if not quantized else "int8 quantization failed"
+            continue
+        try:
+            model = OnnxYolo(path, imgsz=imgsz, intra_op_threads=intra_op_threads)
+        except Exception as e:
+            info["error"] = "session: %s" % e
+            continue
+        agreement = validate_against_torch(pt_path, model, frames, imgsz=imgsz, conf=conf) if frames else None
+        info.update({"path": path, "int8": quantized, "agreement": agreement})
+        if agreement is not None and agreement["f1"] < min_agreement:
+            info["error"] = "box agreement %.3f < %.3f" % (agreement["f1"], min_agreement)
+            continue
+        info.pop("error", None)
+        return model, info
+    return None, info
+
+
 # ---- Install / MPS setup notes (for docs) ----
 MPS_SETUP_NOTES = """
 Mac M-series (MPS) setup:
@@ -139,4 +516,6 @@ Export to ONNX for faster inference:
   m = YOLO('yolo11n.pt')
   m.export(format='onnx', imgsz=640, simplify=True)
   # Then use model_cfg.use_onnx: true and onnx_path: 'yolo11n.onnx'
+Or let load_yolo export and cache it: model.backend: onnxruntime (pip install onnxruntime onnx), optional
+model.int8: true (dynamic INT8), model.intra_op_threads: 4, model.calibration_clip: clip.mp4 (box-agreement check).
 """
@@ -3,7 +3,8 @@ Tracking + Re-Identification: ByteTrack/BoT-SORT + persistent person memory.
 
 - Use Ultralytics model.track() (ByteTrack or BoT-SORT) for frame-to-frame IDs.
 - For each person bbox, compute ReID embedding (OSNet/ResNet fallback) and match
-  against SQLite-stored embeddings (cosine sim > threshold = same person).
+  against SQLite-stored embeddings (cosine sim > threshold = same person) through
+  an in-memory index (proactive.reid_index: HNSW or NumPy), snapshotted to disk.
 - Update persons table: visit_count, last_seen_utc, typical_hours; flag anomalies
   (e.g. "stranger 8× at night").
 """
@@ -24,17 +25,29 @@ def _reid_module():
             sys.path.insert(0, str(root))
         from proactive.reid import (
             compute_embedding,
+            compute_embeddings,
             embedding_to_blob,
             find_best_match,
+            find_best_matches,
             get_embedding_dim,
             is_reid_available,
         )
-        return compute_embedding, embedding_to_blob, find_best_match, get_embedding_dim, is_reid_available
+        return (compute_embedding, compute_embeddings, embedding_to_blob, find_best_match, find_best_matches,
+                get_embedding_dim, is_reid_available)
     except ImportError:
-        return None, None, None, lambda: 128, lambda: False
+        return None, None, None, None, None, lambda: 128, lambda: False
 
 
-_compute_embedding, _embedding_to_blob, _find_best_match, _get_embedding_dim, _is_reid_available = _reid_module()
+(_compute_embedding, _compute_embeddings, _embedding_to_blob, _find_best_match, _find_best_matches,
+ _get_embedding_dim, _is_reid_available) = _reid_module()
+
+try:
+    from proactive.reid_index import ReidIndex, index_config
+except ImportError:
+    ReidIndex, index_config = None, None
+
+# One in-memory ReID index per database file: {db_path: {"index", "path", "synced_at", "unsaved", "cfg"}}
+_indexes: dict[str, dict[str, Any]] = {}
 
 
 def run_track(
@@ -89,27 +102,109 @@ def compute_reid_embedding(crop: np.ndarray | None) -> np.ndarray | None:
     return _compute_embedding(crop)
 
 
+def compute_reid_embeddings(crops: list[np.ndarray | None], max_batch: int = 16) -> list[np.ndarray | None]:
+    """ReID vectors for several crops in batched forward passes (max_batch crops each); None per unusable crop."""
+    if _compute_embeddings is None:
+        return [None] * len(crops)
+    return _compute_embeddings(crops, max_batch=max_batch)
+
+
+def _db_path(conn: Any) -> str:
+    try:
+        row = conn.execute("PRAGMA database_list").fetchone()
+        return row[2] or ""
+    except Exception:
+        return ""
+
+
+def get_reid_index(conn: Any, config: dict[str, Any] | None = None) -> Any:
+    """
+    In-memory ReID index for conn's database: loaded from its snapshot (or built from
+    the embeddings table) on first use, then kept current with sync() every
+    reid.index.sync_interval_sec. None if the index module is unavailable.
+    """
+    if ReidIndex is None:
+        return None
+    key = _db_path(conn)
+    state = _indexes.get(key)
+    now = time.monotonic()
+    if state is None:
+        cfg = index_config(config)
+        path = cfg.pop("path", "") or (key + ".reid_index" if key else "")
+        index = ReidIndex.load(path, **cfg) if path else None
+        if index is None or index.dim != get_embedding_dim():
+            try:
+                index = ReidIndex(get_embedding_dim(), **cfg)
+            except (ImportError, ValueError):
+                return None
+        state = _indexes[key] = {"index": index, "path": path, "synced_at": None, "unsaved": 0, "cfg": cfg}
+    if state["synced_at"] is None or now - state["synced_at"] >= float(state["cfg"].get("sync_interval_sec", 5.0)):
+        state["unsaved"] += state["index"].sync(conn)
+        state["synced_at"] = now
+    return state["index"]
+
+
+def index_embedding(conn: Any, embedding_id: int, embedding: np.ndarray, person_id: int | None = None,
+                    config: dict[str, Any] | None = None) -> None:
+    """Add a just-stored embedding to the ReID index; snapshot every reid.index.snapshot_every adds."""
+    index = get_reid_index(conn, config)
+    if index is None or embedding is None:
+        return
+    state = _indexes[_db_path(conn)]
+    state["unsaved"] += index.add([embedding_id], [embedding], [person_id])
+    every = int(state["cfg"].get("snapshot_every", 0) or 0)
+    if every and state["unsaved"] >= every:
+        save_reid_index(conn)
+
+
+def save_reid_index(conn: Any) -> None:
+    """Snapshot conn's ReID index to disk (no-op for in-memory databases or without an index)."""
+    state = _indexes.get(_db_path(conn))
+    if state is None or not state["path"]:
+        return
+    try:
+        state["index"].save(state["path"])
+        state["unsaved"] = 0
+    except OSError:
+        pass
+
+
 def match_person(
     embedding: np.ndarray,
     conn: Any,
     threshold: float = 0.85,
+    config: dict[str, Any] | None = None,
 ) -> tuple[int | None, float]:
     """
-    Match embedding to stored persons. Returns (person_id or None, similarity).
-    If no match above threshold, returns (None, best_sim).
+    Match embedding to stored persons via the ReID index (get_reid_index).
+    Returns (person_id or embedding id, similarity), or (None, 0.0) if nothing reaches threshold.
     """
     if _find_best_match is None or embedding is None:
         return None, 0.0
+    return match_persons([embedding], conn, threshold=threshold, config=config)[0]
+
+
+def match_persons(
+    embeddings: list[np.ndarray | None],
+    conn: Any,
+    threshold: float = 0.85,
+    config: dict[str, Any] | None = None,
+) -> list[tuple[int | None, float]]:
+    """Batched match_person: one index search (or one find_best_matches scan) for all of a frame's embeddings."""
+    if _find_best_matches is None or not embeddings:
+        return [(None, 0.0)] * len(embeddings)
+    index = get_reid_index(conn, config)
+    if index is not None:
+        return index.best_matches(embeddings, threshold=threshold)
     try:
         try:
             from vigil_upgrade.db_storage import get_all_embeddings
         except ImportError:
             from .db_storage import get_all_embeddings
         stored = get_all_embeddings(conn)
-        pid, sim = _find_best_match(embedding, stored, threshold=threshold)
-        return pid, sim
+        return _find_best_matches(embeddings, stored, threshold=threshold)
     except Exception:
-        return None, 0.0
+        return [(None, 0.0)] * len(embeddings)
 
 
 def process_frame_reid(
@@ -121,13 +216,15 @@ def process_frame_reid(
     """
     For each tracked person in results, compute ReID embedding, match to DB,
     and return list of {track_uid, person_id, embedding, bbox, object_name}.
-    If ReID disabled or no person boxes, returns [].
+    All person crops are embedded in batched forward passes (reid.max_batch) and
+    matched in one batched search. If ReID disabled or no person boxes, returns [].
     """
     cfg = config or {}
     reid_cfg = cfg.get("reid", {})
     if not reid_cfg.get("enabled", True):
         return []
     threshold = float(reid_cfg.get("similarity_threshold", 0.85))
+    max_batch = int(reid_cfg.get("max_batch", 16))
     person_class_id = 0  # COCO person = 0
 
     out = []
@@ -147,19 +244,21 @@ def process_frame_reid(
             tid = int(boxes.id[i]) if hasattr(boxes, "id") and boxes.id is not None else None
             if tid is None:
                 continue
-            crop = crop_person(frame, box)
-            emb = compute_reid_embedding(crop)
-            person_id = None
-            sim = 0.0
-            if emb is not None:
-                person_id, sim = match_person(emb, conn, threshold=threshold)
             out.append({
                 "track_uid": tid,
-                "person_id": person_id,
-                "embedding": emb,
+                "person_id": None,
+                "embedding": None,
                 "bbox": box.tolist(),
                 "object_name": "person",
+                "_crop": crop_person(frame, box),
             })
+    if not out:
+        return out
+    embeddings = compute_reid_embeddings([o.pop("_crop") for o in out], max_batch=max_batch)
+    matches = match_persons(embeddings, conn, threshold=threshold, config=cfg)
+    for o, emb, (person_id, _sim) in zip(out, embeddings, matches):
+        o["embedding"] = emb
+        o["person_id"] = person_id
     return out
 
 